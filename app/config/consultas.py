@@ -0,0 +1,175 @@
+"""
+Medición de consultas SQL por petición
+
+Los eventos before/after_cursor_execute de todos los engines (primaria,
+async y réplicas) cuentan cada sentencia y su tiempo. Mientras dura una
+petición HTTP, MedicionConsultasMiddleware acumula:
+
+    - cantidad de sentencias
+    - tiempo total en la base
+    - la sentencia más lenta
+
+y los devuelve en la cabecera Server-Timing de la respuesta (se ven en la
+pestaña Network / Timing de las herramientas del navegador):
+
+    Server-Timing: db;dur=12.4;desc="7 consultas", db-lenta;dur=5.1, app;dur=31.0
+
+Al terminar, la petición escribe su única línea INFO en el logger
+app.peticiones: método, ruta, estado, duración y los mismos datos de
+consultas como campos.
+
+En respuestas en streaming (exportaciones) las cabeceras salen antes que
+las filas: solo cuentan las consultas hechas hasta ese momento.
+
+Las sentencias que tardan más de DB_CONSULTA_LENTA_MS milisegundos (por
+defecto 200) se registran en WARNING (logger app.config.consultas) con
+la ruta que las hizo. Los valores de los parámetros nunca se registran, solo sus
+nombres y tipos.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+log = logging.getLogger(__name__)
+log_peticiones = logging.getLogger("app.peticiones")
+
+# Largo máximo del SQL en el log de consultas lentas
+MAX_SQL_LOG = 1000
+
+_umbral_lento_s: Optional[float] = None
+_lock = threading.Lock()
+consultas_lentas = 0
+
+
+def umbral_lento_s() -> float:
+    """Umbral de DB_CONSULTA_LENTA_MS en segundos (se lee al primer uso, después de load_dotenv)"""
+    global _umbral_lento_s
+    if _umbral_lento_s is None:
+        _umbral_lento_s = float(os.getenv("DB_CONSULTA_LENTA_MS", "200")) / 1000
+    return _umbral_lento_s
+
+
+class MedicionPeticion:
+    """Consultas de una petición HTTP"""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.mas_lenta = 0.0
+        self._lock = threading.Lock()
+
+    def observar(self, segundos: float):
+        # Las rutas síncronas y los streams corren en hilos del threadpool
+        with self._lock:
+            self.consultas += 1
+            self.tiempo_db += segundos
+            self.mas_lenta = max(self.mas_lenta, segundos)
+
+    def server_timing(self, total: float) -> str:
+        """Valor de la cabecera Server-Timing (duraciones en ms)"""
+        plural = "" if self.consultas == 1 else "s"
+        return (f'db;dur={self.tiempo_db * 1000:.1f};desc="{self.consultas} consulta{plural}", '
+                f"db-lenta;dur={self.mas_lenta * 1000:.1f}, "
+                f"app;dur={total * 1000:.1f}")
+
+
+# El contexto se copia a los hilos del threadpool: la medición (un objeto
+# mutable) es la misma para toda la petición
+_medicion_actual: ContextVar[Optional[MedicionPeticion]] = ContextVar("medicion_consultas", default=None)
+
+
+def redactar_parametros(parametros) -> str:
+    """Nombres y tipos de los parámetros, sin sus valores"""
+    if isinstance(parametros, dict):
+        return "{" + ", ".join(f"{clave}: {type(valor).__name__}" for clave, valor in parametros.items()) + "}"
+    if isinstance(parametros, (list, tuple)):
+        if parametros and isinstance(parametros[0], (dict, list, tuple)):
+            # executemany: una fila de parámetros por ejecución
+            return f"{len(parametros)} filas x {redactar_parametros(parametros[0])}"
+        return "(" + ", ".join(type(valor).__name__ for valor in parametros) + ")"
+    return type(parametros).__name__
+
+
+def _registrar_lenta(segundos: float, sql: str, parametros, ruta: Optional[str]):
+    global consultas_lentas
+    with _lock:
+        consultas_lentas += 1
+    sql = re.sub(r"\s+", " ", sql).strip()
+    if len(sql) > MAX_SQL_LOG:
+        sql = sql[:MAX_SQL_LOG] + "..."
+    log.warning("Consulta lenta: %s", sql, extra={
+        "duracion_ms": round(segundos * 1000, 1),
+        "ruta": ruta or "fuera de petición",
+        "parametros": redactar_parametros(parametros),
+    })
+
+
+def estadisticas() -> dict:
+    return {"umbral_lento_ms": umbral_lento_s() * 1000, "consultas_lentas": consultas_lentas}
+
+# ============================================================================
+# 🔔 EVENTOS DE ENGINE
+# ============================================================================
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    context._inicio_consulta = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    segundos = time.perf_counter() - context._inicio_consulta
+    medicion = _medicion_actual.get()
+    if medicion is not None:
+        medicion.observar(segundos)
+    if segundos >= umbral_lento_s():
+        _registrar_lenta(segundos, statement, parameters, medicion.ruta if medicion else None)
+
+# ============================================================================
+# 🌐 MIDDLEWARE
+# ============================================================================
+
+class MedicionConsultasMiddleware:
+    """Mide las consultas de cada petición y agrega la cabecera Server-Timing"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        medicion = MedicionPeticion(f"{scope['method']} {scope['path']}")
+        inicio = time.perf_counter()
+        estado = 500
+
+        async def enviar(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+                cabeceras = MutableHeaders(scope=mensaje)
+                cabeceras.append("Server-Timing", medicion.server_timing(time.perf_counter() - inicio))
+            await send(mensaje)
+
+        token = _medicion_actual.set(medicion)
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _medicion_actual.reset(token)
+            if log_peticiones.isEnabledFor(logging.INFO):
+                log_peticiones.info(medicion.ruta, extra={
+                    "estado": estado,
+                    "duracion_ms": round((time.perf_counter() - inicio) * 1000, 1),
+                    "consultas": medicion.consultas,
+                    "db_ms": round(medicion.tiempo_db * 1000, 1),
+                })
@@ -1,9 +1,13 @@
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 import os
 
+from fastapi import Request
+
+from app.config import pool, replicas
+
 load_dotenv()
 
 DB_HOST = os.getenv("DB_HOST")
@@ -12,16 +16,44 @@ DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_NAME = os.getenv("DB_NAME")
 
-SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# DATABASE_URL reemplaza la base MySQL armada con DB_*, p. ej.
+# DATABASE_URL=sqlite:///./finanzas.db para trabajar sin servidor MySQL
+SQLALCHEMY_DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+# Misma base con driver async (aiomysql / aiosqlite) para las rutas async def
+ASYNC_SQLALCHEMY_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", pool.url_async(SQLALCHEMY_DATABASE_URL))
+ES_SQLITE = pool.es_sqlite(SQLALCHEMY_DATABASE_URL)
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Tamaño, overflow, timeout, recycle y pre-ping del pool: ver app/config/pool.py
+engine = pool.crear_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = pool.crear_engine_async(ASYNC_SQLALCHEMY_DATABASE_URL)
+# expire_on_commit=False: en async no hay carga perezosa implícita, así los
+# objetos siguen legibles después del commit sin otra consulta
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession,
+                                       autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
-def get_db():
+# Réplicas de lectura opcionales (DB_REPLICAS): ver app/config/replicas.py
+enrutador_lecturas = replicas.EnrutadorLecturas(replicas.urls_replicas())
+
+def get_db(request: Request):
     db = SessionLocal()
+    replicas.recordar_sesion_http(db, request)
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Rutas GET de solo lectura: réplica sana o, tras una escritura reciente, la primaria
+get_db_lectura = replicas.crear_get_db_lectura(get_db, enrutador_lecturas)
+
+async def get_async_db(request: Request):
+    """Sesión async para las rutas async def (no bloquea el event loop)"""
+    async with AsyncSessionLocal() as db:
+        replicas.recordar_sesion_http(db.sync_session, request)
+        yield db
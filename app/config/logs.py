@@ -0,0 +1,165 @@
+"""
+Logging estructurado de la aplicación
+
+Cada módulo usa su propio logger (logging.getLogger(__name__)) en lugar de
+print. configurar_logging(), que llama main.py al arrancar, arma:
+
+    - Una cola: los loggers solo encolan el registro (QueueHandler) y un
+      hilo aparte (QueueListener) lo formatea y lo escribe. Las peticiones
+      no esperan por stdout.
+    - Niveles por módulo: LOG_NIVEL para toda la app y LOG_NIVELES para
+      módulos puntuales.
+    - Muestreo de DEBUG: de cada punto del código que escribe en DEBUG
+      sale 1 de cada LOG_DEBUG_MUESTREO registros (el primero siempre).
+
+En INFO cada petición escribe una sola línea (logger app.peticiones, ver
+app/config/consultas.py). El detalle de cada ruta va en DEBUG y nunca
+incluye montos, notas, contraseñas ni datos de formularios: solo ids y
+cantidades.
+
+Variables de entorno:
+    LOG_NIVEL            nivel de los loggers app.* (por defecto INFO)
+    LOG_NIVELES          niveles por módulo, p. ej.
+                         "app.repository.crud=DEBUG,app.config.replicas=WARNING"
+    LOG_FORMATO          json (una línea JSON por registro) o texto (por defecto texto)
+    LOG_DEBUG_MUESTREO   1 de cada N registros DEBUG por punto del código (por defecto 10; 1 = todos)
+
+Los campos extra de un registro (logger.info("...", extra={"campo": valor}))
+salen como claves del JSON, o como campo=valor en formato texto.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+from dotenv import load_dotenv
+
+# Atributos propios de LogRecord: todo lo demás son campos extra
+_ATRIBUTOS_RECORD = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _campos_extra(record: logging.LogRecord) -> dict:
+    return {clave: valor for clave, valor in vars(record).items() if clave not in _ATRIBUTOS_RECORD}
+
+
+class _Encolador(logging.handlers.QueueHandler):
+    """QueueHandler que conserva los campos extra y deja la traza ya formateada en exc_text"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por registro"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        datos = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        datos.update(_campos_extra(record))
+        if record.exc_text:
+            datos["exc"] = record.exc_text
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class FormatoTexto(logging.Formatter):
+    """Texto legible: hora nivel logger: mensaje | campo=valor ..."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        linea = super().format(record)
+        extra = _campos_extra(record)
+        if extra:
+            primera, _, resto = linea.partition("\n")
+            campos = " ".join(f"{clave}={valor}" for clave, valor in extra.items())
+            linea = f"{primera} | {campos}" + (f"\n{resto}" if resto else "")
+        return linea
+
+
+class MuestreoDebug(logging.Filter):
+    """Deja pasar 1 de cada `cada` registros DEBUG por punto del código; el resto de niveles pasa siempre"""
+
+    def __init__(self, cada: int):
+        super().__init__()
+        self.cada = max(1, cada)
+        self._contadores = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno != logging.DEBUG or self.cada == 1:
+            return True
+        clave = (record.pathname, record.lineno)
+        with self._lock:
+            n = self._contadores.get(clave, 0)
+            self._contadores[clave] = n + 1
+        if n % self.cada:
+            return False
+        record.muestreo = self.cada
+        return True
+
+
+def niveles_por_modulo() -> dict:
+    """LOG_NIVELES como {logger: nivel}"""
+    niveles = {}
+    for par in os.getenv("LOG_NIVELES", "").split(","):
+        if "=" in par:
+            nombre, nivel = par.split("=", 1)
+            niveles[nombre.strip()] = nivel.strip().upper()
+    return niveles
+
+
+def configurar_logging():
+    """Arma la cola, los formatos, los niveles y el muestreo (una sola vez por proceso)"""
+    global _listener
+    if _listener is not None:
+        return
+    # Se llama antes de importar app.config.database: las variables LOG_* también pueden venir del .env
+    load_dotenv()
+
+    salida = logging.StreamHandler(sys.stdout)
+    salida.setFormatter(FormatoJSON() if os.getenv("LOG_FORMATO", "texto").lower() == "json" else FormatoTexto())
+
+    cola = queue.SimpleQueue()
+    encolador = _Encolador(cola)
+    encolador.addFilter(MuestreoDebug(int(os.getenv("LOG_DEBUG_MUESTREO", "10"))))
+    _listener = logging.handlers.QueueListener(cola, salida, respect_handler_level=True)
+    _listener.start()
+    atexit.register(detener)
+
+    app = logging.getLogger("app")
+    app.handlers[:] = [encolador]
+    app.propagate = False
+    app.setLevel(os.getenv("LOG_NIVEL", "INFO").upper())
+    for nombre, nivel in niveles_por_modulo().items():
+        logging.getLogger(nombre).setLevel(nivel)
+
+    # app.peticiones ya escribe la línea de cada petición: la de uvicorn sería la segunda
+    logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
+
+
+def detener():
+    """Vacía la cola y detiene el hilo que escribe (al apagar la app)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
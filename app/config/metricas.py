@@ -0,0 +1,272 @@
+"""
+Métricas en formato de texto de Prometheus (GET /metrics)
+
+Se acumulan en memoria, sin dependencias extra, con el mismo esquema de
+histograma que el pool de conexiones: un bisect y un lock por observación.
+
+    - MetricasHTTPMiddleware: latencia, tamaño de respuesta y cantidad de
+      peticiones por ruta, y peticiones en curso
+    - @medir: duración de cada función de app/repository/crud.py
+    - Colectores (registrar_colector): valores que ya llevan otros módulos
+      (pool, cachés, exportaciones, bcrypt) y se leen al exponer
+
+La ruta de las etiquetas es la plantilla de FastAPI (/ingresos/{ingreso_id}),
+no la URL pedida: así la cantidad de series no crece con los ids. Lo que no
+coincide con ninguna ruta (404, /static) va a la etiqueta "otra".
+
+Con varios workers de uvicorn cada proceso lleva sus propios valores (igual
+que /debug/pool): Prometheus ve el del worker que atendió cada scrape.
+
+Variables de entorno:
+    METRICAS_TOKEN   si se define, /metrics exige "Authorization: Bearer <token>".
+                     Los endpoints /debug/* de estado del proceso (pool,
+                     cachés, colas) lo exigen siempre: sin él no responden
+"""
+import bisect
+import functools
+import hmac
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+log = logging.getLogger(__name__)
+
+TIPO_CONTENIDO = "text/plain; version=0.0.4; charset=utf-8"
+
+# Límites superiores (segundos / bytes) de los intervalos de cada histograma
+LIMITES_PETICION_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LIMITES_CRUD_S = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+LIMITES_RESPUESTA_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+RUTA_DESCONOCIDA = "otra"
+
+
+def _numero(valor) -> str:
+    if isinstance(valor, bool):
+        return str(int(valor))
+    if isinstance(valor, float):
+        if valor == float("inf"):
+            return "+Inf"
+        return repr(valor)
+    return str(valor)
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(nombres: Sequence[str], valores: Sequence) -> str:
+    if not nombres:
+        return ""
+    return "{" + ",".join(f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)) + "}"
+
+
+def familia(nombre: str, tipo: str, ayuda: str, muestras: Iterable[Tuple[Dict[str, object], object]]) -> List[str]:
+    """
+    Líneas de una métrica calculada al exponer (para los colectores)
+
+    Args:
+        tipo: gauge o counter
+        muestras: pares (etiquetas, valor)
+    """
+    lineas = [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+    for etiquetas, valor in muestras:
+        lineas.append(f"{nombre}{_etiquetas(list(etiquetas), list(etiquetas.values()))} {_numero(valor)}")
+    return lineas
+
+
+def histograma_texto(nombre: str, ayuda: str, nombres: Sequence[str],
+                     series: Iterable[Tuple[Sequence, Sequence[float], Sequence[int], float]]) -> List[str]:
+    """
+    Líneas de un histograma a partir de intervalos no acumulados
+
+    Args:
+        series: (valores de etiquetas, límites, cantidad por intervalo con uno
+                 más para los valores sobre el último límite, suma)
+    """
+    lineas = [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} histogram"]
+    nombres_le = list(nombres) + ["le"]
+    for valores, limites, cubetas, suma in series:
+        valores = list(valores)
+        acumulado = 0
+        for limite, cantidad in zip(list(limites) + [float("inf")], cubetas):
+            acumulado += cantidad
+            lineas.append(f"{nombre}_bucket{_etiquetas(nombres_le, valores + [_numero(float(limite))])} {acumulado}")
+        sufijo = _etiquetas(nombres, valores)
+        lineas.append(f"{nombre}_sum{sufijo} {_numero(float(suma))}")
+        lineas.append(f"{nombre}_count{sufijo} {acumulado}")
+    return lineas
+
+# ============================================================================
+# 📊 CONTADORES E HISTOGRAMAS
+# ============================================================================
+
+_metricas: list = []
+_colectores: List[Callable[[], Iterable[str]]] = []
+
+
+class Contador:
+    """Contador monótono por combinación de etiquetas"""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._series: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        _metricas.append(self)
+
+    def incrementar(self, *valores, cantidad: float = 1):
+        with self._lock:
+            self._series[valores] = self._series.get(valores, 0) + cantidad
+
+    def exponer(self) -> List[str]:
+        with self._lock:
+            series = list(self._series.items())
+        return familia(self.nombre, "counter", self.ayuda,
+                       ((dict(zip(self.etiquetas, valores)), total) for valores, total in series))
+
+
+class Histograma:
+    """Histograma por combinación de etiquetas (intervalos fijos)"""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str], limites: Sequence[float]):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.limites = tuple(limites)
+        # valores de etiquetas -> [cantidad por intervalo..., suma]
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        _metricas.append(self)
+
+    def observar(self, valor: float, *valores):
+        indice = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [0] * (len(self.limites) + 2)
+            serie[indice] += 1
+            serie[-1] += valor
+
+    def exponer(self) -> List[str]:
+        with self._lock:
+            series = [(valores, serie[:]) for valores, serie in self._series.items()]
+        return histograma_texto(self.nombre, self.ayuda, self.etiquetas,
+                                ((valores, self.limites, serie[:-1], serie[-1]) for valores, serie in series))
+
+
+def registrar_colector(colector: Callable[[], Iterable[str]]):
+    """Agrega una función que devuelve líneas de métricas (ver familia) al exponer"""
+    _colectores.append(colector)
+    return colector
+
+
+def exponer() -> str:
+    """Todas las métricas en formato de texto de Prometheus"""
+    lineas = []
+    for metrica in _metricas:
+        lineas.extend(metrica.exponer())
+    for colector in _colectores:
+        try:
+            lineas.extend(colector())
+        except Exception:
+            # Una fuente que falla no deja sin métricas al resto
+            log.exception("Error en el colector de métricas %s", getattr(colector, "__name__", colector))
+    return "\n".join(lineas) + "\n"
+
+
+def autorizado(request, sin_token: bool = True) -> bool:
+    """
+    ¿Trae la petición "Authorization: Bearer <METRICAS_TOKEN>"?
+
+    Args:
+        request: Request de FastAPI/Starlette
+        sin_token: Resultado si METRICAS_TOKEN no está definido (/metrics
+            queda abierto; los /debug/* pasan False y quedan cerrados)
+    """
+    token = os.getenv("METRICAS_TOKEN")
+    if not token:
+        return sin_token
+    return hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {token}")
+
+# ============================================================================
+# 🌐 PETICIONES HTTP
+# ============================================================================
+
+peticiones_total = Contador("http_peticiones_total", "Peticiones HTTP atendidas",
+                            ("metodo", "ruta", "estado"))
+duracion_peticion = Histograma("http_peticion_duracion_segundos", "Duración de las peticiones HTTP",
+                               ("metodo", "ruta"), LIMITES_PETICION_S)
+tamano_respuesta = Histograma("http_respuesta_bytes", "Tamaño del cuerpo de las respuestas HTTP",
+                              ("metodo", "ruta"), LIMITES_RESPUESTA_BYTES)
+
+# Solo lo modifica el middleware, dentro del event loop
+peticiones_en_curso = 0
+
+
+@registrar_colector
+def _colector_en_curso():
+    return familia("http_peticiones_en_curso", "gauge", "Peticiones HTTP en curso", [({}, peticiones_en_curso)])
+
+
+class MetricasHTTPMiddleware:
+    """Latencia, tamaño de respuesta y estado de cada petición, por ruta"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global peticiones_en_curso
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        estado = 500
+        tamano = 0
+
+        async def enviar(mensaje):
+            nonlocal estado, tamano
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+            elif mensaje["type"] == "http.response.body":
+                tamano += len(mensaje.get("body", b""))
+            await send(mensaje)
+
+        peticiones_en_curso += 1
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            peticiones_en_curso -= 1
+            # El router de FastAPI deja en el scope la ruta que atendió la petición
+            ruta = scope.get("route")
+            plantilla = getattr(ruta, "path", RUTA_DESCONOCIDA)
+            metodo = scope["method"]
+            duracion_peticion.observar(time.perf_counter() - inicio, metodo, plantilla)
+            tamano_respuesta.observar(tamano, metodo, plantilla)
+            peticiones_total.incrementar(metodo, plantilla, str(estado))
+
+# ============================================================================
+# 🗄️ FUNCIONES DE CRUD
+# ============================================================================
+
+duracion_crud = Histograma("crud_duracion_segundos", "Duración de las funciones de app/repository/crud.py",
+                           ("funcion",), LIMITES_CRUD_S)
+
+
+def medir(funcion):
+    """Decorador: registra la duración de cada llamada en crud_duracion_segundos"""
+    nombre = funcion.__name__
+
+    @functools.wraps(funcion)
+    def medida(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            duracion_crud.observar(time.perf_counter() - inicio, nombre)
+
+    return medida
@@ -0,0 +1,209 @@
+"""
+Perfilado por muestreo de una petición, a pedido
+
+Para investigar una ruta lenta con los datos reales de un usuario
+(/dashboard, /creditos/detalle/{id}, ...) se pide el perfil en la misma
+petición, con el token de PERFIL_TOKEN:
+
+    curl -H "X-Perfil: <token>" https://.../dashboard
+    https://.../creditos/detalle/7?perfil=<token>
+
+Mientras dura esa petición, un hilo toma cada PERFIL_INTERVALO_MS la pila
+de los hilos que la están atendiendo (mientras tanto el intervalo de cambio
+de hilo del intérprete baja al mismo valor, para que el muestreador tenga
+el GIL a tiempo):
+
+    - el event loop, solo cuando ejecuta esta petición (middlewares y rutas async)
+    - el hilo del threadpool que corre la ruta síncrona, con sus llamadas
+      a crud y el render de Jinja2
+
+Otras peticiones concurrentes no se mezclan: una pila cuenta solo si pasa
+por el frame de este middleware o por el de la ruta con el mismo Request.
+
+El perfil se guarda en PERFIL_DIR en formato "folded" (una pila por línea
+con su cantidad de muestras), el que leen flamegraph.pl, speedscope e
+inferno. La respuesta trae el nombre del archivo en la cabecera X-Perfil.
+
+Sin PERFIL_TOKEN, main.py no instala el middleware: no cuesta nada.
+Se perfila una petición a la vez; si ya hay otra, la respuesta trae
+"X-Perfil: ocupado".
+
+Variables de entorno:
+    PERFIL_TOKEN         token que habilita el perfilado (sin definir = deshabilitado)
+    PERFIL_DIR           directorio de los perfiles (por defecto <tmp>/perfiles)
+    PERFIL_INTERVALO_MS  milisegundos entre muestras (por defecto 1)
+    PERFIL_MAX_S         segundos máximos de muestreo por petición (por defecto 30)
+"""
+import hmac
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Optional
+from urllib.parse import parse_qs
+
+from starlette.datastructures import MutableHeaders
+
+log = logging.getLogger(__name__)
+
+PERFIL_TOKEN = os.getenv("PERFIL_TOKEN", "")
+PERFIL_DIR = os.getenv("PERFIL_DIR", os.path.join(tempfile.gettempdir(), "perfiles"))
+PERFIL_INTERVALO_S = float(os.getenv("PERFIL_INTERVALO_MS", "1")) / 1000
+PERFIL_MAX_S = float(os.getenv("PERFIL_MAX_S", "30"))
+
+CABECERA = b"x-perfil"
+PARAMETRO = "perfil"
+
+_raiz = os.path.abspath(os.curdir) + os.sep
+_un_perfil_a_la_vez = threading.Lock()
+_nombres: Dict[object, str] = {}
+
+
+def habilitado() -> bool:
+    return bool(PERFIL_TOKEN)
+
+
+def _nombre_frame(codigo) -> str:
+    """funcion (archivo:línea), con rutas relativas al proyecto o a site-packages"""
+    nombre = _nombres.get(codigo)
+    if nombre is None:
+        archivo = codigo.co_filename
+        if archivo.startswith(_raiz):
+            archivo = archivo[len(_raiz):]
+        elif "site-packages" in archivo:
+            archivo = archivo.split("site-packages" + os.sep, 1)[-1]
+        # ";" separa los frames de una pila en el formato folded
+        nombre = f"{codigo.co_qualname} ({archivo}:{codigo.co_firstlineno})".replace(";", ":")
+        _nombres[codigo] = nombre
+    return nombre
+
+
+def _token_pedido(scope) -> Optional[str]:
+    for nombre, valor in scope["headers"]:
+        if nombre == CABECERA:
+            return valor.decode("latin-1")
+    consulta = scope.get("query_string", b"")
+    if b"perfil=" in consulta:
+        return parse_qs(consulta.decode("latin-1")).get(PARAMETRO, [None])[0]
+    return None
+
+
+class PerfilPeticion:
+    """Muestreo de las pilas que atienden una petición"""
+
+    def __init__(self, scope, marco):
+        self.scope = scope
+        # Frame del middleware: está en la pila del event loop solo mientras corre esta petición
+        self.marco = marco
+        self.muestras: Counter = Counter()
+        self.inicio = time.perf_counter()
+        # Frames de la ruta (hilos del threadpool) ya revisados: ¿atienden esta petición?
+        self._frames_ruta: Dict[object, bool] = {}
+        self._fin = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, name="perfilador", daemon=True)
+
+    def iniciar(self):
+        # Con el intervalo de cambio de hilo por defecto (5 ms) el muestreador
+        # no conseguiría el GIL más seguido: se acorta solo mientras se perfila
+        self._intervalo_gil = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._intervalo_gil, PERFIL_INTERVALO_S))
+        self._hilo.start()
+
+    def detener(self):
+        self._fin.set()
+        self._hilo.join()
+        sys.setswitchinterval(self._intervalo_gil)
+
+    def _es_de_la_peticion(self, frame) -> bool:
+        propio = self._frames_ruta.get(frame)
+        if propio is None:
+            variables = frame.f_locals
+            request = variables.get("request")
+            if request is None:
+                # Rutas envueltas por un decorador: los argumentos llegan en **kwargs
+                request = (variables.get("kwargs") or {}).get("request")
+            propio = self._frames_ruta[frame] = getattr(request, "scope", None) is self.scope
+        return propio
+
+    def _pila(self, frame, codigo_ruta) -> Optional[tuple]:
+        """Códigos de la pila desde la raíz de la petición, o None si el hilo atiende otra cosa"""
+        codigos = []
+        while frame is not None:
+            codigos.append(frame.f_code)
+            if frame is self.marco:
+                return tuple(reversed(codigos))
+            if frame.f_code is codigo_ruta and self._es_de_la_peticion(frame):
+                codigos.append("threadpool")
+                return tuple(reversed(codigos))
+            frame = frame.f_back
+        return None
+
+    def _muestrear(self):
+        propio = threading.get_ident()
+        limite = self.inicio + PERFIL_MAX_S
+        while not self._fin.wait(PERFIL_INTERVALO_S) and time.perf_counter() < limite:
+            # El router deja la función de la ruta en el scope antes de llamarla
+            codigo_ruta = getattr(self.scope.get("endpoint"), "__code__", None)
+            for hilo, frame in sys._current_frames().items():
+                if hilo == propio:
+                    continue
+                pila = self._pila(frame, codigo_ruta)
+                if pila is not None:
+                    self.muestras[pila] += 1
+
+    def guardar(self, ruta: str):
+        """Escribe el perfil en formato folded (pila;...;frame cantidad)"""
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            for pila, cantidad in self.muestras.most_common():
+                nombres = (c if isinstance(c, str) else _nombre_frame(c) for c in pila)
+                archivo.write(f"{';'.join(nombres)} {cantidad}\n")
+
+
+class PerfiladorMiddleware:
+    """Perfila las peticiones que traen el token de PERFIL_TOKEN (cabecera X-Perfil o ?perfil=)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _token_pedido(scope)
+        if token is None or not hmac.compare_digest(token, PERFIL_TOKEN):
+            await self.app(scope, receive, send)
+            return
+
+        if not _un_perfil_a_la_vez.acquire(blocking=False):
+            await self.app(scope, receive, self._con_cabecera(send, "ocupado"))
+            return
+
+        ruta = re.sub(r"\W+", "_", scope["path"]).strip("_")[:60] or "raiz"
+        nombre = f"{time.strftime('%Y%m%d-%H%M%S')}-{scope['method']}-{ruta}-{uuid.uuid4().hex[:8]}.folded"
+        perfil = PerfilPeticion(scope, sys._getframe())
+        perfil.iniciar()
+        try:
+            await self.app(scope, receive, self._con_cabecera(send, nombre))
+        finally:
+            perfil.detener()
+            _un_perfil_a_la_vez.release()
+            os.makedirs(PERFIL_DIR, exist_ok=True)
+            perfil.guardar(os.path.join(PERFIL_DIR, nombre))
+            log.info("Perfil guardado: %s", nombre, extra={
+                "ruta": f"{scope['method']} {scope['path']}",
+                "muestras": sum(perfil.muestras.values()),
+                "duracion_ms": round((time.perf_counter() - perfil.inicio) * 1000, 1),
+            })
+
+    @staticmethod
+    def _con_cabecera(send, valor: str):
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                MutableHeaders(scope=mensaje).append("X-Perfil", valor)
+            await send(mensaje)
+        return enviar
@@ -0,0 +1,216 @@
+"""
+Creación de engines: configuración y métricas del pool de conexiones
+
+crear_engine / crear_engine_async arman todos los engines de la app
+(primaria, async y réplicas). La configuración del pool se lee de
+variables de entorno y se aplica igual a todos:
+
+    DB_POOL_SIZE       conexiones que el pool mantiene abiertas (por defecto 5)
+    DB_MAX_OVERFLOW    conexiones extra permitidas en picos (por defecto 10)
+    DB_POOL_TIMEOUT    segundos esperando una conexión libre antes de error (por defecto 30)
+    DB_POOL_RECYCLE    segundos de vida de una conexión antes de reabrirla (por defecto 1800).
+                       Debe ser menor que wait_timeout de MySQL (28800 por defecto)
+    DB_POOL_PRE_PING   1/0: comprobar la conexión antes de entregarla (por defecto 1)
+
+Con SQLite (solo archivos, no :memory:) cada conexión activa claves
+foráneas, WAL y busy_timeout, para que se comporte como MySQL con varios
+hilos leyendo y escribiendo a la vez.
+
+Las clases de pool de este módulo miden cuánto tarda cada checkout en
+obtener una conexión. Con el pool lleno, ese tiempo es la espera por una
+conexión libre. Los tiempos se guardan en un histograma que se ve en
+/debug/pool y en /metrics.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Límites superiores (ms) de los intervalos del histograma de espera
+LIMITES_ESPERA_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+def _entero_env(nombre: str, defecto: int) -> int:
+    return int(os.getenv(nombre, str(defecto)))
+
+
+def opciones_pool() -> dict:
+    """Argumentos de pool para create_engine / create_async_engine"""
+    return {
+        "pool_size": _entero_env("DB_POOL_SIZE", 5),
+        "max_overflow": _entero_env("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _entero_env("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _entero_env("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1").lower() not in ("0", "false", "no"),
+    }
+
+
+class MetricasPool:
+    """Contadores de checkouts y el histograma de su tiempo de espera"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self.histograma = [0] * (len(LIMITES_ESPERA_MS) + 1)
+
+    def observar(self, segundos: float, timeout: bool = False):
+        """Registra un checkout que esperó `segundos`"""
+        with self._lock:
+            if timeout:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.espera_total += segundos
+            self.espera_max = max(self.espera_max, segundos)
+            self.histograma[bisect.bisect_left(LIMITES_ESPERA_MS, segundos * 1000)] += 1
+
+    def histograma_crudo(self) -> tuple:
+        """(cantidad por intervalo, espera total en segundos), para /metrics"""
+        with self._lock:
+            return self.histograma[:], self.espera_total
+
+    def a_dict(self) -> dict:
+        with self._lock:
+            etiquetas = [f"<={limite}ms" for limite in LIMITES_ESPERA_MS]
+            etiquetas.append(f">{LIMITES_ESPERA_MS[-1]}ms")
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "espera_media_ms": round(self.espera_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "espera_max_ms": round(self.espera_max * 1000, 3),
+                "histograma_espera": dict(zip(etiquetas, self.histograma)),
+            }
+
+
+class _MedicionCheckout:
+    """Mide el tiempo de _do_get, que es donde el pool espera una conexión libre"""
+
+    metricas: MetricasPool
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metricas = MetricasPool()
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexion = super()._do_get()
+        except exc.TimeoutError:
+            self.metricas.observar(time.perf_counter() - inicio, timeout=True)
+            raise
+        self.metricas.observar(time.perf_counter() - inicio)
+        return conexion
+
+    def recreate(self):
+        # engine.dispose() reemplaza el pool: las métricas continúan
+        nuevo = super().recreate()
+        nuevo.metricas = self.metricas
+        return nuevo
+
+
+class QueuePoolMedido(_MedicionCheckout, QueuePool):
+    """QueuePool con métricas de espera (engine síncrono)"""
+
+
+class AsyncQueuePoolMedido(_MedicionCheckout, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool con métricas de espera (engine async)"""
+
+
+# SQLAlchemy nombra el logger de cada pool por su clase (app.config.pool.QueuePoolMedido):
+# sin esto heredaría el nivel de app.* y escribiría en INFO como con echo_pool
+for _clase in (QueuePoolMedido, AsyncQueuePoolMedido):
+    logging.getLogger(f"{_clase.__module__}.{_clase.__name__}").setLevel(logging.WARNING)
+
+
+# ============================================================================
+# 🏗️ CREACIÓN DE ENGINES
+# ============================================================================
+
+# Driver async equivalente a cada backend síncrono
+DRIVERS_ASYNC = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
+
+
+def es_sqlite(url) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def url_async(url) -> str:
+    """La misma URL con el driver async del backend (pymysql -> aiomysql, pysqlite -> aiosqlite)"""
+    url = make_url(url)
+    return url.set(drivername=DRIVERS_ASYNC[url.get_backend_name()]).render_as_string(hide_password=False)
+
+
+def _validar_sqlite(url):
+    # Cada engine (síncrono, async, procesos de exportación) abriría su propia
+    # base en memoria vacía: solo sirve un archivo
+    if make_url(url).database in (None, "", ":memory:"):
+        raise ValueError("SQLite necesita un archivo (sqlite:///ruta.db), no una base en memoria")
+
+
+def _configurar_sqlite(engine):
+    """PRAGMAs de cada conexión SQLite nueva"""
+    @event.listens_for(engine, "connect")
+    def _conectar(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+
+
+def crear_engine(url, **kwargs):
+    """Engine síncrono con el pool medido y la configuración de entorno"""
+    opciones = dict(opciones_pool(), **kwargs)
+    sqlite = es_sqlite(url)
+    if sqlite:
+        _validar_sqlite(url)
+        # Las sesiones pasan entre hilos del threadpool; el pool ya evita el uso simultáneo
+        opciones.setdefault("connect_args", {"check_same_thread": False})
+    engine = create_engine(url, poolclass=QueuePoolMedido, **opciones)
+    if sqlite:
+        _configurar_sqlite(engine)
+    return engine
+
+
+def crear_engine_async(url, **kwargs):
+    """AsyncEngine con el pool medido y la configuración de entorno"""
+    opciones = dict(opciones_pool(), **kwargs)
+    sqlite = es_sqlite(url)
+    if sqlite:
+        _validar_sqlite(url)
+    engine = create_async_engine(url, poolclass=AsyncQueuePoolMedido, **opciones)
+    if sqlite:
+        _configurar_sqlite(engine.sync_engine)
+    return engine
+
+
+def estadisticas(engine) -> dict:
+    """
+    Estado actual del pool de un engine y sus métricas acumuladas
+
+    Args:
+        engine: Engine síncrono o AsyncEngine
+    """
+    pool = getattr(engine, "sync_engine", engine).pool
+    datos = {"clase": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        datos.update({
+            "tamano": pool.size(),
+            "en_uso": pool.checkedout(),
+            "libres": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "timeout_s": pool.timeout(),
+        })
+    if isinstance(pool, _MedicionCheckout):
+        datos.update(pool.metricas.a_dict())
+    return datos
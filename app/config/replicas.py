@@ -0,0 +1,207 @@
+"""
+Réplicas de lectura
+
+Las páginas de solo lectura (dashboard, listados, exportaciones) pueden
+leer de réplicas en lugar de la base primaria. get_db_lectura elige una
+réplica sana en round-robin. Si no hay réplicas configuradas o ninguna
+está sana, usa la primaria.
+
+Leer lo propio después de escribir: cada commit en la primaria guarda la
+hora en la sesión HTTP (cookie) del usuario. Durante DB_REPLICA_VENTANA
+segundos, las lecturas de ese usuario siguen en la primaria, así la página
+a la que redirige un POST ya muestra el cambio aunque la réplica vaya
+atrasada. Como va en la cookie, funciona igual con varios workers.
+
+Salud: un hilo revisa cada réplica con SELECT 1 cada DB_REPLICA_CHEQUEO
+segundos. Una réplica que falla deja de recibir lecturas hasta que vuelve
+a responder. Un error de conexión durante una petición también la marca
+como caída de inmediato.
+
+Variables de entorno:
+    DB_REPLICAS          URLs SQLAlchemy de las réplicas, separadas por coma (vacío = sin réplicas)
+    DB_REPLICA_VENTANA   segundos de lecturas en la primaria tras una escritura (por defecto 5)
+    DB_REPLICA_CHEQUEO   segundos entre chequeos de salud (por defecto 10)
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import List, Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config.pool import crear_engine
+
+log = logging.getLogger(__name__)
+
+# Clave en la sesión HTTP con la hora del último commit en la primaria
+CLAVE_ULTIMA_ESCRITURA = "ultima_escritura"
+
+
+def urls_replicas() -> List[str]:
+    """URLs de DB_REPLICAS"""
+    return [url.strip() for url in os.getenv("DB_REPLICAS", "").split(",") if url.strip()]
+
+
+class Replica:
+    """Una réplica: su engine, su fábrica de sesiones y su estado de salud"""
+
+    def __init__(self, url: str):
+        self.nombre = make_url(url).render_as_string(hide_password=True)
+        self.engine = crear_engine(url)
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.sana = True
+        self.ultimo_error: Optional[str] = None
+        self.lecturas = 0
+
+    def chequear(self) -> bool:
+        """SELECT 1 contra la réplica; actualiza y devuelve su estado"""
+        try:
+            with self.engine.connect() as conexion:
+                conexion.execute(text("SELECT 1"))
+        except exc.DBAPIError as e:
+            self.marcar_caida(e)
+        else:
+            if not self.sana:
+                log.info("Réplica %s disponible de nuevo", self.nombre)
+            self.sana = True
+        return self.sana
+
+    def marcar_caida(self, error: Exception):
+        if self.sana:
+            log.warning("Réplica %s fuera de servicio: %s", self.nombre, str(error).splitlines()[0])
+        self.sana = False
+        self.ultimo_error = str(error).splitlines()[0]
+
+
+class EnrutadorLecturas:
+    """Reparte las sesiones de lectura entre las réplicas sanas (round-robin)"""
+
+    def __init__(self, urls: List[str], ventana: float = None, intervalo_chequeo: float = None):
+        # Se leen aquí y no al importar: database.py llama a load_dotenv() después
+        self.replicas = [Replica(url) for url in urls]
+        self.ventana = ventana if ventana is not None else float(os.getenv("DB_REPLICA_VENTANA", "5"))
+        self.intervalo_chequeo = (intervalo_chequeo if intervalo_chequeo is not None
+                                  else float(os.getenv("DB_REPLICA_CHEQUEO", "10")))
+        self.lecturas_primaria = 0
+        self._turno = itertools.count()
+        self._lock = threading.Lock()
+        self._hilo: Optional[threading.Thread] = None
+
+    def _iniciar_chequeos(self):
+        """Arranca el hilo de chequeos la primera vez que se pide una réplica"""
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._chequear_siempre,
+                                              name="chequeo-replicas", daemon=True)
+                self._hilo.start()
+
+    def _chequear_siempre(self):
+        while True:
+            time.sleep(self.intervalo_chequeo)
+            self.chequear()
+
+    def chequear(self):
+        """Revisa la salud de todas las réplicas"""
+        for replica in self.replicas:
+            replica.chequear()
+
+    def elegir(self) -> Optional[Replica]:
+        """Siguiente réplica sana en round-robin, o None si no hay ninguna"""
+        if not self.replicas:
+            return None
+        self._iniciar_chequeos()
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._turno) % len(self.replicas)]
+            if replica.sana:
+                return replica
+        return None
+
+    def escritura_reciente(self, sesion_http: dict) -> bool:
+        """El usuario hizo commit en la primaria hace menos de `ventana` segundos"""
+        ultima = sesion_http.get(CLAVE_ULTIMA_ESCRITURA)
+        return ultima is not None and time.time() - ultima < self.ventana
+
+    def abrir_sesion(self, sesion_http: dict) -> Optional[Session]:
+        """
+        Sesión sobre una réplica para una petición de solo lectura
+
+        Returns:
+            La sesión, o None si la lectura debe ir a la primaria
+        """
+        replica = None if self.escritura_reciente(sesion_http) else self.elegir()
+        if replica is None:
+            self.lecturas_primaria += 1
+            return None
+        replica.lecturas += 1
+        db = replica.SessionLocal()
+        db.info["replica"] = replica
+        return db
+
+    def estadisticas(self) -> dict:
+        return {
+            "ventana_s": self.ventana,
+            "lecturas_primaria": self.lecturas_primaria,
+            "replicas": [
+                {"nombre": r.nombre, "sana": r.sana, "lecturas": r.lecturas,
+                 "ultimo_error": r.ultimo_error}
+                for r in self.replicas
+            ],
+        }
+
+
+def recordar_sesion_http(db: Session, request: Request):
+    """Asocia la sesión HTTP a una sesión de la primaria (ver _anotar_escritura)"""
+    db.info["sesion_http"] = request.session
+
+
+def crear_get_db_lectura(get_db, enrutador: EnrutadorLecturas):
+    """
+    Crea la dependencia get_db_lectura
+
+    Args:
+        get_db: Dependencia de la primaria (se usa cuando no toca réplica)
+        enrutador: Enrutador con las réplicas
+    """
+    # La sesión de la primaria llega siempre por Depends (así respeta los
+    # dependency_overrides de get_db); si no se usa, no abre conexión.
+    def get_db_lectura(request: Request, db_primaria: Session = Depends(get_db)):
+        """Sesión para rutas GET de solo lectura: réplica si es posible, si no la primaria"""
+        db = enrutador.abrir_sesion(request.session)
+        if db is None:
+            yield db_primaria
+            return
+        try:
+            yield db
+        except exc.DBAPIError as e:
+            if e.connection_invalidated or isinstance(e, exc.OperationalError):
+                db.info["replica"].marcar_caida(e)
+            raise
+        finally:
+            db.close()
+
+    return get_db_lectura
+
+# ============================================================================
+# 🔔 EVENTOS DE SESIÓN
+# ============================================================================
+
+@event.listens_for(Session, "after_commit")
+def _anotar_escritura(session):
+    """Un commit en la primaria fija la lectura en la primaria durante la ventana"""
+    sesion_http = session.info.get("sesion_http")
+    if sesion_http is not None:
+        sesion_http[CLAVE_ULTIMA_ESCRITURA] = time.time()
+
+
+@event.listens_for(Session, "before_flush")
+def _impedir_escritura_en_replica(session, flush_context, instances):
+    """Una ruta de solo lectura que intenta escribir es un error de enrutamiento"""
+    if "replica" in session.info and (session.new or session.dirty or session.deleted):
+        raise RuntimeError(
+            "Escritura en una sesión de réplica: la ruta debe usar get_db, no get_db_lectura"
+        )
@@ -1,38 +1,37 @@
-from fastapi import APIRouter, Query, Request, Form, Depends, HTTPException, status
+from fastapi import APIRouter, Query, Request, Form, Depends, HTTPException, status, UploadFile, File
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import and_
 from typing import Optional
 from datetime import date, datetime
-import bcrypt
+import logging
 from starlette.status import HTTP_303_SEE_OTHER
-from app.config.database import get_db
+from app.config.database import get_db, get_db_lectura, get_async_db, engine, async_engine, enrutador_lecturas
+from app.config import consultas, metricas, pool
 from app.schema import models, schemas
-from app.repository import crud
+from app.repository import crud, crud_async, contrasenas, resumen, cache, exportacion, trabajos, importacion
 
 
-from fastapi.responses import StreamingResponse
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from io import BytesIO
+from fastapi.responses import StreamingResponse, FileResponse
 
 
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
 
+# Cada petición escribe su línea INFO en app.peticiones (app/config/consultas.py).
+# Aquí solo va el detalle en DEBUG (ids y cantidades, nunca montos, notas ni
+# datos de formularios) y los errores.
+log = logging.getLogger(__name__)
+
 # ============================================================================
 # FUNCIONES DE AUTENTICACIÓN
 # ============================================================================
 
-def hashear_password(password: str) -> str:
-    """Hashea una contraseña usando bcrypt"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-def verificar_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifica si una contraseña coincide con su hash"""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+# El hash y la verificación de contraseñas viven en app/repository/contrasenas.py.
+# Las rutas async def usan las versiones *_async, que corren en su propio pool.
 
 # ============================================================================
 # RUTAS DE AUTENTICACIÓN
@@ -53,12 +52,12 @@ async def login(
     request: Request,
     username: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Procesar login de usuario"""
-    usuario = crud.obtener_usuario_por_username(db, username)
+    usuario = await crud_async.autenticar_usuario(db, username, password)
     
-    if usuario and verificar_password(password, usuario.password):
+    if usuario:
         request.session["usuario_id"] = usuario.id
         return RedirectResponse(url="/dashboard", status_code=HTTP_303_SEE_OTHER)
 
@@ -99,19 +98,14 @@ async def registrar_usuario(
     username: str = Form(...),
     password: str = Form(...),
     confirm_password: str = Form(...),  # Cambia el nombre para que coincida con el formulario
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Procesar registro de nuevo usuario"""
     
     try:
-        print(f"\n📝 INTENTANDO REGISTRAR USUARIO:")
-        print(f"  Nombre: {nombre}")
-        print(f"  Email: {email}")
-        print(f"  Username: {username}")
-        
         # 1. Verificar que las contraseñas coincidan
         if password != confirm_password:
-            print("❌ Las contraseñas no coinciden")
+            log.debug("Registro rechazado: las contraseñas no coinciden")
             return templates.TemplateResponse("register.html", {
                 "request": request,
                 "error": "Las contraseñas no coinciden"
@@ -119,32 +113,31 @@ async def registrar_usuario(
         
         # 2. Validar longitud mínima de contraseña
         if len(password) < 6:
-            print(f"❌ Contraseña muy corta: {len(password)} caracteres")
+            log.debug("Registro rechazado: contraseña muy corta")
             return templates.TemplateResponse("register.html", {
                 "request": request,
                 "error": "La contraseña debe tener al menos 6 caracteres"
             })
         
         # 3. Verificar si el usuario ya existe
-        usuario_existente = crud.obtener_usuario_por_username(db, username)
+        usuario_existente = await crud_async.obtener_usuario_por_username(db, username)
         if usuario_existente:
-            print(f"❌ Usuario '{username}' ya existe")
+            log.debug("Registro rechazado: usuario ya existe")
             return templates.TemplateResponse("register.html", {
                 "request": request,
                 "error": "El nombre de usuario ya está en uso"
             })
         
         # 4. Verificar si el email ya existe
-        email_existente = crud.obtener_usuario_por_email(db, email)
+        email_existente = await crud_async.obtener_usuario_por_email(db, email)
         if email_existente:
-            print(f"❌ Email '{email}' ya registrado")
+            log.debug("Registro rechazado: email ya registrado")
             return templates.TemplateResponse("register.html", {
                 "request": request,
                 "error": "El email ya está registrado"
             })
         
         # 5. Crear el usuario
-        print("✅ Validaciones pasadas, creando usuario...")
         usuario_data = schemas.UsuarioCreate(
             nombre=nombre,
             email=email,
@@ -152,8 +145,8 @@ async def registrar_usuario(
             password=password
         )
         
-        nuevo_usuario = crud.crear_usuario(db, usuario_data)
-        print(f"✅ Usuario creado exitosamente con ID: {nuevo_usuario.id}")
+        nuevo_usuario = await crud_async.crear_usuario(db, usuario_data)
+        log.debug("Usuario creado", extra={"usuario_id": nuevo_usuario.id})
         
         # 6. Mostrar mensaje de éxito y redirigir al login después de 3 segundos
         return templates.TemplateResponse("register.html", {
@@ -163,9 +156,7 @@ async def registrar_usuario(
         })
         
     except Exception as e:
-        print(f"\n❌ ERROR CRÍTICO AL REGISTRAR USUARIO: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error al registrar usuario")
         return templates.TemplateResponse("register.html", {
             "request": request,
             "error": f"Error al crear la cuenta: {str(e)}"
@@ -176,7 +167,7 @@ async def registrar_usuario(
 # ============================================================================
 
 @router.get("/dashboard", response_class=HTMLResponse)
-def dashboard(request: Request, db: Session = Depends(get_db)):
+def dashboard(request: Request, db: Session = Depends(get_db_lectura)):
     """Mostrar dashboard principal"""
     usuario_id = request.session.get("usuario_id")
     if not usuario_id:
@@ -186,7 +177,7 @@ def dashboard(request: Request, db: Session = Depends(get_db)):
     if not usuario:
         return RedirectResponse(url="/login", status_code=303)
 
-    stats = crud.obtener_estadisticas_dashboard(db, usuario_id)
+    stats = crud.obtener_estadisticas_dashboard_cacheadas(db, usuario_id)
     
     return templates.TemplateResponse("dashboard.html", {
         "request": request,
@@ -202,8 +193,8 @@ def dashboard(request: Request, db: Session = Depends(get_db)):
 @router.get("/ingresos")
 def listar_ingresos(
     request: Request, 
-    db: Session = Depends(get_db), 
-    page: int = 1,
+    db: Session = Depends(get_db_lectura), 
+    cursor: Optional[str] = None,
     tipo: Optional[str] = None,
     estado: Optional[str] = None  # Cambia 'pagado' por 'estado'
 ):
@@ -213,7 +204,7 @@ def listar_ingresos(
     Args:
         request: Request de FastAPI
         db: Sesión de base de datos
-        page: Número de página (por defecto 1)
+        cursor: Token de la página (None = primera página)
         tipo: Tipo de categoría para filtrar (fijo, variable, opcional)
         estado: Estado para filtrar ('recibido', 'pendiente', o None)
     """
@@ -221,9 +212,6 @@ def listar_ingresos(
     if not usuario_id:
         return RedirectResponse(url="/login", status_code=303)
     
-    print(f"\n=== LISTANDO INGRESOS PARA USUARIO ID: {usuario_id} ===")
-    print(f"Filtros recibidos - tipo: '{tipo}', estado: '{estado}'")
-    
     # Validar que el estado sea 'recibido' o 'pendiente'
     estado_filtro = None
     if estado is not None and estado != "":
@@ -232,20 +220,20 @@ def listar_ingresos(
         elif estado.lower() == 'pendiente':
             estado_filtro = 'pendiente'
         else:
-            print(f"⚠️  Valor inválido para 'estado': '{estado}', ignorando filtro")
-    
-    print(f"Filtro 'estado' procesado: {estado_filtro}")
+            log.debug("Valor inválido para 'estado', se ignora el filtro")
     
     # Obtener ingresos del usuario actual
     data = crud.obtener_ingresos_paginados(
         db, 
         usuario_id,
-        page=page, 
+        cursor=cursor,
+        por_cursor=True,
         tipo=tipo,
         estado=estado_filtro  # Cambia 'pagado' por 'estado'
     )
     
-    print(f"Total ingresos encontrados: {len(data['ingresos'])}")
+    log.debug("Listado de ingresos", extra={"usuario_id": usuario_id, "tipo": tipo,
+                                            "estado": estado_filtro, "filas": len(data['ingresos'])})
     
     mensaje = request.session.pop("mensaje", None)
     
@@ -254,8 +242,8 @@ def listar_ingresos(
         {
             "request": request,
             "ingresos": data["ingresos"],
-            "total_pages": data["total_pages"],
-            "current_page": page,
+            "cursor_siguiente": data["cursor_siguiente"],
+            "cursor_anterior": data["cursor_anterior"],
             "filtro_tipo": tipo,
             "filtro_estado": estado,  # Mantener el string original para el template
             "mensaje": mensaje
@@ -300,10 +288,6 @@ def crear_ingreso(
         return RedirectResponse(url="/login", status_code=303)
 
     try:
-        print(f"\n{'='*60}")
-        print(f"➕ CREANDO NUEVO INGRESO")
-        print(f"{'='*60}")
-        
         # Validaciones básicas
         if not fecha or fecha.strip() == "":
             raise ValueError("❌ ERROR: La fecha es requerida")
@@ -327,10 +311,8 @@ def crear_ingreso(
         ).first()
         
         if categoria_existente:
-            print(f"✅ Usando categoría existente: '{categoria_existente.nombre}'")
             categoria_id = categoria_existente.id
         else:
-            print(f"➕ Creando nueva categoría: '{categoria_nombre}'")
             nueva_categoria = models.Categoria(
                 nombre=categoria_nombre,
                 tipo=tipo,
@@ -353,9 +335,11 @@ def crear_ingreso(
         )
         
         db.add(nuevo_ingreso)
+        resumen.registrar(db, 'ingreso', resumen.datos_ingreso(nuevo_ingreso))
         db.commit()
         
-        print(f"✅ Ingreso creado exitosamente con ID: {nuevo_ingreso.id}")
+        log.debug("Ingreso creado", extra={"ingreso_id": nuevo_ingreso.id,
+                                           "categoria_nueva": categoria_existente is None})
         
         request.session['mensaje'] = {
             'tipo': 'exito',
@@ -364,9 +348,7 @@ def crear_ingreso(
         }
         
     except Exception as e:
-        print(f"\n❌ ERROR: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error al crear ingreso")
         db.rollback()
         request.session['mensaje'] = {
             'tipo': 'error',
@@ -422,22 +404,9 @@ def editar_ingreso(
         return RedirectResponse(url="/login", status_code=303)
 
     try:
-        print(f"\n{'='*60}")
-        print(f"📝 INICIANDO EDICIÓN DE INGRESO ID: {id}")
-        print(f"{'='*60}")
-        
         # ============================================
         # 1. VALIDACIÓN DE DATOS DE ENTRADA
         # ============================================
-        print(f"\n📋 DATOS RECIBIDOS DEL FORMULARIO:")
-        print(f"  - ID: {id}")
-        print(f"  - Valor: {valor}")
-        print(f"  - Fecha: {fecha}")
-        print(f"  - Categoría: '{categoria}'")
-        print(f"  - Tipo: '{tipo}'")
-        print(f"  - Estado: '{estado}'")
-        print(f"  - Notas: '{notas}'")
-        
         # Validaciones...
         if not fecha or fecha.strip() == "":
             raise ValueError("❌ ERROR: La fecha es requerida")
@@ -465,25 +434,11 @@ def editar_ingreso(
         if not ingreso:
             raise HTTPException(status_code=404, detail="Ingreso no encontrado")
         
-        print(f"\n📄 INGRESO ACTUAL EN BD:")
-        print(f"  - ID: {ingreso.id}")
-        print(f"  - Categoría ID actual: {ingreso.categoria_id}")
-        
-        # Obtener categoría actual
-        categoria_actual = db.query(models.Categoria).filter(
-            models.Categoria.id == ingreso.categoria_id
-        ).first() if ingreso.categoria_id else None
-        
-        if categoria_actual:
-            print(f"  - Categoría actual: '{categoria_actual.nombre}' ({categoria_actual.tipo})")
+        datos_resumen_antes = resumen.datos_ingreso(ingreso)
         
         # ============================================
         # 3. MANEJO DE CATEGORÍA (CORREGIDO - NO MODIFICA EXISTENTES)
         # ============================================
-        print(f"\n🔍 MANEJO DE CATEGORÍA:")
-        print(f"   Nombre solicitado: '{categoria_nombre}'")
-        print(f"   Tipo solicitado: '{tipo}'")
-        
         # IMPORTANTE: Siempre buscar categoría por NOMBRE + TIPO
         # NO modificamos categorías existentes, buscamos o creamos una nueva
         
@@ -495,28 +450,9 @@ def editar_ingreso(
         ).first()
         
         if categoria_existente:
-            print(f"✅ Encontrada categoría existente:")
-            print(f"   ID: {categoria_existente.id}")
-            print(f"   Nombre: '{categoria_existente.nombre}'")
-            print(f"   Tipo: '{categoria_existente.tipo}'")
             categoria_id = categoria_existente.id
         else:
             # Crear NUEVA categoría con nombre + tipo
-            print(f"➕ Creando NUEVA categoría:")
-            print(f"   Nombre: '{categoria_nombre}'")
-            print(f"   Tipo: '{tipo}'")
-            
-            # Verificar si ya existe una categoría con este nombre pero diferente tipo
-            misma_nombre_diferente_tipo = db.query(models.Categoria).filter(
-                models.Categoria.nombre == categoria_nombre,
-                models.Categoria.usuario_id == usuario_id,
-                models.Categoria.tipo != tipo
-            ).first()
-            
-            if misma_nombre_diferente_tipo:
-                print(f"⚠️  Ya existe categoría '{categoria_nombre}' con tipo '{misma_nombre_diferente_tipo.tipo}'")
-                print(f"   Creando nueva categoría con tipo diferente")
-            
             nueva_categoria = models.Categoria(
                 nombre=categoria_nombre,
                 tipo=tipo,
@@ -525,50 +461,27 @@ def editar_ingreso(
             db.add(nueva_categoria)
             db.flush()
             categoria_id = nueva_categoria.id
-            
-            print(f"✅ Nueva categoría creada con ID: {categoria_id}")
         
         # ============================================
         # 4. ACTUALIZACIÓN SOLO DEL INGRESO ACTUAL
         # ============================================
-        print(f"\n🔄 ACTUALIZANDO INGRESO (solo este):")
-        
         cambios = []
         
         # Solo comparar si el ID de categoría cambió
         if ingreso.categoria_id != categoria_id:
-            print(f"   🏷️  Categoría ID: {ingreso.categoria_id} → {categoria_id}")
-            
-            # Obtener info de la categoría anterior y nueva para el log
-            cat_vieja = db.query(models.Categoria).filter(
-                models.Categoria.id == ingreso.categoria_id
-            ).first() if ingreso.categoria_id else None
-            
-            cat_nueva = db.query(models.Categoria).filter(
-                models.Categoria.id == categoria_id
-            ).first()
-            
-            if cat_vieja and cat_nueva:
-                print(f"   📝 Categoría: '{cat_vieja.nombre}' ({cat_vieja.tipo}) → '{cat_nueva.nombre}' ({cat_nueva.tipo})")
-            elif cat_nueva:
-                print(f"   📝 Nueva categoría: '{cat_nueva.nombre}' ({cat_nueva.tipo})")
-            
             ingreso.categoria_id = categoria_id
             cambios.append("categoría")
         
         # Verificar otros campos
         if float(ingreso.valor) != float(valor):
-            print(f"   💰 Valor: {ingreso.valor} → {valor}")
             ingreso.valor = valor
             cambios.append("valor")
         
         if ingreso.fecha != fecha_dt:
-            print(f"   📅 Fecha: {ingreso.fecha} → {fecha_dt}")
             ingreso.fecha = fecha_dt
             cambios.append("fecha")
         
         if ingreso.estado != estado:
-            print(f"   ✅ Estado: '{ingreso.estado}' → '{estado}'")
             ingreso.estado = estado
             cambios.append("estado")
         
@@ -576,34 +489,17 @@ def editar_ingreso(
         notas_nueva = notas if notas else ""
         
         if notas_actual.strip() != notas_nueva.strip():
-            print(f"   📝 Notas: '{notas_actual}' → '{notas_nueva}'")
             ingreso.notas = notas
             cambios.append("notas")
         
         # ============================================
-        # 5. GUARDAR CAMBIOS Y VERIFICAR
+        # 5. GUARDAR CAMBIOS
         # ============================================
         if not cambios:
-            print(f"\nℹ️  No hay cambios detectados. Nada que actualizar.")
             mensaje_usuario = "ℹ️  No se realizaron cambios"
         else:
-            print(f"\n✅ Cambios a realizar ({len(cambios)}): {', '.join(cambios)}")
+            resumen.mover(db, 'ingreso', datos_resumen_antes, resumen.datos_ingreso(ingreso))
             db.commit()
-            print(f"💾 Cambios guardados en la base de datos")
-            
-            # Verificar que solo este ingreso se modificó
-            print(f"\n📊 VERIFICACIÓN POST-COMMIT:")
-            print(f"   Ingreso ID {id} actualizado correctamente")
-            
-            # Verificar que otras categorías no se modificaron
-            if 'categoría' in cambios:
-                # Contar cuántos ingresos usan la categoría vieja vs nueva
-                ingresos_categoria_vieja = db.query(models.Ingreso).filter(
-                    models.Ingreso.categoria_id == ingreso.categoria_id
-                ).count() if ingreso.categoria_id else 0
-                
-                print(f"   {ingresos_categoria_vieja} ingresos usan ahora esta categoría")
-            
             mensaje_usuario = f"✅ Ingreso actualizado. Campos modificados: {', '.join(cambios)}"
         
         # ============================================
@@ -614,12 +510,10 @@ def editar_ingreso(
             'titulo': '¡Éxito!',
             'texto': mensaje_usuario
         }
-        
-        print(f"\n🎯 {mensaje_usuario}")
-        print(f"{'='*60}")
+        log.debug("Ingreso editado", extra={"ingreso_id": id, "cambios": ",".join(cambios) or "ninguno"})
         
     except ValueError as e:
-        print(f"\n❌ ERROR DE VALIDACIÓN: {str(e)}")
+        log.debug("Edición de ingreso rechazada: %s", e)
         db.rollback()
         request.session['mensaje'] = {
             'tipo': 'error',
@@ -628,7 +522,7 @@ def editar_ingreso(
         }
         
     except HTTPException as e:
-        print(f"\n❌ ERROR HTTP: {e.detail}")
+        log.debug("Edición de ingreso rechazada: %s", e.detail)
         db.rollback()
         request.session['mensaje'] = {
             'tipo': 'error',
@@ -637,9 +531,7 @@ def editar_ingreso(
         }
         
     except Exception as e:
-        print(f"\n❌ ERROR INESPERADO: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error al editar ingreso %s", id)
         db.rollback()
         request.session['mensaje'] = {
             'tipo': 'error',
@@ -766,6 +658,35 @@ def reparar_ingresos_route(
         "message": f"Se repararon {problemas} ingresos con categorías faltantes"
     }
 
+@router.get("/debug/cache")
+def debug_cache(request: Request):
+    """Endpoint para debug: aciertos y fallos de las cachés en memoria (exige METRICAS_TOKEN)"""
+    if not metricas.autorizado(request, sin_token=False):
+        return JSONResponse({"detail": "No autorizado"}, status_code=401)
+
+    return {
+        "caches": cache.estadisticas(),
+        "exportaciones": trabajos.estadisticas(),
+        "contrasenas": contrasenas.estadisticas()
+    }
+
+@router.get("/debug/pool")
+def debug_pool(request: Request):
+    """Endpoint para debug: estado del pool de conexiones y espera por conexión libre (exige METRICAS_TOKEN)"""
+    if not metricas.autorizado(request, sin_token=False):
+        return JSONResponse({"detail": "No autorizado"}, status_code=401)
+
+    return {
+        "sync": pool.estadisticas(engine),
+        "async": pool.estadisticas(async_engine),
+        "replicas": {
+            replica.nombre: pool.estadisticas(replica.engine)
+            for replica in enrutador_lecturas.replicas
+        },
+        "enrutamiento": enrutador_lecturas.estadisticas(),
+        "consultas": consultas.estadisticas()
+    }
+
 # ============================================================================
 # RUTAS DE GASTOS (MANTENIDAS)
 # ============================================================================
@@ -773,8 +694,8 @@ def reparar_ingresos_route(
 @router.get("/gastos")
 def listar_gastos(
     request: Request,
-    db: Session = Depends(get_db),
-    page: int = 1,
+    db: Session = Depends(get_db_lectura),
+    cursor: Optional[str] = None,
     tipo: Optional[str] = None,
     pagado: Optional[str] = None  # Cambia de bool a Optional[str]
 ):
@@ -783,9 +704,6 @@ def listar_gastos(
     if not usuario_id:
         return RedirectResponse(url="/login", status_code=303)
     
-    print(f"\n=== LISTANDO GASTOS PARA USUARIO ID: {usuario_id} ===")
-    print(f"Filtros recibidos - tipo: '{tipo}', pagado: '{pagado}'")
-    
     # Convertir parámetro 'pagado' de string a booleano o None
     pagado_bool = None
     if pagado is not None and pagado != "":
@@ -794,17 +712,18 @@ def listar_gastos(
         elif pagado.lower() == 'false':
             pagado_bool = False
         else:
-            print(f"⚠️  Valor inválido para 'pagado': '{pagado}', ignorando filtro")
-    
-    print(f"Filtro 'pagado' convertido a booleano: {pagado_bool}")
+            log.debug("Valor inválido para 'pagado', se ignora el filtro")
     
     data = crud.obtener_gastos_paginados(
         db,
         usuario_id,
-        page=page,
+        cursor=cursor,
+        por_cursor=True,
         tipo=tipo,
         pagado=pagado_bool  # Pasar el booleano convertido
     )
+    log.debug("Listado de gastos", extra={"usuario_id": usuario_id, "tipo": tipo,
+                                          "pagado": pagado_bool, "filas": len(data["gastos"])})
     
     mensaje = request.session.pop("mensaje", None)
     
@@ -813,8 +732,8 @@ def listar_gastos(
         {
             "request": request,
             "gastos": data["gastos"],
-            "total_pages": data["total_pages"],
-            "current_page": page,
+            "cursor_siguiente": data["cursor_siguiente"],
+            "cursor_anterior": data["cursor_anterior"],
             "filtro_tipo": tipo,
             "filtro_pagado": pagado,  # Mantener el string original para el template
             "mensaje": mensaje
@@ -865,10 +784,6 @@ def guardar_gasto(
         return RedirectResponse(url="/login", status_code=303)
 
     try:
-        print(f"\n{'='*60}")
-        print(f"{'📝 EDITANDO GASTO' if id else '➕ CREANDO NUEVO GASTO'}")
-        print(f"{'='*60}")
-        
         # Normalizar datos
         categoria_nombre_clean = categoria_nombre.strip()
         
@@ -886,10 +801,8 @@ def guardar_gasto(
         ).first()
         
         if categoria_existente:
-            print(f"✅ Usando categoría existente: '{categoria_existente.nombre}' ({categoria_existente.tipo})")
             categoria_id = categoria_existente.id
         else:
-            print(f"➕ Creando nueva categoría: '{categoria_nombre_clean}' ({tipo_categoria})")
             nueva_categoria = models.Categoria(
                 nombre=categoria_nombre_clean,
                 tipo=tipo_categoria,
@@ -916,6 +829,8 @@ def guardar_gasto(
             # Crear nuevo gasto
             crud.crear_gasto(db, gasto=gasto_data, usuario_id=usuario_id)
             mensaje = "Gasto creado correctamente"
+        log.debug("Gasto guardado", extra={"gasto_id": id, "nuevo": not id,
+                                           "categoria_nueva": categoria_existente is None})
 
         request.session['mensaje'] = {
             'tipo': 'exito',
@@ -924,9 +839,7 @@ def guardar_gasto(
         }
         
     except Exception as e:
-        print(f"\n❌ ERROR: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error al guardar gasto")
         db.rollback()
         request.session['mensaje'] = {
             'tipo': 'error',
@@ -968,14 +881,14 @@ async def listar_pendientes(
     request: Request,
     estado: Optional[str] = None,
     prioridad: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Listar pendientes del usuario"""
     usuario_id = request.session.get("usuario_id")
     if not usuario_id:
         return RedirectResponse(url="/login", status_code=HTTP_303_SEE_OTHER)
 
-    pendientes = crud.get_pendientes_by_filters(
+    pendientes = await crud_async.get_pendientes_by_filters(
         db,
         usuario_id=usuario_id,
         estado=estado,
@@ -1002,7 +915,7 @@ async def listar_pendientes(
 async def form_pendiente(
     request: Request,
     pendiente_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Mostrar formulario para crear/editar pendiente"""
     usuario_id = request.session.get("usuario_id")
@@ -1011,7 +924,7 @@ async def form_pendiente(
 
     pendiente = None
     if pendiente_id:
-        pendiente = crud.get_pendiente(db, pendiente_id)
+        pendiente = await crud_async.get_pendiente(db, pendiente_id)
         if not pendiente or pendiente.usuario_id != usuario_id:
             raise HTTPException(status_code=404, detail="Pendiente no encontrado")
 
@@ -1033,7 +946,7 @@ async def guardar_pendiente(
     prioridad: str = Form(...),
     fecha_limite: Optional[str] = Form(None),
     recordatorio: Optional[str] = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Guardar pendiente (crear o actualizar)"""
     usuario_id = request.session.get("usuario_id")
@@ -1054,10 +967,10 @@ async def guardar_pendiente(
 
     try:
         if id:
-            pendiente = crud.update_pendiente(db, pendiente_id=id, pendiente=pendiente_data)
+            pendiente = await crud_async.update_pendiente(db, pendiente_id=id, pendiente=pendiente_data)
             mensaje = "Pendiente actualizado correctamente"
         else:
-            pendiente = crud.create_pendiente(db, pendiente=pendiente_data, usuario_id=usuario_id)
+            pendiente = await crud_async.create_pendiente(db, pendiente=pendiente_data, usuario_id=usuario_id)
             mensaje = "Pendiente creado correctamente"
 
         request.session['mensaje'] = {
@@ -1078,18 +991,18 @@ async def guardar_pendiente(
 async def eliminar_pendiente(
     request: Request,
     pendiente_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Eliminar un pendiente"""
     usuario_id = request.session.get("usuario_id")
     if not usuario_id:
         return RedirectResponse(url="/login", status_code=HTTP_303_SEE_OTHER)
 
-    pendiente = crud.get_pendiente(db, pendiente_id)
+    pendiente = await crud_async.get_pendiente(db, pendiente_id)
     if not pendiente or pendiente.usuario_id != usuario_id:
         raise HTTPException(status_code=404, detail="Pendiente no encontrado")
 
-    crud.delete_pendiente(db, pendiente_id)
+    await crud_async.delete_pendiente(db, pendiente_id)
     request.session["mensaje"] = {
         "tipo": "exito",
         "titulo": "¡Eliminado!",
@@ -1104,7 +1017,7 @@ async def eliminar_pendiente(
 @router.get("/contrasenas", response_class=HTMLResponse)
 def listar_contrasenas(
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_lectura),
     page: int = 1,
     items_per_page: int = 10
 ):
@@ -1113,22 +1026,12 @@ def listar_contrasenas(
     if not usuario_id:
         return RedirectResponse(url="/login", status_code=303)
     
-    contrasenas = crud.obtener_contrasenas_usuario(db, usuario_id)
-    
-    # Calcular paginación
-    total_items = len(contrasenas)
-    total_pages = (total_items + items_per_page - 1) // items_per_page if total_items > 0 else 1
-    
-    # Ajustar página
-    if page < 1:
-        page = 1
-    elif page > total_pages and total_pages > 0:
-        page = total_pages
-    
-    # Obtener elementos para la página actual
-    start_idx = (page - 1) * items_per_page
-    end_idx = start_idx + items_per_page
-    contrasenas_pagina = contrasenas[start_idx:end_idx]
+    data = crud.obtener_contrasenas_paginadas(
+        db,
+        usuario_id,
+        page=page,
+        per_page=items_per_page
+    )
     
     mensaje = request.session.pop("mensaje", None)
     
@@ -1136,11 +1039,11 @@ def listar_contrasenas(
         "contrasenas_listado.html",
         {
             "request": request,
-            "contrasenas": contrasenas_pagina,
-            "total_pages": total_pages,
-            "current_page": page,
+            "contrasenas": data["contrasenas"],
+            "total_pages": data["total_pages"],
+            "current_page": data["current_page"],
             "items_per_page": items_per_page,
-            "total_items": total_items,
+            "total_items": data["total_items"],
             "mensaje": mensaje
         }
     )
@@ -1277,19 +1180,20 @@ def obtener_contrasena_desencriptada(
 @router.get("/cumpleanos", response_class=HTMLResponse)
 async def listar_cumpleanos(
     request: Request,
-    page: int = 1,
+    cursor: Optional[str] = None,
     relacion: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Listar cumpleaños"""
     usuario_id = request.session.get("usuario_id")
     if not usuario_id:
         return RedirectResponse("/", status_code=303)
     
-    resultado = crud.obtener_cumpleanos_paginados(
+    resultado = await crud_async.obtener_cumpleanos_paginados(
         db,
         usuario_id=usuario_id,
-        page=page,
+        cursor=cursor,
+        por_cursor=True,
         per_page=10,
         relacion=relacion
     )
@@ -1303,8 +1207,8 @@ async def listar_cumpleanos(
     return templates.TemplateResponse("cumpleanos_listado.html", {
         "request": request,
         "cumpleanos": resultado["cumpleanos"],
-        "current_page": resultado["current_page"],
-        "total_pages": resultado["total_pages"],
+        "cursor_siguiente": resultado["cursor_siguiente"],
+        "cursor_anterior": resultado["cursor_anterior"],
         "filtro_relacion": relacion
     })
 
@@ -1324,14 +1228,14 @@ async def formulario_nuevo_cumpleano(request: Request):
 async def formulario_editar_cumpleano(
     request: Request,
     cumpleano_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Mostrar formulario para editar cumpleaño"""
     usuario_id = request.session.get("usuario_id")
     if not usuario_id:
         return RedirectResponse("/", status_code=303)
     
-    cumpleano = crud.obtener_cumpleano(db, cumpleano_id)
+    cumpleano = await crud_async.obtener_cumpleano(db, cumpleano_id)
     if not cumpleano or cumpleano.usuario_id != usuario_id:
         return RedirectResponse("/cumpleanos", status_code=303)
     
@@ -1343,7 +1247,7 @@ async def formulario_editar_cumpleano(
 @router.post("/cumpleanos/guardar")
 async def guardar_cumpleano(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Guardar cumpleaño (crear o actualizar)"""
     usuario_id = request.session.get("usuario_id")
@@ -1365,10 +1269,10 @@ async def guardar_cumpleano(
     
     if cumpleano_id:
         # Actualizar
-        crud.actualizar_cumpleano(db, int(cumpleano_id), schemas.CumpleanoUpdate(**cumpleano_data.model_dump()), usuario_id)
+        await crud_async.actualizar_cumpleano(db, int(cumpleano_id), schemas.CumpleanoUpdate(**cumpleano_data.model_dump()), usuario_id)
     else:
         # Crear nuevo
-        crud.crear_cumpleano(db, cumpleano_data, usuario_id)
+        await crud_async.crear_cumpleano(db, cumpleano_data, usuario_id)
     
     return RedirectResponse("/cumpleanos", status_code=303)
 
@@ -1376,14 +1280,14 @@ async def guardar_cumpleano(
 async def eliminar_cumpleano(
     request: Request,
     cumpleano_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Eliminar un cumpleaño"""
     usuario_id = request.session.get("usuario_id")
     if not usuario_id:
         return RedirectResponse("/", status_code=303)
     
-    crud.eliminar_cumpleano(db, cumpleano_id, usuario_id)
+    await crud_async.eliminar_cumpleano(db, cumpleano_id, usuario_id)
     return RedirectResponse("/cumpleanos", status_code=303)
 
 # ============================================================================
@@ -1397,9 +1301,7 @@ async def debug_form(request: Request):
     Útil para verificar qué datos está enviando el formulario
     """
     form_data = await request.form()
-    print("\n📋 DEBUG - DATOS RECIBIDOS DEL FORMULARIO:")
-    for key, value in form_data.items():
-        print(f"  {key}: {value}")
+    log.debug("Formulario de debug recibido", extra={"campos": ",".join(form_data.keys())})
     
     return {"status": "ok", "data": dict(form_data)}
 
@@ -1429,11 +1331,6 @@ def guardar_credito(
         return RedirectResponse(url="/login", status_code=303)
     
     try:
-        print(f"\n{'='*60}")
-        print(f"{'📝 EDITANDO CRÉDITO' if id else '➕ CREANDO NUEVO CRÉDITO'}")
-        print(f"Cuota manual recibida: ${cuota_manual:,.2f}")
-        print(f"{'='*60}")
-        
         fecha_inicio_dt = date.fromisoformat(fecha_inicio)
         
         credito_data = schemas.CreditoCreate(
@@ -1455,6 +1352,8 @@ def guardar_credito(
         else:
             crud.crear_credito(db, credito=credito_data, usuario_id=usuario_id)
             mensaje = "Crédito creado correctamente"
+        log.debug("Crédito guardado", extra={"credito_id": id, "nuevo": not id,
+                                             "cuota_manual": cuota_manual > 0})
         
         request.session['mensaje'] = {
             'tipo': 'exito',
@@ -1463,9 +1362,7 @@ def guardar_credito(
         }
         
     except Exception as e:
-        print(f"\n❌ ERROR: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error al guardar crédito")
         db.rollback()
         request.session['mensaje'] = {
             'tipo': 'error',
@@ -1513,7 +1410,7 @@ def calcular_cuota_credito(monto: float, interes_mensual: float, plazo_meses: in
         cuota = monto * (numerador / denominador)
         return round(cuota, 2)
     except Exception as e:
-        print(f"Error en cálculo de cuota: {e}")
+        log.warning("Error en cálculo de cuota: %s", e)
         return 0.0
 
 def crear_credito(db: Session, credito: schemas.CreditoCreate, usuario_id: int):
@@ -1525,10 +1422,6 @@ def crear_credito(db: Session, credito: schemas.CreditoCreate, usuario_id: int):
             cuota_calculada = calcular_cuota_credito(
                 credito.monto, credito.interes, credito.plazo_meses, credito.frecuencia_pago
             )
-            print(f"🏦 MODO MANUAL ACTIVADO")
-            print(f"   Cuota banco: ${cuota_real:,.2f}")
-            print(f"   Cuota calculada: ${cuota_calculada:,.2f}")
-            print(f"   Diferencia: ${cuota_real - cuota_calculada:,.2f}")
         
         # 🔹 MODE 2: CÁLCULO AUTOMÁTICO
         else:
@@ -1536,16 +1429,6 @@ def crear_credito(db: Session, credito: schemas.CreditoCreate, usuario_id: int):
                 credito.monto, credito.interes, credito.plazo_meses, credito.frecuencia_pago
             )
             cuota_real = cuota_calculada  # Son iguales en modo cálculo
-            print(f"📐 MODO CÁLCULO AUTOMÁTICO")
-            print(f"   Cuota calculada: ${cuota_calculada:,.2f}")
-        
-        print(f"\n💳 RESUMEN CRÉDITO:")
-        print(f"   Monto: ${credito.monto:,.2f}")
-        print(f"   Interés: {credito.interes}% mensual")
-        print(f"   Plazo: {credito.plazo_meses} meses")
-        print(f"   Seguro: ${credito.seguro:,.2f}")
-        print(f"   Cuota REAL a pagar: ${cuota_real:,.2f}")
-        print(f"   Cuota TOTAL (con seguro): ${cuota_real + credito.seguro:,.2f}")
         
         # Calcular total a pagar (cuota REAL + seguro) * número de cuotas
         if credito.frecuencia_pago == 'quincenal':
@@ -1587,15 +1470,13 @@ def crear_credito(db: Session, credito: schemas.CreditoCreate, usuario_id: int):
         db.commit()
         db.refresh(db_credito)
         
-        print(f"✅ Crédito creado con ID: {db_credito.id}")
-        print(f"   Modo: {'MANUAL (banco)' if credito.cuota_manual > 0 else 'CÁLCULO automático'}")
+        log.debug("Crédito creado", extra={"credito_id": db_credito.id,
+                                           "cuota_manual": credito.cuota_manual > 0})
         
         return db_credito
         
-    except Exception as e:
-        print(f"❌ Error al crear crédito: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        log.exception("Error al crear crédito")
         db.rollback()
         return None
 
@@ -1645,14 +1526,12 @@ def actualizar_credito(db: Session, credito_id: int, credito: schemas.CreditoUpd
         if credito.cuota_manual > 0:
             # MODO MANUAL: Usar valor del banco
             cuota_a_usar = credito.cuota_manual
-            print(f"🏦 Actualizando a CUOTA MANUAL: ${cuota_a_usar:,.2f}")
         else:
             # MODO CÁLCULO: Volver a calcular
             cuota_a_usar = calcular_cuota_credito(
                 db_credito.monto, db_credito.interes, 
                 db_credito.plazo_meses, db_credito.frecuencia_pago
             )
-            print(f"📐 Volviendo a CÁLCULO AUTOMÁTICO: ${cuota_a_usar:,.2f}")
         
         recalcular_total = True
     
@@ -1675,11 +1554,9 @@ def actualizar_credito(db: Session, credito_id: int, credito: schemas.CreditoUpd
         if db_credito.cuota_manual and db_credito.cuota_manual > 0:
             # Mantener cuota manual (no recalcular aunque cambien parámetros)
             cuota_a_usar = db_credito.cuota_manual
-            print(f"📌 Manteniendo CUOTA MANUAL existente: ${cuota_a_usar:,.2f}")
         else:
             # Calcular nueva cuota
             cuota_a_usar = calcular_cuota_credito(monto, interes, plazo, frecuencia)
-            print(f"🔄 Recalculando cuota: ${cuota_a_usar:,.2f}")
         
         recalcular_total = True
     
@@ -1721,10 +1598,8 @@ def actualizar_credito(db: Session, credito_id: int, credito: schemas.CreditoUpd
     db.commit()
     db.refresh(db_credito)
     
-    print(f"✅ Crédito actualizado")
-    print(f"   Cuota real: ${db_credito.cuota:,.2f}")
-    print(f"   Cuota calculada: ${db_credito.cuota_calculada:,.2f}")
-    print(f"   Diferencia: ${db_credito.cuota - db_credito.cuota_calculada:,.2f}")
+    log.debug("Crédito actualizado", extra={"credito_id": credito_id,
+                                            "cuota_recalculada": recalcular_total})
     
     return db_credito
 
@@ -1745,8 +1620,8 @@ def actualizar_credito(db: Session, credito_id: int, credito: schemas.CreditoUpd
 @router.get("/creditos")
 def listar_creditos(
     request: Request,
-    db: Session = Depends(get_db),
-    page: int = 1,
+    db: Session = Depends(get_db_lectura),
+    cursor: Optional[str] = None,
     estado: Optional[str] = None,
     frecuencia: Optional[str] = None
 ):
@@ -1755,16 +1630,16 @@ def listar_creditos(
     if not usuario_id:
         return RedirectResponse(url="/login", status_code=303)
     
-    print(f"\n=== LISTANDO CRÉDITOS PARA USUARIO ID: {usuario_id} ===")
-    print(f"Filtros - estado: '{estado}', frecuencia: '{frecuencia}'")
-    
     data = crud.obtener_creditos_paginados(
         db,
         usuario_id,
-        page=page,
+        cursor=cursor,
+        por_cursor=True,
         estado=estado,
         frecuencia=frecuencia
     )
+    log.debug("Listado de créditos", extra={"usuario_id": usuario_id, "estado": estado,
+                                            "frecuencia": frecuencia, "filas": len(data["creditos"])})
     
     mensaje = request.session.pop("mensaje", None)
     
@@ -1773,8 +1648,8 @@ def listar_creditos(
         {
             "request": request,
             "creditos": data["creditos"],
-            "total_pages": data["total_pages"],
-            "current_page": page,
+            "cursor_siguiente": data["cursor_siguiente"],
+            "cursor_anterior": data["cursor_anterior"],
             "filtro_estado": estado,
             "filtro_frecuencia": frecuencia,
             "mensaje": mensaje
@@ -1871,13 +1746,7 @@ def detalle_credito(
     # Calcular cuota total
     cuota_total = credito.cuota + credito.seguro
     
-    print(f"\n=== DETALLE CRÉDITO ID: {credito_id} ===")
-    print(f"Usuario: {usuario_id}")
-    print(f"Crédito: {credito.nombre_credito}")
-    print(f"Monto: ${credito.monto:,.0f}")
-    print(f"Pagos encontrados: {len(pagos)}")
-    print(f"Total pagado: ${total_pagado:,.0f}")
-    print(f"Progreso: {progreso:.1f}%")
+    log.debug("Detalle de crédito", extra={"credito_id": credito_id, "pagos": len(pagos)})
     
     return templates.TemplateResponse(
         "credito_detalle.html",
@@ -1902,8 +1771,8 @@ def detalle_credito(
 @router.get("/contactos")
 def listar_contactos(
     request: Request,
-    db: Session = Depends(get_db),
-    page: int = 1,
+    db: Session = Depends(get_db_lectura),
+    cursor: Optional[str] = None,
     categoria: Optional[str] = None
 ):
     """Listar todos los contactos del usuario"""
@@ -1911,15 +1780,15 @@ def listar_contactos(
     if not usuario_id:
         return RedirectResponse(url="/login", status_code=303)
     
-    print(f"\n=== LISTANDO CONTACTOS PARA USUARIO ID: {usuario_id} ===")
-    print(f"Filtro recibido - categoria: '{categoria}'")
-    
     data = crud.obtener_contactos_paginados(
         db,
         usuario_id,
-        page=page,
+        cursor=cursor,
+        por_cursor=True,
         categoria=categoria
     )
+    log.debug("Listado de contactos", extra={"usuario_id": usuario_id, "categoria": categoria,
+                                             "filas": len(data["contactos"])})
     
     mensaje = request.session.pop("mensaje", None)
     
@@ -1928,8 +1797,8 @@ def listar_contactos(
         {
             "request": request,
             "contactos": data["contactos"],
-            "total_pages": data["total_pages"],
-            "current_page": page,
+            "cursor_siguiente": data["cursor_siguiente"],
+            "cursor_anterior": data["cursor_anterior"],
             "filtro_categoria": categoria,
             "mensaje": mensaje
         }
@@ -1981,10 +1850,6 @@ def guardar_contacto(
         return RedirectResponse(url="/login", status_code=303)
 
     try:
-        print(f"\n{'='*60}")
-        print(f"{'📝 EDITANDO CONTACTO' if id else '➕ CREANDO NUEVO CONTACTO'}")
-        print(f"{'='*60}")
-        
         # Validar datos obligatorios
         if not nombres.strip() or not apellidos.strip():
             raise ValueError("❌ ERROR: Nombres y apellidos son requeridos")
@@ -2021,6 +1886,7 @@ def guardar_contacto(
             contacto_create = schemas.ContactoCreate(**contacto_data)
             crud.crear_contacto(db, contacto=contacto_create, usuario_id=usuario_id)
             mensaje = "Contacto creado correctamente"
+        log.debug("Contacto guardado", extra={"contacto_id": id, "nuevo": not id})
 
         request.session['mensaje'] = {
             'tipo': 'exito',
@@ -2029,9 +1895,7 @@ def guardar_contacto(
         }
         
     except Exception as e:
-        print(f"\n❌ ERROR: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error al guardar contacto")
         db.rollback()
         request.session['mensaje'] = {
             'tipo': 'error',
@@ -2072,128 +1936,230 @@ def eliminar_contacto(
 
 
 
+# ============================================================================
+# 📥 IMPORTACIÓN DE EXTRACTOS (CSV / XLSX)
+# ============================================================================
+
+@router.post("/importar/{entidad}")
+def importar_extracto(
+    request: Request,
+    entidad: str,
+    archivo: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    """
+    Importa un extracto bancario CSV o Excel como gastos o ingresos
+
+    Las filas ya importadas antes (misma huella) se omiten, así reimportar
+    el mismo archivo no duplica movimientos.
+    """
+    usuario_id = request.session.get("usuario_id")
+    if not usuario_id:
+        return RedirectResponse(url="/login", status_code=303)
+
+    if entidad not in importacion.ENTIDADES:
+        raise HTTPException(status_code=404, detail="Importación no disponible")
+
+    try:
+        resultado = importacion.importar_movimientos(db, usuario_id, entidad, archivo.file, archivo.filename or '')
+        log.debug("Importación de %s terminada", entidad, extra={
+            "leidas": resultado['leidas'], "insertadas": resultado['insertadas'],
+            "duplicadas": resultado['duplicadas'], "invalidas": resultado['invalidas'],
+        })
+
+        texto = (f"{resultado['insertadas']} movimientos importados, "
+                 f"{resultado['duplicadas']} ya existían")
+        if resultado['invalidas']:
+            texto += f", {resultado['invalidas']} con errores ({resultado['errores'][0]})"
+        request.session['mensaje'] = {
+            'tipo': 'exito',
+            'titulo': 'Importación terminada',
+            'texto': texto
+        }
+
+    except Exception as e:
+        log.exception("Error al importar %s", entidad)
+        db.rollback()
+        request.session['mensaje'] = {
+            'tipo': 'error',
+            'titulo': 'Error',
+            'texto': f'Error al importar: {str(e)}'
+        }
+
+    return RedirectResponse(url=f"/{entidad}", status_code=303)
+
+
+# ============================================================================
+# 📤 EXPORTACIONES CSV / NDJSON / PARQUET
+# ============================================================================
+
+FORMATOS_EXPORTACION = {
+    'csv': (exportacion.generar_csv, "text/csv; charset=utf-8"),
+    'ndjson': (exportacion.generar_ndjson, "application/x-ndjson; charset=utf-8"),
+    'parquet': (exportacion.generar_parquet, exportacion.MEDIA_TYPE_PARQUET),
+}
+
+def _verificar_parquet(formato: str):
+    """La exportación Parquet necesita pyarrow (requirements.txt)"""
+    if formato == 'parquet' and not exportacion.PARQUET_DISPONIBLE:
+        raise HTTPException(status_code=501, detail="Exportación Parquet no disponible: falta instalar pyarrow")
+
+@router.get("/export/historial.zip")
+def exportar_historial(request: Request, db: Session = Depends(get_db_lectura)):
+    """
+    Historial financiero completo del usuario en Parquet
+
+    Un .zip con ingresos, gastos, créditos y pagos, un .parquet tipado por tabla.
+    """
+    usuario_id = request.session.get("usuario_id")
+    if not usuario_id:
+        return RedirectResponse(url="/login", status_code=303)
+
+    _verificar_parquet('parquet')
+
+    fecha_actual = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return StreamingResponse(
+        exportacion.generar_historial_parquet(db.get_bind(), usuario_id),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=historial_{fecha_actual}.zip"}
+    )
+
+@router.get("/export/{entidad}.{formato}")
+def exportar_entidad(
+    request: Request,
+    entidad: str,
+    formato: str,
+    db: Session = Depends(get_db_lectura)
+):
+    """
+    Exporta una entidad completa en CSV, NDJSON o Parquet, en streaming
+
+    Acepta los mismos filtros (query params) que el listado HTML de la
+    entidad, p. ej. /export/gastos.csv?tipo=fijo&pagado=false
+    """
+    usuario_id = request.session.get("usuario_id")
+    if not usuario_id:
+        return RedirectResponse(url="/login", status_code=303)
+
+    if entidad not in exportacion.EXPORTABLES or formato not in FORMATOS_EXPORTACION:
+        raise HTTPException(status_code=404, detail="Exportación no disponible")
+    _verificar_parquet(formato)
+
+    generar, media_type = FORMATOS_EXPORTACION[formato]
+    filtros = exportacion.filtros_desde_query(entidad, request.query_params)
+
+    fecha_actual = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"{entidad}_{fecha_actual}.{formato}"
+
+    return StreamingResponse(
+        generar(db.get_bind(), entidad, usuario_id, filtros),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+# ============================================================================
+# 📦 TRABAJOS DE EXPORTACIÓN EXCEL (pool de procesos)
+# ============================================================================
+
+def _respuesta_archivo_excel(trabajo: models.TrabajoExportacion) -> FileResponse:
+    """Devuelve el archivo generado por un trabajo terminado"""
+    fecha_actual = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return FileResponse(
+        trabajo.ruta,
+        media_type=exportacion.MEDIA_TYPE_XLSX,
+        filename=f"{trabajo.entidad}_{fecha_actual}.xlsx"
+    )
+
+def _descargar_excel_en_segundo_plano(db: Session, entidad: str, usuario_id: int, **filtros):
+    """Encola el Excel; si ya hay uno idéntico listo se descarga de inmediato"""
+    trabajo = trabajos.encolar_excel(db, entidad, usuario_id, filtros)
+    if trabajo.estado == trabajos.LISTO:
+        return _respuesta_archivo_excel(trabajo)
+    return RedirectResponse(url=f"/exportaciones/{trabajo.id}/descargar", status_code=303)
+
+@router.post("/exportaciones/{entidad}")
+def crear_exportacion(request: Request, entidad: str, db: Session = Depends(get_db)):
+    """
+    Encola la generación del Excel de una entidad (ingresos o gastos)
+
+    Los filtros van como query params, igual que en el listado. Responde 202
+    con el id del trabajo y las URLs de estado y descarga.
+    """
+    usuario_id = request.session.get("usuario_id")
+    if not usuario_id:
+        return JSONResponse({"detail": "No autenticado"}, status_code=401)
+
+    if entidad not in exportacion.HOJAS:
+        raise HTTPException(status_code=404, detail="Exportación no disponible")
+
+    filtros = exportacion.filtros_desde_query(entidad, request.query_params)
+    trabajo = trabajos.encolar_excel(db, entidad, usuario_id, filtros)
+    return JSONResponse(trabajos.a_dict(trabajo), status_code=202)
+
+@router.get("/exportaciones/{trabajo_id}")
+def estado_exportacion(request: Request, trabajo_id: str):
+    """Estado de un trabajo de exportación (pendiente, listo o error)"""
+    usuario_id = request.session.get("usuario_id")
+    if not usuario_id:
+        return JSONResponse({"detail": "No autenticado"}, status_code=401)
+
+    trabajo = trabajos.obtener_trabajo(trabajo_id, usuario_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Exportación no encontrada")
+    return trabajos.a_dict(trabajo)
+
+@router.get("/exportaciones/{trabajo_id}/descargar")
+def descargar_exportacion(request: Request, trabajo_id: str):
+    """Descarga el archivo si está listo; si no, muestra una página que espera"""
+    usuario_id = request.session.get("usuario_id")
+    if not usuario_id:
+        return RedirectResponse(url="/login", status_code=303)
+
+    trabajo = trabajos.obtener_trabajo(trabajo_id, usuario_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Exportación no encontrada")
+
+    if trabajo.estado == trabajos.LISTO:
+        return _respuesta_archivo_excel(trabajo)
+
+    return templates.TemplateResponse(
+        "exportacion_espera.html",
+        {"request": request, "trabajo": trabajos.a_dict(trabajo)},
+        status_code=500 if trabajo.estado == trabajos.ERROR else 202
+    )
+
+
  # Ingresos Descargar Excel
 
 @router.get("/ingresos/descargar-excel")
 def descargar_ingresos_excel(
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_lectura),
     tipo: Optional[str] = None,
-    estado: Optional[str] = None
+    estado: Optional[str] = None,
+    modo: Optional[str] = None
 ):
-    """Descarga todos los ingresos en formato Excel"""
+    """Descarga todos los ingresos en formato Excel (modo=directo: streaming en la petición)"""
     usuario_id = request.session.get("usuario_id")
     if not usuario_id:
         return RedirectResponse(url="/login", status_code=303)
     
-    print(f"\n=== DESCARGANDO INGRESOS A EXCEL ===")
-    print(f"Usuario ID: {usuario_id}")
-    print(f"Filtros - tipo: '{tipo}', estado: '{estado}'")
-    
-    # Obtener TODOS los ingresos (sin paginación)
-    query = db.query(models.Ingreso).join(
-        models.Categoria, models.Ingreso.categoria_id == models.Categoria.id
-    ).filter(models.Ingreso.usuario_id == usuario_id)
-    
-    if tipo and tipo.strip():
-        query = query.filter(models.Categoria.tipo == tipo.strip())
-    
-    if estado in ['recibido', 'pendiente']:
-        query = query.filter(models.Ingreso.estado == estado)
-    
-    ingresos = query.order_by(models.Ingreso.fecha.desc()).all()
+    log.debug("Descarga de ingresos a Excel", extra={"usuario_id": usuario_id, "tipo": tipo,
+                                                     "estado": estado, "modo": modo})
     
-    # Crear workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Ingresos"
-    
-    # Estilos
-    header_fill = PatternFill(start_color="2563eb", end_color="2563eb", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # Headers
-    headers = ["Nombre", "Valor", "Estado", "Fecha", "Categoría", "Tipo"]
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num)
-        cell.value = header
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-        cell.border = border
-    
-    # Datos
-    for row_num, ingreso in enumerate(ingresos, 2):
-        # Nombre (Notas)
-        cell = ws.cell(row=row_num, column=1)
-        cell.value = ingreso.notas or '-'
-        cell.border = border
-        
-        # Valor
-        cell = ws.cell(row=row_num, column=2)
-        cell.value = float(ingreso.valor)
-        cell.number_format = '$#,##0'
-        cell.border = border
-        
-        # Estado
-        cell = ws.cell(row=row_num, column=3)
-        cell.value = "Recibido" if ingreso.estado == 'recibido' else "Pendiente"
-        if ingreso.estado == 'recibido':
-            cell.fill = PatternFill(start_color="d1fae5", end_color="d1fae5", fill_type="solid")
-            cell.font = Font(color="065f46")
-        else:
-            cell.fill = PatternFill(start_color="fed7aa", end_color="fed7aa", fill_type="solid")
-            cell.font = Font(color="92400e")
-        cell.border = border
-        cell.alignment = Alignment(horizontal="center")
-        
-        # Fecha
-        cell = ws.cell(row=row_num, column=4)
-        cell.value = ingreso.fecha.strftime('%d/%m/%Y') if ingreso.fecha else '-'
-        cell.border = border
-        cell.alignment = Alignment(horizontal="center")
-        
-        # Categoría
-        cell = ws.cell(row=row_num, column=5)
-        cell.value = ingreso.categoria.nombre
-        cell.border = border
-        
-        # Tipo
-        cell = ws.cell(row=row_num, column=6)
-        cell.value = ingreso.categoria.tipo.capitalize()
-        cell.border = border
-        cell.alignment = Alignment(horizontal="center")
-    
-    # Ajustar anchos de columna
-    ws.column_dimensions['A'].width = 25
-    ws.column_dimensions['B'].width = 15
-    ws.column_dimensions['C'].width = 15
-    ws.column_dimensions['D'].width = 12
-    ws.column_dimensions['E'].width = 20
-    ws.column_dimensions['F'].width = 12
-    
-    # Generar archivo en memoria
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
+    if modo != "directo":
+        # Se genera en el pool de procesos; la descarga espera a que esté listo
+        return _descargar_excel_en_segundo_plano(db, 'ingresos', usuario_id, tipo=tipo, estado=estado)
     
     # Nombre del archivo
-    from datetime import datetime
     fecha_actual = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"ingresos_{fecha_actual}.xlsx"
     
-    print(f"✅ Excel generado: {len(ingresos)} registros")
-    
-    # Retornar archivo
+    # El libro se escribe por bloques y se envía mientras se genera
     return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        exportacion.transmitir_excel(db.get_bind(), 'ingresos', usuario_id, tipo=tipo, estado=estado),
+        media_type=exportacion.MEDIA_TYPE_XLSX,
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
@@ -2202,124 +2168,30 @@ def descargar_ingresos_excel(
 @router.get("/gastos/descargar-excel")
 def descargar_gastos_excel(
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_lectura),
     tipo: Optional[str] = None,
-    estado: Optional[str] = None
+    estado: Optional[str] = None,
+    modo: Optional[str] = None
 ):
-    """Descarga todos los gastos en formato Excel"""
+    """Descarga todos los gastos en formato Excel (modo=directo: streaming en la petición)"""
     usuario_id = request.session.get("usuario_id")
     if not usuario_id:
         return RedirectResponse(url="/login", status_code=303)
 
-    print(f"\n=== DESCARGANDO GASTOS A EXCEL ===")
-    print(f"Usuario ID: {usuario_id}")
-    print(f"Filtros - tipo: '{tipo}', estado: '{estado}'")
+    log.debug("Descarga de gastos a Excel", extra={"usuario_id": usuario_id, "tipo": tipo,
+                                                   "estado": estado, "modo": modo})
 
-    # Query base
-    query = db.query(models.Gasto).join(
-        models.Categoria, models.Gasto.categoria_id == models.Categoria.id
-    ).filter(models.Gasto.usuario_id == usuario_id)
+    if modo != "directo":
+        # Se genera en el pool de procesos; la descarga espera a que esté listo
+        return _descargar_excel_en_segundo_plano(db, 'gastos', usuario_id, tipo=tipo, estado=estado)
 
-    if tipo and tipo.strip():
-        query = query.filter(models.Categoria.tipo == tipo.strip())
-
-    if estado in ['pagado', 'pendiente']:
-        if estado == 'pagado':
-            query = query.filter(models.Gasto.pagado == True)
-        else:
-            query = query.filter(models.Gasto.pagado == False)
-
-    gastos = query.order_by(models.Gasto.fecha_limite.desc()).all()
-
-    # Crear workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Gastos"
-
-    # Estilos
-    header_fill = PatternFill(start_color="dc2626", end_color="dc2626", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-
-    # Headers
-    headers = ["Nombre", "Valor", "Estado", "Fecha límite", "Categoría", "Tipo"]
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num)
-        cell.value = header
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-        cell.border = border
-
-    # Datos
-    for row_num, gasto in enumerate(gastos, 2):
-        # Nombre
-        cell = ws.cell(row=row_num, column=1)
-        cell.value = gasto.notas or '-'
-        cell.border = border
-
-        # Valor
-        cell = ws.cell(row=row_num, column=2)
-        cell.value = float(gasto.valor)
-        cell.number_format = '$#,##0'
-        cell.border = border
-
-        # Estado
-        cell = ws.cell(row=row_num, column=3)
-        cell.value = "Pagado" if gasto.pagado else "Pendiente"
-        if gasto.pagado:
-            cell.fill = PatternFill(start_color="d1fae5", end_color="d1fae5", fill_type="solid")
-            cell.font = Font(color="065f46")
-        else:
-            cell.fill = PatternFill(start_color="fee2e2", end_color="fee2e2", fill_type="solid")
-            cell.font = Font(color="991b1b")
-        cell.border = border
-        cell.alignment = Alignment(horizontal="center")
-
-        # Fecha límite
-        cell = ws.cell(row=row_num, column=4)
-        cell.value = gasto.fecha_limite.strftime('%d/%m/%Y') if gasto.fecha_limite else '-'
-        cell.border = border
-        cell.alignment = Alignment(horizontal="center")
-
-        # Categoría
-        cell = ws.cell(row=row_num, column=5)
-        cell.value = gasto.categoria.nombre
-        cell.border = border
-
-        # Tipo
-        cell = ws.cell(row=row_num, column=6)
-        cell.value = gasto.categoria.tipo.capitalize()
-        cell.border = border
-        cell.alignment = Alignment(horizontal="center")
-
-    # Ajustar columnas
-    ws.column_dimensions['A'].width = 25
-    ws.column_dimensions['B'].width = 15
-    ws.column_dimensions['C'].width = 15
-    ws.column_dimensions['D'].width = 15
-    ws.column_dimensions['E'].width = 20
-    ws.column_dimensions['F'].width = 12
-
-    # Generar archivo
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    from datetime import datetime
     fecha_actual = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"gastos_{fecha_actual}.xlsx"
 
-    print(f"✅ Excel generado: {len(gastos)} registros")
-
+    # El libro se escribe por bloques y se envía mientras se genera
     return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        exportacion.transmitir_excel(db.get_bind(), 'gastos', usuario_id, tipo=tipo, estado=estado),
+        media_type=exportacion.MEDIA_TYPE_XLSX,
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
@@ -2378,14 +2250,6 @@ def guardar_pago(
         return RedirectResponse(url="/login", status_code=303)
     
     try:
-        print(f"\n{'='*60}")
-        print(f"💰 PROCESANDO PAGO")
-        print(f"{'='*60}")
-        print(f"  Crédito ID: {credito_id}")
-        print(f"  Monto recibido (string): '{monto}'")
-        print(f"  Fecha: {fecha_pago}")
-        print(f"  Comprobante: {comprobante}")
-        
         # ✅ 1. LIMPIAR EL MONTO - ELIMINAR TODO LO QUE NO SEA NÚMERO
         monto_limpio = ''.join(c for c in monto if c.isdigit())
         
@@ -2394,15 +2258,12 @@ def guardar_pago(
         
         # ✅ 2. CONVERTIR A FLOAT (SIN DIVIDIR ENTRE 100)
         monto_float = float(monto_limpio)
-        print(f"  Monto limpiado: '{monto_limpio}' -> {monto_float:,.2f}")
         
         # ✅ 3. VALIDAR QUE EL CRÉDITO EXISTE
         credito = crud.obtener_credito(db, credito_id)
         if not credito or credito.usuario_id != usuario_id:
             raise HTTPException(status_code=404, detail="Crédito no encontrado")
         
-        print(f"  Saldo actual: ${credito.saldo_actual:,.2f}")
-        
         # ✅ 4. VALIDAR QUE EL MONTO NO EXCEDA EL SALDO
         if monto_float > credito.saldo_actual:
             raise ValueError(
@@ -2429,7 +2290,7 @@ def guardar_pago(
         
         if pago:
             mensaje = f'✅ Pago de ${monto_float:,.0f} registrado correctamente'
-            print(mensaje)
+            log.debug("Pago registrado", extra={"pago_id": pago.id, "credito_id": credito_id})
             request.session['mensaje'] = {
                 'tipo': 'success',
                 'titulo': '¡Éxito!',
@@ -2439,23 +2300,22 @@ def guardar_pago(
             raise Exception("No se pudo crear el pago en la base de datos")
         
     except ValueError as e:
-        print(f"❌ Error de validación: {e}")
+        # El mensaje incluye montos: al log solo va el crédito
+        log.debug("Pago rechazado por validación", extra={"credito_id": credito_id})
         request.session['mensaje'] = {
             'tipo': 'error',
             'titulo': 'Error de validación',
             'texto': str(e)
         }
     except HTTPException as e:
-        print(f"❌ HTTP Exception: {e.detail}")
+        log.debug("Pago rechazado: %s", e.detail, extra={"credito_id": credito_id})
         request.session['mensaje'] = {
             'tipo': 'error',
             'titulo': 'Error',
             'texto': e.detail
         }
     except Exception as e:
-        print(f"❌ Error inesperado: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error al registrar pago", extra={"credito_id": credito_id})
         db.rollback()
         request.session['mensaje'] = {
             'tipo': 'error',
@@ -2487,14 +2347,13 @@ def eliminar_pago_route(
             "titulo": "¡Eliminado!",
             "texto": "Pago eliminado correctamente"
         }
-        print(f"✅ Pago {pago_id} eliminado correctamente")
     else:
         request.session["mensaje"] = {
             "tipo": "error",
             "titulo": "Error",
             "texto": "No se pudo eliminar el pago"
         }
-        print(f"❌ Error al eliminar pago {pago_id}")
+        log.warning("No se pudo eliminar el pago %s", pago_id)
     
     # Redirigir al detalle del crédito
     if credito_id:
@@ -0,0 +1,204 @@
+"""
+Cachés en memoria por usuario
+
+Cada escritura (commit) que toca datos de un usuario (gastos, ingresos,
+categorías, créditos, contactos, cumpleaños o contraseñas) invalida sus
+entradas en la caché de este proceso.
+Se detecta con eventos de la Session, así cubre tanto las funciones de
+crud.py como las rutas que modifican modelos directamente.
+
+Nota: la caché vive en cada proceso. Para que una escritura atendida por
+otro worker de uvicorn también cuente,
+cada transacción que modifica datos de un usuario sube su fila en
+versiones_datos, dentro de la misma transacción: version_datos() es igual
+en todos los workers. El dashboard y los archivos de exportación llevan esa
+versión en su clave, igual que los totales de los listados.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+from typing import Any, Dict, Hashable
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.schema import models
+
+
+class CacheLRU:
+    """Caché LRU con tamaño máximo, TTL y contadores de aciertos/fallos"""
+
+    def __init__(self, max_items: int = 1000, ttl_segundos: float = 300):
+        self.max_items = max_items
+        self.ttl_segundos = ttl_segundos
+        self._datos: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+
+    def obtener(self, clave: Hashable, default: Any = None) -> Any:
+        """Devuelve el valor si existe y no ha vencido; cuenta acierto o fallo"""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                vence, valor = entrada
+                if vence > time.monotonic():
+                    self._datos.move_to_end(clave)
+                    self.aciertos += 1
+                    return valor
+                del self._datos[clave]
+            self.fallos += 1
+            return default
+
+    def guardar(self, clave: Hashable, valor: Any):
+        """Guarda un valor y expulsa el menos usado si se supera max_items"""
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl_segundos, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_items:
+                self._datos.popitem(last=False)
+                self.expulsiones += 1
+
+    def invalidar(self, clave: Hashable):
+        """Elimina una entrada (si existe)"""
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def limpiar(self):
+        """Vacía la caché (los contadores se conservan)"""
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Aciertos, fallos y ocupación de la caché"""
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else 0.0,
+                "expulsiones": self.expulsiones,
+                "items": len(self._datos),
+                "max_items": self.max_items,
+                "ttl_segundos": self.ttl_segundos,
+            }
+
+
+# ============================================================================
+# 📦 CACHÉS DE LA APLICACIÓN
+# ============================================================================
+
+cache_dashboard = CacheLRU(
+    max_items=int(os.getenv("DASHBOARD_CACHE_MAX_ITEMS", "1000")),
+    ttl_segundos=float(os.getenv("DASHBOARD_CACHE_TTL", "300"))
+)
+
+# Totales de los listados paginados: clave (usuario_id, listado, *filtros),
+# valor (versión de datos, total)
+cache_totales = CacheLRU(
+    max_items=int(os.getenv("LISTADOS_CACHE_MAX_ITEMS", "5000")),
+    ttl_segundos=float(os.getenv("LISTADOS_CACHE_TTL", "300"))
+)
+
+# Cachés registradas (para exponer sus estadísticas)
+CACHES = {
+    "dashboard": cache_dashboard,
+    "totales": cache_totales,
+}
+
+
+# ============================================================================
+# ✏️ ESCRITURAS POR USUARIO
+# ============================================================================
+
+def registrar_escritura(usuario_id: int):
+    """
+    Invalida las entradas del usuario en la caché de este proceso
+
+    Los demás workers las descartan al ver la nueva versión de datos; esto
+    solo evita guardar la entrada vieja hasta la próxima lectura.
+    """
+    cache_dashboard.invalidar(usuario_id)
+
+
+# ============================================================================
+# 🔢 VERSIÓN DE DATOS COMPARTIDA (tabla versiones_datos)
+# ============================================================================
+
+def incrementar_version(db: Session, usuario_id: int):
+    """Sube la versión de datos del usuario en la transacción actual (sin commit)"""
+    tabla = models.VersionDatos.__table__
+    conexion = db.connection()
+    dialecto = conexion.dialect.name
+    if dialecto == 'mysql':
+        stmt = mysql_insert(tabla).values(usuario_id=usuario_id, version=1)
+        conexion.execute(stmt.on_duplicate_key_update(version=tabla.c.version + 1))
+    elif dialecto == 'sqlite':
+        stmt = sqlite_insert(tabla).values(usuario_id=usuario_id, version=1)
+        conexion.execute(stmt.on_conflict_do_update(
+            index_elements=['usuario_id'], set_={'version': tabla.c.version + 1}
+        ))
+    else:
+        resultado = conexion.execute(
+            update(tabla).where(tabla.c.usuario_id == usuario_id).values(version=tabla.c.version + 1)
+        )
+        if resultado.rowcount == 0:
+            conexion.execute(insert(tabla).values(usuario_id=usuario_id, version=1))
+
+
+def version_datos(db: Session, usuario_id: int) -> int:
+    """Versión de datos del usuario (0 si nunca escribió)"""
+    tabla = models.VersionDatos.__table__
+    return db.execute(select(tabla.c.version).where(tabla.c.usuario_id == usuario_id)).scalar() or 0
+
+
+def estadisticas() -> Dict[str, Dict[str, Any]]:
+    """Estadísticas de todas las cachés"""
+    return {nombre: cache.estadisticas() for nombre, cache in CACHES.items()}
+
+
+# ============================================================================
+# 🔔 EVENTOS DE SESIÓN
+# ============================================================================
+
+MODELOS_OBSERVADOS = (
+    models.Gasto, models.Ingreso, models.Categoria,
+    models.Credito, models.Contacto, models.Cumpleano, models.Contrasena,
+)
+
+
+@event.listens_for(Session, "before_flush")
+def _recordar_usuarios_modificados(session, flush_context, instances):
+    """Anota qué usuarios tienen cambios pendientes en esta transacción"""
+    usuarios = session.info.setdefault("usuarios_modificados", set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, MODELOS_OBSERVADOS) and obj.usuario_id is not None:
+            usuarios.add(obj.usuario_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _incrementar_versiones(session, flush_context):
+    """Una vez por transacción y usuario, en la misma transacción que el cambio"""
+    incrementadas = session.info.setdefault("versiones_incrementadas", set())
+    for usuario_id in session.info.get("usuarios_modificados", ()):
+        if usuario_id not in incrementadas:
+            incrementar_version(session, usuario_id)
+            incrementadas.add(usuario_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_tras_commit(session):
+    session.info.pop("versiones_incrementadas", None)
+    for usuario_id in session.info.pop("usuarios_modificados", ()):
+        registrar_escritura(usuario_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_tras_rollback(session):
+    session.info.pop("usuarios_modificados", None)
+    session.info.pop("versiones_incrementadas", None)
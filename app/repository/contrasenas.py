@@ -0,0 +1,193 @@
+"""
+Hash y verificación de contraseñas de usuario (bcrypt) fuera del event loop
+
+bcrypt es CPU a propósito: cada hashpw/checkpw tarda cientos de ms con el
+costo por defecto. Llamado dentro de una ruta async def congela el event
+loop durante ese tiempo, y unos pocos logins simultáneos detienen todas las
+páginas de todos los usuarios.
+
+Las versiones async ejecutan bcrypt en un ThreadPoolExecutor propio y
+acotado. bcrypt libera el GIL mientras calcula, así que el event loop sigue
+atendiendo peticiones. Un pool aparte, en lugar del threadpool por defecto
+de anyio, evita que una ráfaga de logins acapare los hilos de las rutas
+síncronas. Si llegan más logins que hilos, esperan en la cola del pool.
+
+Política de hash: el costo de los hashes nuevos se calibra al arrancar
+para que un hash tarde como máximo HASH_OBJETIVO_MS en este hardware (nunca
+menos de BCRYPT_ROUNDS_MIN). Si BCRYPT_ROUNDS está definido, se usa ese
+costo fijo y no se calibra. Después de un login correcto, un hash guardado
+que no cumple la política se vuelve a generar con la contraseña recién
+verificada (ver necesita_rehash). Así se ajusta el costo por despliegue sin
+obligar a nadie a cambiar su contraseña:
+
+    - BCRYPT_ROUNDS fijo: todo hash con otro costo (mayor o menor) u otra
+      variante se regenera. Bajar BCRYPT_ROUNDS baja el costo de los logins.
+    - costo calibrado: solo se regeneran los hashes con costo menor u otra
+      variante. La calibración corre en cada proceso y dos workers pueden
+      elegir costos distintos (11 y 12); subiendo solamente, un hash no va y
+      viene entre ellos.
+
+En producción con varios workers conviene fijar BCRYPT_ROUNDS, para que el
+costo lo decida el despliegue y no el tiempo medido en cada proceso.
+
+Variables de entorno:
+    BCRYPT_ROUNDS       costo fijo (log2 de iteraciones), 4..31; desactiva la calibración
+    HASH_OBJETIVO_MS    presupuesto de latencia por hash para calibrar (por defecto 250)
+    BCRYPT_ROUNDS_MIN   costo mínimo aunque el hardware sea lento (por defecto 10)
+    HASH_WORKERS        hilos del pool de bcrypt (por defecto min(4, núcleos))
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+
+log = logging.getLogger(__name__)
+
+HASH_OBJETIVO_MS = float(os.getenv("HASH_OBJETIVO_MS", "250"))
+BCRYPT_ROUNDS_MIN = int(os.getenv("BCRYPT_ROUNDS_MIN", "10"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Variante de bcrypt de los hashes nuevos (la que genera bcrypt.gensalt)
+PREFIJO_BCRYPT = b"2b"
+ROUNDS_CALIBRACION = 8
+
+
+def _validar_rounds(nombre: str, rounds: int) -> int:
+    if not 4 <= rounds <= 31:
+        raise ValueError(f"{nombre} debe estar entre 4 y 31 (recibido {rounds})")
+    return rounds
+
+
+def calibrar_rounds(objetivo_ms: float = HASH_OBJETIVO_MS,
+                    minimo: int = BCRYPT_ROUNDS_MIN) -> tuple:
+    """
+    Costo bcrypt más alto cuyo hash tarda como máximo objetivo_ms en esta máquina
+
+    Mide unos hashes baratos (costo 8) y extrapola: cada punto de costo
+    duplica el tiempo.
+
+    Returns:
+        (rounds, milisegundos estimados por hash con ese costo)
+    """
+    muestras = []
+    for _ in range(3):
+        inicio = time.perf_counter()
+        bcrypt.hashpw(b"calibracion", bcrypt.gensalt(ROUNDS_CALIBRACION))
+        muestras.append((time.perf_counter() - inicio) * 1000)
+    base_ms = min(muestras)
+
+    rounds = minimo
+    while rounds < 31 and base_ms * 2 ** (rounds + 1 - ROUNDS_CALIBRACION) <= objetivo_ms:
+        rounds += 1
+    return rounds, base_ms * 2 ** (rounds - ROUNDS_CALIBRACION)
+
+
+_validar_rounds("BCRYPT_ROUNDS_MIN", BCRYPT_ROUNDS_MIN)
+if os.getenv("BCRYPT_ROUNDS"):
+    BCRYPT_ROUNDS = _validar_rounds("BCRYPT_ROUNDS", int(os.getenv("BCRYPT_ROUNDS")))
+    ORIGEN_ROUNDS = "BCRYPT_ROUNDS"
+    HASH_ESTIMADO_MS = None
+else:
+    BCRYPT_ROUNDS, HASH_ESTIMADO_MS = calibrar_rounds()
+    ORIGEN_ROUNDS = "calibrado"
+    log.info("bcrypt calibrado: rounds=%s (~%.0fms por hash, objetivo %.0fms)",
+             BCRYPT_ROUNDS, HASH_ESTIMADO_MS, HASH_OBJETIVO_MS)
+
+_pool: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def _obtener_pool() -> ThreadPoolExecutor:
+    """Crea el pool la primera vez que se usa"""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+        return _pool
+
+# ============================================================================
+# 🔐 VERSIONES SÍNCRONAS (scripts, CLI, rutas def)
+# ============================================================================
+
+def hashear_password(password: str, rounds: int = None) -> str:
+    """
+    Hashea una contraseña usando bcrypt
+
+    Args:
+        password: Contraseña en texto plano
+        rounds: Costo del hash (por defecto BCRYPT_ROUNDS)
+
+    Returns:
+        Hash bcrypt como texto
+    """
+    salt = bcrypt.gensalt(rounds or BCRYPT_ROUNDS)
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+
+def verificar_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verifica si una contraseña coincide con su hash bcrypt
+
+    El costo se lee del propio hash, así que los hashes creados con otro
+    BCRYPT_ROUNDS siguen verificándose.
+    """
+    try:
+        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    except ValueError:
+        # Hash vacío o con formato inválido en la base
+        return False
+
+
+def necesita_rehash(hashed_password: str) -> bool:
+    """
+    Indica si un hash guardado no cumple la política actual
+
+    Se llama solo después de verificar la contraseña, que es el único
+    momento en que se tiene el texto plano para generar el hash nuevo.
+    Con BCRYPT_ROUNDS fijo, cualquier otro costo se regenera (también hacia
+    abajo). Con el costo calibrado, un costo mayor se conserva: los workers
+    calibran por separado y se disputarían el hash en cada login.
+    """
+    try:
+        _, variante, costo, _ = hashed_password.encode('utf-8').split(b"$", 3)
+        if variante != PREFIJO_BCRYPT:
+            return True
+        if ORIGEN_ROUNDS == "BCRYPT_ROUNDS":
+            return int(costo) != BCRYPT_ROUNDS
+        return int(costo) < BCRYPT_ROUNDS
+    except ValueError:
+        return True
+
+# ============================================================================
+# ⚡ VERSIONES ASYNC (rutas async def)
+# ============================================================================
+
+async def hashear_password_async(password: str, rounds: int = None) -> str:
+    """hashear_password en el pool de bcrypt, sin bloquear el event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_obtener_pool(), hashear_password, password, rounds)
+
+
+async def verificar_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verificar_password en el pool de bcrypt, sin bloquear el event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_obtener_pool(), verificar_password,
+                                      plain_password, hashed_password)
+
+
+def estadisticas() -> dict:
+    """Configuración y estado del pool (para /debug/cache)"""
+    pool = _pool
+    return {
+        "rounds": BCRYPT_ROUNDS,
+        "origen_rounds": ORIGEN_ROUNDS,
+        "objetivo_ms": HASH_OBJETIVO_MS,
+        "estimado_ms": HASH_ESTIMADO_MS,
+        "workers": HASH_WORKERS,
+        "en_cola": pool._work_queue.qsize() if pool is not None else 0,
+    }
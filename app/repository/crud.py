@@ -1,22 +1,24 @@
-import bcrypt
 import base64
+import json
+import logging
 import os
 from datetime import date, datetime, timedelta
-from typing import Optional, Dict
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, extract, or_
+from types import SimpleNamespace
+from typing import Optional, Dict, List
+from sqlalchemy.orm import Session, contains_eager
+from sqlalchemy import func, and_, or_, case, false
 from cryptography.fernet import Fernet
-from passlib.context import CryptContext
 
 from app.schema import models, schemas
+from app.config.metricas import medir
+from app.repository import resumen, cache, contrasenas
+
+log = logging.getLogger(__name__)
 
 # ============================================================================
 # 🔐 CONFIGURACIÓN DE ENCRIPTACIÓN
 # ============================================================================
 
-# Configuración para hashing de contraseñas de usuarios (autenticación)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # Configuración para encriptación de contraseñas de servicios
 # IMPORTANTE: Cambia esta clave en producción o usa variable de entorno
 ENCRYPTION_KEY = os.environ.get("ENCRYPTION_KEY", "default_key_should_be_changed_in_production_")
@@ -27,26 +29,26 @@ cipher_suite = Fernet(fernet_key)
 # 🔐 FUNCIONES DE AUTENTICACIÓN
 # ============================================================================
 
-def hashear_password(password: str) -> str:
-    """Hashea una contraseña usando bcrypt"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-def verificar_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifica si una contraseña coincide con su hash bcrypt"""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+# Las rutas async def usan las versiones async de contrasenas (pool propio)
+hashear_password = contrasenas.hashear_password
+verificar_password = contrasenas.verificar_password
 
+@medir
 def obtener_usuario_por_username(db: Session, username: str):
     """Busca usuario por nombre de usuario"""
     return db.query(models.Usuario).filter(models.Usuario.username == username).first()
 
+@medir
 def obtener_usuario_por_email(db: Session, email: str):
     """Busca usuario por email"""
     return db.query(models.Usuario).filter(models.Usuario.email == email).first()
 
+@medir
 def obtener_usuario_por_id(db: Session, usuario_id: int):
     """Busca usuario por ID"""
     return db.query(models.Usuario).filter(models.Usuario.id == usuario_id).first()
 
+@medir
 def crear_usuario(db: Session, usuario: schemas.UsuarioCreate):
     """Crea un nuevo usuario con contraseña hasheada"""
     hashed_password = hashear_password(usuario.password)
@@ -65,6 +67,7 @@ def crear_usuario(db: Session, usuario: schemas.UsuarioCreate):
 # 🏷️ FUNCIONES DE CATEGORÍAS
 # ============================================================================
 
+@medir
 def crear_categoria(db: Session, categoria: schemas.CategoriaCreate, usuario_id: int):
     """Crea una nueva categoría para un usuario"""
     db_categoria = models.Categoria(**categoria.model_dump(), usuario_id=usuario_id)
@@ -73,6 +76,7 @@ def crear_categoria(db: Session, categoria: schemas.CategoriaCreate, usuario_id:
     db.refresh(db_categoria)
     return db_categoria
 
+@medir
 def obtener_categorias(db: Session, usuario_id: int, tipo: Optional[str] = None):
     """Obtiene todas las categorías de un usuario, opcionalmente filtradas por tipo"""
     query = db.query(models.Categoria).filter(models.Categoria.usuario_id == usuario_id)
@@ -80,12 +84,14 @@ def obtener_categorias(db: Session, usuario_id: int, tipo: Optional[str] = None)
         query = query.filter(models.Categoria.tipo == tipo)
     return query.all()
 
+@medir
 def obtener_categoria_por_nombre(db: Session, nombre: str, usuario_id: int):
     """Busca categoría por nombre para un usuario específico"""
     return db.query(models.Categoria).filter(
         and_(models.Categoria.nombre == nombre, models.Categoria.usuario_id == usuario_id)
     ).first()
 
+@medir
 def obtener_categoria_por_nombre_y_tipo(db: Session, nombre: str, tipo: str, usuario_id: int):
     """Busca categoría por nombre y tipo para un usuario específico"""
     return db.query(models.Categoria).filter(
@@ -96,10 +102,210 @@ def obtener_categoria_por_nombre_y_tipo(db: Session, nombre: str, tipo: str, usu
         )
     ).first()
 
+# ============================================================================
+# 📑 PAGINACIÓN
+# ============================================================================
+# Modo cursor (keyset): en lugar de OFFSET, cada página continúa desde la
+# clave (orden, id) de la última fila vista, así la página 500 cuesta lo
+# mismo que la primera. Cada listado debe tener un índice (usuario_id,
+# columnas de orden).
+#
+# Modo numerado: LIMIT per_page + 1 y total de elementos cacheado.
+
+def _codificar_cursor(valores: list, direccion: str) -> str:
+    """Codifica la clave de una fila como token urlsafe ('sig' o 'ant')"""
+    crudos = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in valores]
+    datos = json.dumps({"v": crudos, "d": direccion}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(datos.encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decodificar_cursor(cursor: str, orden: list) -> Optional[tuple]:
+    """
+    Decodifica un token de cursor
+
+    Returns:
+        Tupla (valores, direccion) o None si el token no es válido
+    """
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        crudos, direccion = datos["v"], datos["d"]
+        if direccion not in ('sig', 'ant') or len(crudos) != len(orden):
+            return None
+
+        valores = []
+        for (columna, _), crudo in zip(orden, crudos):
+            tipo = columna.type.python_type
+            if crudo is None:
+                valores.append(None)
+            elif tipo is date:
+                valores.append(date.fromisoformat(crudo))
+            elif tipo is datetime:
+                valores.append(datetime.fromisoformat(crudo))
+            else:
+                valores.append(tipo(crudo))
+        return valores, direccion
+    except (ValueError, KeyError, TypeError, NotImplementedError):
+        return None
+
+def _despues_de(columna, valor, descendente: bool):
+    """
+    Condición "la fila va después de valor" para una columna del orden.
+    Sigue el orden de NULLs de MySQL: primero en ASC, al final en DESC.
+    """
+    if valor is None:
+        return false() if descendente else columna.isnot(None)
+    if descendente:
+        return or_(columna < valor, columna.is_(None))
+    return columna > valor
+
+def _paginar_por_cursor(query, orden: list, per_page: int, cursor: Optional[str] = None) -> Dict:
+    """
+    Pagina una query por keyset (sin COUNT ni OFFSET)
+
+    Args:
+        query: Query con los filtros ya aplicados
+        orden: Lista de (columna, descendente); la última debe ser el id
+        per_page: Elementos por página
+        cursor: Token recibido de una página anterior (None = primera página)
+
+    Returns:
+        Dict con items, cursor_siguiente y cursor_anterior (None si no hay)
+    """
+    decodificado = _decodificar_cursor(cursor, orden) if cursor else None
+    hacia_atras = decodificado is not None and decodificado[1] == 'ant'
+
+    paginada = query
+    if decodificado:
+        valores = decodificado[0]
+        condiciones = []
+        for i, (columna, descendente) in enumerate(orden):
+            iguales = [
+                c.is_(None) if v is None else c == v
+                for (c, _), v in zip(orden[:i], valores[:i])
+            ]
+            condiciones.append(and_(*iguales, _despues_de(columna, valores[i], descendente != hacia_atras)))
+        paginada = paginada.filter(or_(*condiciones))
+
+    # Hacia atrás se recorre el orden invertido y luego se dan vuelta las filas
+    criterios = [
+        columna.desc() if descendente != hacia_atras else columna.asc()
+        for columna, descendente in orden
+    ]
+    filas = paginada.order_by(*criterios).limit(per_page + 1).all()
+    hay_mas = len(filas) > per_page
+    filas = filas[:per_page]
+
+    if hacia_atras:
+        if not filas:
+            # Ya no hay nada antes de este punto: volver a la primera página
+            return _paginar_por_cursor(query, orden, per_page)
+        filas.reverse()
+        hay_siguiente, hay_anterior = True, hay_mas
+    else:
+        hay_siguiente, hay_anterior = hay_mas, decodificado is not None
+
+    def clave(fila):
+        return [getattr(fila, columna.key) for columna, _ in orden]
+
+    return {
+        "items": filas,
+        "cursor_siguiente": _codificar_cursor(clave(filas[-1]), 'sig') if hay_siguiente and filas else None,
+        "cursor_anterior": _codificar_cursor(clave(filas[0]), 'ant') if hay_anterior and filas else None,
+    }
+
+def _paginar_sin_count(query, criterios: list, page: int, per_page: int,
+                       usuario_id: int, clave: tuple) -> Dict:
+    """
+    Paginación numerada sin COUNT en cada página
+
+    Trae per_page + 1 filas para saber si hay página siguiente. El total sale
+    de la caché por usuario y filtros (se descarta cuando el usuario escribe,
+    en este worker o en otro); si no está, se deduce de la última página o se
+    cuenta una sola vez.
+
+    Args:
+        query: Query con los filtros ya aplicados
+        criterios: Criterios de ORDER BY (el último debe ser el id)
+        page: Página solicitada (se ajusta al rango válido)
+        per_page: Elementos por página
+        usuario_id: Dueño de los datos (su versión de datos invalida el total)
+        clave: Nombre del listado seguido de los valores de sus filtros
+
+    Returns:
+        Dict con items, hay_siguiente, total_items, total_pages y current_page
+    """
+    version = cache.version_datos(query.session, usuario_id)
+    clave_cache = (usuario_id,) + clave
+    entrada = cache.cache_totales.obtener(clave_cache)
+    total = entrada[1] if entrada is not None and entrada[0] == version else None
+
+    page = max(page, 1)
+    if total is not None:
+        page = min(page, max((total + per_page - 1) // per_page, 1))
+
+    filas = query.order_by(*criterios).offset((page - 1) * per_page).limit(per_page + 1).all()
+    hay_siguiente = len(filas) > per_page
+    filas = filas[:per_page]
+
+    if total is None:
+        if not hay_siguiente and (filas or page == 1):
+            # Última página: el total sale sin contar
+            total = (page - 1) * per_page + len(filas)
+        else:
+            total = query.order_by(None).count()
+        cache.cache_totales.guardar(clave_cache, (version, total))
+
+    total_pages = max((total + per_page - 1) // per_page, 1)
+    if page > total_pages:
+        # Página fuera de rango: mostrar la última
+        page = total_pages
+        filas = query.order_by(*criterios).offset((page - 1) * per_page).limit(per_page).all()
+        hay_siguiente = False
+
+    return {
+        "items": filas,
+        "hay_siguiente": hay_siguiente,
+        "total_items": total,
+        "total_pages": total_pages,
+        "current_page": page,
+    }
+
+# ============================================================================
+# 🪶 PERFILES DE LISTADO
+# ============================================================================
+# Columnas que muestra cada listado. Las columnas Text que la plantilla no
+# usa (observaciones, notas) no se leen, y cada fila llega como un objeto
+# liviano sin estado ORM en lugar de una entidad completa.
+
+COLUMNAS_LISTADO = {
+    'creditos': (
+        models.Credito.id, models.Credito.nombre_credito, models.Credito.monto,
+        models.Credito.cuota, models.Credito.cuota_manual, models.Credito.seguro,
+        models.Credito.saldo_actual, models.Credito.estado, models.Credito.fecha_inicio,
+    ),
+    'contactos': (
+        models.Contacto.id, models.Contacto.nombres, models.Contacto.apellidos,
+        models.Contacto.categoria, models.Contacto.direccion, models.Contacto.celular1,
+        models.Contacto.celular2, models.Contacto.email,
+    ),
+    'cumpleanos': (
+        models.Cumpleano.id, models.Cumpleano.nombre_persona, models.Cumpleano.fecha_nacimiento,
+        models.Cumpleano.relacion, models.Cumpleano.telefono, models.Cumpleano.email,
+    ),
+}
+
+class FilaListado(SimpleNamespace):
+    """Fila de un listado: solo las columnas de su perfil (admite atributos calculados)"""
+
+def _filas_livianas(filas) -> List[FilaListado]:
+    """Convierte las filas (Row) de una consulta por columnas en FilaListado"""
+    return [FilaListado(**fila._mapping) for fila in filas]
+
 # ============================================================================
 # 💰 FUNCIONES DE INGRESOS
 # ============================================================================
 
+@medir
 def crear_ingreso(db: Session, ingreso: schemas.IngresoCreate, usuario_id: int):
     """Crea un nuevo ingreso para un usuario"""
     categoria = db.query(models.Categoria).filter_by(
@@ -109,112 +315,133 @@ def crear_ingreso(db: Session, ingreso: schemas.IngresoCreate, usuario_id: int):
         return None
     db_ingreso = models.Ingreso(**ingreso.model_dump(), usuario_id=usuario_id)
     db.add(db_ingreso)
+    resumen.registrar(db, 'ingreso', resumen.datos_ingreso(db_ingreso))
     db.commit()
     db.refresh(db_ingreso)
     return db_ingreso
 
+@medir
 def obtener_ingreso(db: Session, ingreso_id: int):
     """Obtiene un ingreso por ID con su categoría cargada"""
     return db.query(models.Ingreso).join(
         models.Categoria, models.Ingreso.categoria_id == models.Categoria.id
+    ).options(
+        contains_eager(models.Ingreso.categoria)
     ).filter(models.Ingreso.id == ingreso_id).first()
 
+@medir
 def actualizar_ingreso(db: Session, ingreso_id: int, ingreso: schemas.IngresoUpdate, usuario_id: int):
     """Actualiza un ingreso existente"""
     db_ingreso = obtener_ingreso(db, ingreso_id)
     if not db_ingreso or db_ingreso.usuario_id != usuario_id:
         return None
+    antes = resumen.datos_ingreso(db_ingreso)
     for key, value in ingreso.model_dump(exclude_unset=True).items():
         setattr(db_ingreso, key, value)
+    resumen.mover(db, 'ingreso', antes, resumen.datos_ingreso(db_ingreso))
     db.commit()
     db.refresh(db_ingreso)
     return db_ingreso
 
+@medir
 def eliminar_ingreso(db: Session, ingreso_id: int):
     """Elimina un ingreso"""
     db_ingreso = obtener_ingreso(db, ingreso_id)
     if db_ingreso:
+        resumen.registrar(db, 'ingreso', resumen.datos_ingreso(db_ingreso), -1)
         db.delete(db_ingreso)
         db.commit()
     return db_ingreso
 
+@medir
 def obtener_ingresos_paginados(db: Session, usuario_id: int, page: int = 1, 
                               tipo: Optional[str] = None, estado: Optional[str] = None, 
-                              per_page: int = 10):
+                              per_page: int = 10, cursor: Optional[str] = None,
+                              por_cursor: bool = False):
     """
     Obtiene ingresos paginados para un usuario específico
     
     Args:
         db: Sesión de base de datos
         usuario_id: ID del usuario
-        page: Página actual
+        page: Página actual (solo en modo numerado)
         tipo: Tipo de categoría para filtrar
         estado: Estado para filtrar ('recibido', 'pendiente', None = todos)
         per_page: Elementos por página
+        cursor: Token de página (activa el modo keyset)
+        por_cursor: Usar keyset aunque no haya cursor (primera página)
     
     Returns:
-        Dict con ingresos y total de páginas
+        Dict con ingresos y total de páginas, o con cursor_siguiente /
+        cursor_anterior en modo keyset
     """
-    print(f"\n=== OBTENER INGRESOS PAGINADOS ===")
-    print(f"Usuario ID: {usuario_id}")
-    print(f"Filtros - tipo: '{tipo}', estado: '{estado}'")
-    
-    # Construir query base con join a categoría
+    log.debug("Obtener ingresos paginados", extra={"usuario_id": usuario_id, "tipo": tipo, "estado": estado})
+
+    # Construir query base con join a categoría (el join también llena ingreso.categoria)
     query = db.query(models.Ingreso).join(
         models.Categoria, models.Ingreso.categoria_id == models.Categoria.id
+    ).options(
+        contains_eager(models.Ingreso.categoria)
     ).filter(models.Ingreso.usuario_id == usuario_id)
     
     # Aplicar filtro por tipo (si se especifica)
     if tipo and tipo.strip():
         query = query.filter(models.Categoria.tipo == tipo.strip())
-        print(f"✅ Aplicado filtro por tipo: '{tipo}'")
     
     # Aplicar filtro por estado (si se especifica)
     if estado in ['recibido', 'pendiente']:
         query = query.filter(models.Ingreso.estado == estado)
-        print(f"✅ Aplicado filtro por estado: '{estado}'")
-    
-    # Contar total después de filtros
-    total_filtrado = query.count()
-    print(f"📊 Total después de filtros: {total_filtrado}")
-    
-    # Calcular offset y límite para paginación
-    offset = (page - 1) * per_page
-    
-    # Obtener resultados paginados ordenados por fecha descendente
-    ingresos = query.order_by(
-        models.Ingreso.fecha.desc()
-    ).offset(offset).limit(per_page).all()
-    
-    # Calcular total de páginas
-    total_pages = 1
-    if total_filtrado > 0:
-        total_pages = (total_filtrado + per_page - 1) // per_page
-    
-    print(f"📖 Total de páginas: {total_pages}")
     
+    if por_cursor or cursor:
+        pagina = _paginar_por_cursor(
+            query, [(models.Ingreso.fecha, True), (models.Ingreso.id, True)], per_page, cursor
+        )
+        return {
+            "ingresos": pagina["items"],
+            "cursor_siguiente": pagina["cursor_siguiente"],
+            "cursor_anterior": pagina["cursor_anterior"],
+            "per_page": per_page
+        }
+    
+    # Página ordenada por fecha descendente; el total viene de la caché
+    pagina = _paginar_sin_count(
+        query, [models.Ingreso.fecha.desc(), models.Ingreso.id.desc()], page, per_page,
+        usuario_id, ('ingresos', tipo.strip() if tipo and tipo.strip() else None,
+                     estado if estado in ['recibido', 'pendiente'] else None)
+    )
+    log.debug("Ingresos paginados", extra={"total_items": pagina['total_items'],
+                                           "total_pages": pagina['total_pages']})
+
     return {
-        "ingresos": ingresos,
-        "total_pages": total_pages,
-        "total_items": total_filtrado,
-        "current_page": page,
+        "ingresos": pagina["items"],
+        "total_pages": pagina["total_pages"],
+        "total_items": pagina["total_items"],
+        "current_page": pagina["current_page"],
+        "hay_siguiente": pagina["hay_siguiente"],
         "per_page": per_page
     }
 
+@medir
 def obtener_ultimo_salario(db: Session, usuario_id: int):
     """Obtiene el último salario registrado por un usuario"""
     return db.query(models.Ingreso).filter(
         models.Ingreso.usuario_id == usuario_id,
     ).order_by(models.Ingreso.fecha.desc()).first()
 
+@medir
 def obtener_ingresos_mensuales(db: Session, usuario_id: int, year: int, month: int):
-    """Obtiene la suma de ingresos de un usuario para un mes específico"""
+    """
+    Obtiene la suma de ingresos de un usuario para un mes específico
+
+    Un solo mes es un rango del índice (usuario_id, fecha): se lee directo de
+    ingresos. Los reportes de varios meses usan resumen_mensual.
+    """
     return db.query(func.coalesce(func.sum(models.Ingreso.valor), 0)).filter(
         models.Ingreso.usuario_id == usuario_id,
-        extract('year', models.Ingreso.fecha) == year,
-        extract('month', models.Ingreso.fecha) == month
+        _condicion_mes(models.Ingreso.fecha, year, month)
     ).scalar()
 
+@medir
 def reparar_ingresos_corruptos(db: Session, usuario_id: int):
     """
     Encuentra y repara ingresos con categorías faltantes
@@ -226,8 +453,8 @@ def reparar_ingresos_corruptos(db: Session, usuario_id: int):
     Returns:
         int: Número de ingresos reparados
     """
-    print("=== REPARANDO INGRESOS CON CATEGORÍAS FALTANTES ===")
-    
+    log.debug("Reparando ingresos con categorías faltantes")
+
     # Encontrar ingresos con categoría_id que no existe
     todos_ingresos = db.query(models.Ingreso).filter(
         models.Ingreso.usuario_id == usuario_id
@@ -243,12 +470,12 @@ def reparar_ingresos_corruptos(db: Session, usuario_id: int):
         
         if not categoria:
             problemas.append(ingreso)
-            print(f"❌ Ingreso ID {ingreso.id} tiene categoría_id {ingreso.categoria_id} que NO EXISTE")
+            log.warning("Ingreso %s tiene categoria_id %s que no existe", ingreso.id, ingreso.categoria_id)
     
     # Reparar problemas
     if problemas:
-        print(f"\nEncontrados {len(problemas)} ingresos con problemas")
-        
+        log.debug("Encontrados %s ingresos con problemas", len(problemas))
+
         # Buscar o crear categoría por defecto
         categoria_default = db.query(models.Categoria).filter(
             models.Categoria.nombre == 'Sin Categoría',
@@ -265,17 +492,19 @@ def reparar_ingresos_corruptos(db: Session, usuario_id: int):
             db.add(categoria_default)
             db.commit()
             db.refresh(categoria_default)
-            print(f"✅ Creada categoría por defecto ID: {categoria_default.id}")
+            log.debug("Creada categoría por defecto %s", categoria_default.id)
         
         # Reparar ingresos
         for ingreso in problemas:
-            print(f"Reparando ingreso ID {ingreso.id}: {ingreso.categoria_id} -> {categoria_default.id}")
+            log.debug("Reparando ingreso %s: %s -> %s", ingreso.id, ingreso.categoria_id, categoria_default.id)
+            antes = resumen.datos_ingreso(ingreso)
             ingreso.categoria_id = categoria_default.id
+            resumen.mover(db, 'ingreso', antes, resumen.datos_ingreso(ingreso))
         
         db.commit()
-        print(f"✅ Reparados {len(problemas)} ingresos")
+        log.debug("Reparados %s ingresos", len(problemas))
     else:
-        print("✅ No se encontraron ingresos con problemas")
+        log.debug("No se encontraron ingresos con problemas")
     
     return len(problemas)
 
@@ -283,6 +512,7 @@ def reparar_ingresos_corruptos(db: Session, usuario_id: int):
 # 💸 FUNCIONES DE GASTOS
 # ============================================================================
 
+@medir
 def crear_gasto(db: Session, gasto: schemas.GastoCreate, usuario_id: int):
     """Crea un nuevo gasto para un usuario"""
     categoria = db.query(models.Categoria).filter_by(
@@ -292,67 +522,91 @@ def crear_gasto(db: Session, gasto: schemas.GastoCreate, usuario_id: int):
         return None
     db_gasto = models.Gasto(**gasto.model_dump(), usuario_id=usuario_id)
     db.add(db_gasto)
+    resumen.registrar(db, 'gasto', resumen.datos_gasto(db_gasto))
     db.commit()
     db.refresh(db_gasto)
     return db_gasto
 
+@medir
 def obtener_gasto(db: Session, gasto_id: int):
     """Obtiene un gasto por ID"""
     return db.query(models.Gasto).filter(models.Gasto.id == gasto_id).first()
 
+@medir
 def actualizar_gasto(db: Session, gasto_id: int, gasto: schemas.GastoUpdate, usuario_id: int):
     """Actualiza un gasto existente"""
     db_gasto = obtener_gasto(db, gasto_id)
     if not db_gasto or db_gasto.usuario_id != usuario_id:
         return None
+    antes = resumen.datos_gasto(db_gasto)
     for key, value in gasto.model_dump(exclude_unset=True).items():
         setattr(db_gasto, key, value)
+    resumen.mover(db, 'gasto', antes, resumen.datos_gasto(db_gasto))
     db.commit()
     db.refresh(db_gasto)
     return db_gasto
 
+@medir
 def eliminar_gasto(db: Session, gasto_id: int):
     """Elimina un gasto"""
     db_gasto = obtener_gasto(db, gasto_id)
     if db_gasto:
+        resumen.registrar(db, 'gasto', resumen.datos_gasto(db_gasto), -1)
         db.delete(db_gasto)
         db.commit()
     return db_gasto
 
+@medir
 def obtener_gastos_paginados(db: Session, usuario_id: int, page: int = 1, 
                             page_size: int = 10, tipo: Optional[str] = None, 
-                            pagado: Optional[bool] = None):
+                            pagado: Optional[bool] = None, cursor: Optional[str] = None,
+                            por_cursor: bool = False):
     """
     Obtiene gastos paginados para un usuario específico
     
     Args:
         db: Sesión de base de datos
         usuario_id: ID del usuario
-        page: Página actual
+        page: Página actual (solo en modo numerado)
         page_size: Elementos por página
         tipo: Tipo de categoría para filtrar
         pagado: Estado de pago para filtrar
+        cursor: Token de página (activa el modo keyset)
+        por_cursor: Usar keyset aunque no haya cursor (primera página)
     
     Returns:
-        Dict con gastos, total de páginas y página actual
+        Dict con gastos, total de páginas y página actual, o con
+        cursor_siguiente / cursor_anterior en modo keyset
     """
-    query = db.query(models.Gasto).join(models.Categoria).filter(models.Gasto.usuario_id == usuario_id)
+    query = db.query(models.Gasto).join(models.Categoria).options(
+        contains_eager(models.Gasto.categoria)
+    ).filter(models.Gasto.usuario_id == usuario_id)
     if tipo:
         query = query.filter(models.Categoria.tipo == tipo)
     if pagado is not None:
         query = query.filter(models.Gasto.pagado == pagado)
     
-    total_items = query.count()
-    total_pages = (total_items + page_size - 1) // page_size
-    gastos = query.order_by(models.Gasto.fecha_limite) \
-                  .offset((page - 1) * page_size) \
-                  .limit(page_size) \
-                  .all()
+    if por_cursor or cursor:
+        pagina = _paginar_por_cursor(
+            query, [(models.Gasto.fecha_limite, False), (models.Gasto.id, False)], page_size, cursor
+        )
+        return {
+            "gastos": pagina["items"],
+            "cursor_siguiente": pagina["cursor_siguiente"],
+            "cursor_anterior": pagina["cursor_anterior"]
+        }
+    
+    pagina = _paginar_sin_count(
+        query, [models.Gasto.fecha_limite, models.Gasto.id], page, page_size,
+        usuario_id, ('gastos', tipo or None, pagado)
+    )
     
     return {
-        "gastos": gastos,
-        "total_pages": total_pages,
-        "current_page": page
+        "gastos": pagina["items"],
+        "total_pages": pagina["total_pages"],
+        "current_page": pagina["current_page"],
+        "total_items": pagina["total_items"],
+        "hay_siguiente": pagina["hay_siguiente"]
     }
 
 # ============================================================================
@@ -376,10 +630,124 @@ def calcular_variacion(anterior: float, actual: float) -> float:
     variacion = ((actual - anterior) / anterior) * 100
     return round(variacion, 1)
 
+def _meses_evolucion(meses: int, hoy: datetime) -> List[tuple]:
+    """
+    Calcula los meses que muestra la gráfica de evolución
+
+    Returns:
+        Lista de tuplas (año, mes, label) en orden cronológico
+    """
+    periodos = []
+    for i in range(meses, 0, -1):
+        fecha_referencia = hoy - timedelta(days=30*i)
+        # Formatear label (ej: "Ene 2023")
+        nombre_mes = fecha_referencia.strftime('%b')
+        periodos.append((fecha_referencia.year, fecha_referencia.month,
+                         f"{nombre_mes} {fecha_referencia.year}"))
+    return periodos
+
+def _rango_mes(año: int, mes: int) -> tuple:
+    """Devuelve el rango semiabierto [primer día, primer día del mes siguiente)"""
+    inicio = date(año, mes, 1)
+    fin = date(año + 1, 1, 1) if mes == 12 else date(año, mes + 1, 1)
+    return inicio, fin
+
+def _condicion_mes(columna_fecha, año: int, mes: int):
+    """
+    Condición SQL que indica si una fecha pertenece a un mes concreto
+
+    Se usa un rango en lugar de extract('month'/'year') para que MySQL
+    pueda usar los índices (usuario_id, fecha).
+    """
+    inicio, fin = _rango_mes(año, mes)
+    return and_(columna_fecha >= inicio, columna_fecha < fin)
+
+def _suma_condicional(columna_valor, condicion):
+    """SUM(CASE WHEN condicion THEN valor ELSE 0 END) con 0 por defecto"""
+    return func.coalesce(func.sum(case((condicion, columna_valor), else_=0)), 0)
+
+def _sumas_resumen(db: Session, usuario_id: int, periodos: List[tuple], *extra_columnas):
+    """
+    Totales y sumas por mes de ingresos y gastos en UNA sola consulta sobre resumen_mensual
+
+    Args:
+        db: Sesión de base de datos
+        usuario_id: ID del usuario
+        periodos: Lista de (año, mes, ...) a calcular
+        extra_columnas: Columnas adicionales a incluir en el mismo SELECT
+
+    Returns:
+        Tupla (total_ingresos, total_gastos, [ingresos por periodo], [gastos por periodo], *extra_columnas)
+    """
+    resumen_mes = models.ResumenMensual
+    columnas = [
+        func.coalesce(func.sum(resumen_mes.total_ingresos), 0),
+        func.coalesce(func.sum(resumen_mes.total_gastos), 0)
+    ]
+    for año, mes, *_ in periodos:
+        es_periodo = and_(resumen_mes.anio == año, resumen_mes.mes == mes)
+        columnas.append(_suma_condicional(resumen_mes.total_ingresos, es_periodo))
+        columnas.append(_suma_condicional(resumen_mes.total_gastos, es_periodo))
+    columnas += list(extra_columnas)
+
+    fila = db.query(*columnas).filter(resumen_mes.usuario_id == usuario_id).one()
+
+    fin_periodos = 2 + 2 * len(periodos)
+    por_mes = [valor or 0 for valor in fila[2:fin_periodos]]
+    return (fila[0] or 0, fila[1] or 0, por_mes[0::2], por_mes[1::2], *fila[fin_periodos:])
+
+@medir
+def obtener_resumen_periodo(db: Session, usuario_id: int, fecha_inicio: date, fecha_fin: date) -> List[dict]:
+    """
+    Reporte mes a mes de ingresos y gastos entre dos fechas (ambos meses incluidos)
+
+    Lee resumen_mensual, por lo que el costo depende de la cantidad de meses,
+    no de la cantidad de transacciones.
+
+    Args:
+        db: Sesión de base de datos
+        usuario_id: ID del usuario
+        fecha_inicio: Cualquier fecha del primer mes
+        fecha_fin: Cualquier fecha del último mes
+
+    Returns:
+        Lista de dicts con anio, mes, ingresos, gastos, balance y cantidades
+    """
+    resumen_mes = models.ResumenMensual
+    clave_mes = resumen_mes.anio * 100 + resumen_mes.mes
+    filas = db.query(
+        resumen_mes.anio,
+        resumen_mes.mes,
+        func.sum(resumen_mes.total_ingresos),
+        func.sum(resumen_mes.total_gastos),
+        func.sum(resumen_mes.cantidad_ingresos),
+        func.sum(resumen_mes.cantidad_gastos)
+    ).filter(
+        resumen_mes.usuario_id == usuario_id,
+        clave_mes >= fecha_inicio.year * 100 + fecha_inicio.month,
+        clave_mes <= fecha_fin.year * 100 + fecha_fin.month
+    ).group_by(resumen_mes.anio, resumen_mes.mes).order_by(resumen_mes.anio, resumen_mes.mes).all()
+
+    return [
+        {
+            'anio': anio,
+            'mes': mes,
+            'ingresos': float(ingresos or 0),
+            'gastos': float(gastos or 0),
+            'balance': float((ingresos or 0) - (gastos or 0)),
+            'cantidad_ingresos': int(cantidad_ingresos or 0),
+            'cantidad_gastos': int(cantidad_gastos or 0)
+        }
+        for anio, mes, ingresos, gastos, cantidad_ingresos, cantidad_gastos in filas
+    ]
+
+@medir
 def obtener_evolucion_mensual(db: Session, usuario_id: int, meses: int = 6) -> Dict[str, list]:
     """
     Obtiene la evolución histórica de ingresos y gastos por mes
     
+    Usa una sola consulta sobre resumen_mensual sin importar cuántos meses se pidan.
+    
     Args:
         db: Sesión de base de datos
         usuario_id: ID del usuario
@@ -388,49 +756,25 @@ def obtener_evolucion_mensual(db: Session, usuario_id: int, meses: int = 6) -> D
     Returns:
         Dict con labels, ingresos y gastos por mes
     """
-    hoy = datetime.now()
-    resultado = {
-        'labels': [],
-        'ingresos': [],
-        'gastos': []
+    periodos = _meses_evolucion(meses, datetime.now())
+
+    _, _, ingresos, gastos = _sumas_resumen(db, usuario_id, periodos)
+
+    return {
+        'labels': [label for _, _, label in periodos],
+        'ingresos': [float(valor) for valor in ingresos],
+        'gastos': [float(valor) for valor in gastos]
     }
-    
-    # Recorrer los últimos N meses en orden cronológico
-    for i in range(meses, 0, -1):
-        fecha_referencia = hoy - timedelta(days=30*i)
-        mes = fecha_referencia.month
-        año = fecha_referencia.year
-        
-        # Consulta para ingresos del mes
-        ingresos = db.query(
-            func.coalesce(func.sum(models.Ingreso.valor), 0)
-        ).filter(
-            models.Ingreso.usuario_id == usuario_id,
-            extract('month', models.Ingreso.fecha) == mes,
-            extract('year', models.Ingreso.fecha) == año
-        ).scalar() or 0
-        
-        # Consulta para gastos del mes
-        gastos = db.query(
-            func.coalesce(func.sum(models.Gasto.valor), 0)
-        ).filter(
-            models.Gasto.usuario_id == usuario_id,
-            extract('month', models.Gasto.fecha_limite) == mes,
-            extract('year', models.Gasto.fecha_limite) == año
-        ).scalar() or 0
-        
-        # Formatear label (ej: "Ene 2023")
-        nombre_mes = fecha_referencia.strftime('%b')
-        resultado['labels'].append(f"{nombre_mes} {año}")
-        resultado['ingresos'].append(float(ingresos))
-        resultado['gastos'].append(float(gastos))
-    
-    return resultado
 
+@medir
 def obtener_estadisticas_dashboard(db: Session, usuario_id: int):
     """
     Obtiene todas las estadísticas para el dashboard
     
+    Todo el DashboardStats sale de 2 consultas fijas sobre resumen_mensual:
+      1. Totales, sumas por mes (SUM CASE) y último salario (subconsulta)
+      2. Gastos agrupados por (categoría, tipo)
+    
     Args:
         db: Sesión de base de datos
         usuario_id: ID del usuario
@@ -438,104 +782,74 @@ def obtener_estadisticas_dashboard(db: Session, usuario_id: int):
     Returns:
         DashboardStats: Objeto con todas las estadísticas
     """
-    # 1. Datos básicos
-    ultimo_salario = obtener_ultimo_salario(db, usuario_id)
-    salario_actual = ultimo_salario.valor if ultimo_salario else 0
-    
-    # 2. Totales generales
-    total_gastos = db.query(func.coalesce(func.sum(models.Gasto.valor), 0)).filter(
-        models.Gasto.usuario_id == usuario_id
-    ).scalar() or 0
-
-    total_ingresos = db.query(func.coalesce(func.sum(models.Ingreso.valor), 0)).filter(
-        models.Ingreso.usuario_id == usuario_id
-    ).scalar() or 0
-
-    saldo_disponible = total_ingresos - total_gastos
-    
-    # 3. Cálculo de variaciones (mes actual vs mes anterior)
+    # 1. Meses a calcular: evolución (últimos 6) + mes actual + mes anterior
     hoy = datetime.now()
     mes_actual = hoy.month
     año_actual = hoy.year
     mes_pasado = mes_actual - 1 if mes_actual > 1 else 12
     año_pasado = año_actual if mes_actual > 1 else año_actual - 1
 
-    # Gastos mes actual
-    gastos_mes_actual = db.query(func.coalesce(func.sum(models.Gasto.valor), 0)).filter(
-        and_(
-            models.Gasto.usuario_id == usuario_id,
-            extract('month', models.Gasto.fecha_limite) == mes_actual,
-            extract('year', models.Gasto.fecha_limite) == año_actual
-        )
-    ).scalar() or 0
+    evolucion = _meses_evolucion(6, hoy)
+    periodos = evolucion + [(año_actual, mes_actual), (año_pasado, mes_pasado)]
+    n = len(evolucion)
 
-    # Gastos mes anterior
-    gastos_mes_pasado = db.query(func.coalesce(func.sum(models.Gasto.valor), 0)).filter(
-        and_(
-            models.Gasto.usuario_id == usuario_id,
-            extract('month', models.Gasto.fecha_limite) == mes_pasado,
-            extract('year', models.Gasto.fecha_limite) == año_pasado
-        )
-    ).scalar() or 0
+    # 2. Totales y sumas por mes (incluye el último salario como subconsulta escalar)
+    ultimo_salario = db.query(models.Ingreso.valor).filter(
+        models.Ingreso.usuario_id == usuario_id
+    ).order_by(models.Ingreso.fecha.desc()).limit(1).scalar_subquery()
 
-    # Ingresos mes actual
-    ingresos_mes_actual = db.query(func.coalesce(func.sum(models.Ingreso.valor), 0)).filter(
-        and_(
-            models.Ingreso.usuario_id == usuario_id,
-            extract('month', models.Ingreso.fecha) == mes_actual,
-            extract('year', models.Ingreso.fecha) == año_actual
-        )
-    ).scalar() or 0
+    total_ingresos, total_gastos, ingresos_mes, gastos_mes, salario_actual = _sumas_resumen(
+        db, usuario_id, periodos, ultimo_salario
+    )
+    salario_actual = salario_actual or 0
 
-    # Ingresos mes anterior
-    ingresos_mes_pasado = db.query(func.coalesce(func.sum(models.Ingreso.valor), 0)).filter(
-        and_(
-            models.Ingreso.usuario_id == usuario_id,
-            extract('month', models.Ingreso.fecha) == mes_pasado,
-            extract('year', models.Ingreso.fecha) == año_pasado
-        )
-    ).scalar() or 0
+    saldo_disponible = total_ingresos - total_gastos
 
-    # Cálculo de variaciones porcentuales
+    # 3. Cálculo de variaciones porcentuales (mes actual vs mes anterior)
+    ingresos_mes_actual, ingresos_mes_pasado = ingresos_mes[n], ingresos_mes[n + 1]
+    gastos_mes_actual, gastos_mes_pasado = gastos_mes[n], gastos_mes[n + 1]
     variacion_gastos = calcular_variacion(gastos_mes_pasado, gastos_mes_actual)
     variacion_ingresos = calcular_variacion(ingresos_mes_pasado, ingresos_mes_actual)
     
     # 4. Porcentaje de ahorro
     porcentaje_ahorro = (saldo_disponible / total_ingresos * 100) if total_ingresos > 0 else 0
     
-    # 5. Gastos por categoría
-    gastos_por_categoria_query = db.query(
+    # 5. Gastos por categoría y por tipo (un solo GROUP BY)
+    gastos_agrupados = db.query(
         models.Categoria.nombre,
-        func.sum(models.Gasto.valor).label('total')
-    ).join(models.Gasto).filter(
-        models.Gasto.usuario_id == usuario_id
-    ).group_by(models.Categoria.nombre).all()
-
-    gastos_por_categoria = {categoria: total for categoria, total in gastos_por_categoria_query}
+        models.Categoria.tipo,
+        func.sum(models.ResumenMensual.total_gastos).label('total')
+    ).join(
+        models.ResumenMensual, models.ResumenMensual.categoria_id == models.Categoria.id
+    ).filter(
+        models.ResumenMensual.usuario_id == usuario_id
+    ).group_by(
+        models.Categoria.nombre, models.Categoria.tipo
+    ).having(func.sum(models.ResumenMensual.cantidad_gastos) > 0).all()
+
+    gastos_por_categoria = {}
+    gastos_por_tipo = {}
+    for nombre, tipo, total in gastos_agrupados:
+        gastos_por_categoria[nombre] = gastos_por_categoria.get(nombre, 0) + total
+        gastos_por_tipo[tipo] = gastos_por_tipo.get(tipo, 0) + total
     
     # Categoría con mayor gasto
-    categoria_mayor = max(gastos_por_categoria_query, key=lambda x: x[1], default=('Ninguna', 0))
-    
-    # 6. Gastos por tipo
-    gastos_por_tipo_query = db.query(
-        models.Categoria.tipo,
-        func.sum(models.Gasto.valor).label('total')
-    ).join(models.Gasto).filter(
-        models.Gasto.usuario_id == usuario_id
-    ).group_by(models.Categoria.tipo).all()
-
-    gastos_por_tipo = {tipo: total for tipo, total in gastos_por_tipo_query}
+    categoria_mayor = max(gastos_por_categoria.items(), key=lambda x: x[1], default=('Ninguna', 0))
     
-    # 7. Evolución mensual (últimos 6 meses)
-    evolucion_mensual = obtener_evolucion_mensual(db, usuario_id, meses=6)
+    # 6. Evolución mensual (últimos 6 meses)
+    evolucion_mensual = {
+        'labels': [label for _, _, label in evolucion],
+        'ingresos': [float(valor) for valor in ingresos_mes[:n]],
+        'gastos': [float(valor) for valor in gastos_mes[:n]]
+    }
     
-    # 8. Cálculo de porcentajes por tipo
-    total_fijos = sum(v for k, v in gastos_por_tipo.items() if k == 'fijo')
-    total_variables = sum(v for k, v in gastos_por_tipo.items() if k == 'variable')
+    # 7. Cálculo de porcentajes por tipo
+    total_fijos = gastos_por_tipo.get('fijo', 0)
+    total_variables = gastos_por_tipo.get('variable', 0)
     porcentaje_fijos = (total_fijos / total_gastos * 100) if total_gastos > 0 else 0
     porcentaje_variables = (total_variables / total_gastos * 100) if total_gastos > 0 else 0
     
-    # 9. Promedio mensual
+    # 8. Promedio mensual
     meses_con_datos = len([v for v in evolucion_mensual['gastos'] if v > 0])
     promedio_mensual = (sum(evolucion_mensual['gastos']) / meses_con_datos) if meses_con_datos > 0 else 0
     
@@ -560,20 +874,43 @@ def obtener_estadisticas_dashboard(db: Session, usuario_id: int):
         porcentaje_variables=round(porcentaje_variables, 1)
     )
 
+@medir
+def obtener_estadisticas_dashboard_cacheadas(db: Session, usuario_id: int):
+    """
+    Igual que obtener_estadisticas_dashboard, pero usando la caché por usuario
+
+    La entrada se descarta si el usuario escribió algo desde que se calculó
+    (versión de datos compartida, así cuenta también lo escrito en otro
+    worker) o si cambió el día (los meses dependen de hoy).
+    """
+    hoy = date.today()
+    version = cache.version_datos(db, usuario_id)
+
+    entrada = cache.cache_dashboard.obtener(usuario_id)
+    if entrada is not None and entrada[0] == version and entrada[1] == hoy:
+        return entrada[2]
+
+    stats = obtener_estadisticas_dashboard(db, usuario_id)
+    cache.cache_dashboard.guardar(usuario_id, (version, hoy, stats))
+    return stats
+
 # ============================================================================
 # 📅 FUNCIONES DE PENDIENTES
 # ============================================================================
 
+@medir
 def get_pendiente(db: Session, pendiente_id: int):
     """Obtiene un pendiente por ID"""
     return db.query(models.Pendiente).filter(models.Pendiente.id == pendiente_id).first()
 
+@medir
 def get_pendientes(db: Session, usuario_id: int, skip: int = 0, limit: int = 100):
     """Obtiene todos los pendientes de un usuario"""
     return db.query(models.Pendiente).filter(
         models.Pendiente.usuario_id == usuario_id
     ).offset(skip).limit(limit).all()
 
+@medir
 def get_pendientes_by_filters(db: Session, usuario_id: int, 
                              estado: Optional[str] = None, 
                              prioridad: Optional[str] = None):
@@ -585,6 +922,7 @@ def get_pendientes_by_filters(db: Session, usuario_id: int,
         query = query.filter(models.Pendiente.prioridad == prioridad)
     return query.all()
 
+@medir
 def create_pendiente(db: Session, pendiente: schemas.PendienteCreate, usuario_id: int):
     """Crea un nuevo pendiente"""
     db_pendiente = models.Pendiente(**pendiente.model_dump(), usuario_id=usuario_id)
@@ -593,6 +931,7 @@ def create_pendiente(db: Session, pendiente: schemas.PendienteCreate, usuario_id
     db.refresh(db_pendiente)
     return db_pendiente
 
+@medir
 def update_pendiente(db: Session, pendiente_id: int, pendiente: schemas.PendienteUpdate):
     """Actualiza un pendiente existente"""
     db_pendiente = get_pendiente(db, pendiente_id)
@@ -603,6 +942,7 @@ def update_pendiente(db: Session, pendiente_id: int, pendiente: schemas.Pendient
         db.refresh(db_pendiente)
     return db_pendiente
 
+@medir
 def delete_pendiente(db: Session, pendiente_id: int):
     """Elimina un pendiente"""
     db_pendiente = get_pendiente(db, pendiente_id)
@@ -611,6 +951,7 @@ def delete_pendiente(db: Session, pendiente_id: int):
         db.commit()
     return db_pendiente
 
+@medir
 def cambiar_estado_pendiente(db: Session, pendiente_id: int, estado: str):
     """Cambia el estado de un pendiente"""
     db_pendiente = get_pendiente(db, pendiente_id)
@@ -620,6 +961,7 @@ def cambiar_estado_pendiente(db: Session, pendiente_id: int, estado: str):
         db.refresh(db_pendiente)
     return db_pendiente
 
+@medir
 def agregar_recordatorio(db: Session, pendiente_id: int, recordatorio: datetime):
     """Agrega o actualiza el recordatorio de un pendiente"""
     db_pendiente = get_pendiente(db, pendiente_id)
@@ -641,18 +983,65 @@ def desencriptar_contrasena(contrasena_encriptada: str) -> str:
     """Desencripta una contraseña usando Fernet"""
     return cipher_suite.decrypt(contrasena_encriptada.encode()).decode()
 
+@medir
 def obtener_contrasenas_usuario(db: Session, usuario_id: int, skip: int = 0, limit: int = 100):
     """Obtiene todas las contraseñas de un usuario"""
     return db.query(models.Contrasena).filter(
         models.Contrasena.usuario_id == usuario_id
     ).order_by(models.Contrasena.servicio).offset(skip).limit(limit).all()
 
+@medir
+def obtener_contrasenas_paginadas(db: Session, usuario_id: int, page: int = 1,
+                                  per_page: int = 10):
+    """
+    Obtiene las contraseñas de un usuario paginadas en la base de datos
+
+    Solo trae las columnas que muestra el listado (sin contrasena_encriptada,
+    que se pide aparte al mostrar o copiar una contraseña). El total sale de
+    la caché de totales: el COUNT se hace una vez hasta la próxima escritura.
+
+    Args:
+        db: Sesión de base de datos
+        usuario_id: ID del usuario
+        page: Página solicitada (se ajusta al rango válido)
+        per_page: Elementos por página
+
+    Returns:
+        Dict con contrasenas, total de páginas, página actual y total de elementos
+    """
+    per_page = max(per_page, 1)
+    query = db.query(
+        models.Contrasena.id,
+        models.Contrasena.servicio,
+        models.Contrasena.usuario,
+        models.Contrasena.url,
+        models.Contrasena.notas
+    ).filter(
+        models.Contrasena.usuario_id == usuario_id
+    )
+
+    # La página se ajusta al rango válido dentro de _paginar_sin_count
+    pagina = _paginar_sin_count(
+        query, [models.Contrasena.servicio, models.Contrasena.id], page, per_page,
+        usuario_id, ('contrasenas',)
+    )
+
+    return {
+        "contrasenas": pagina["items"],
+        "total_pages": pagina["total_pages"],
+        "current_page": pagina["current_page"],
+        "total_items": pagina["total_items"],
+        "hay_siguiente": pagina["hay_siguiente"]
+    }
+
+@medir
 def obtener_contrasena(db: Session, contrasena_id: int):
     """Obtiene una contraseña específica por ID"""
     return db.query(models.Contrasena).filter(
         models.Contrasena.id == contrasena_id
     ).first()
 
+@medir
 def crear_contrasena(db: Session, contrasena: schemas.ContrasenaCreate, usuario_id: int):
     """Crea una nueva contraseña encriptada"""
     contrasena_encriptada = encriptar_contrasena(contrasena.contrasena)
@@ -669,6 +1058,7 @@ def crear_contrasena(db: Session, contrasena: schemas.ContrasenaCreate, usuario_
     db.refresh(db_contrasena)
     return db_contrasena
 
+@medir
 def actualizar_contrasena(db: Session, contrasena_id: int, 
                          contrasena: schemas.ContrasenaUpdate, usuario_id: int):
     """Actualiza una contraseña existente"""
@@ -691,6 +1081,7 @@ def actualizar_contrasena(db: Session, contrasena_id: int,
     db.refresh(db_contrasena)
     return db_contrasena
 
+@medir
 def eliminar_contrasena(db: Session, contrasena_id: int, usuario_id: int):
     """Elimina una contraseña"""
     db_contrasena = obtener_contrasena(db, contrasena_id)
@@ -701,6 +1092,7 @@ def eliminar_contrasena(db: Session, contrasena_id: int, usuario_id: int):
     db.commit()
     return True
 
+@medir
 def desencriptar_contrasena_db(db: Session, contrasena_id: int, usuario_id: int):
     """
     Obtiene una contraseña desencriptada para mostrarla al usuario
@@ -712,13 +1104,14 @@ def desencriptar_contrasena_db(db: Session, contrasena_id: int, usuario_id: int)
     try:
         return desencriptar_contrasena(contrasena.contrasena_encriptada)
     except Exception as e:
-        print(f"Error al desencriptar contraseña ID {contrasena_id}: {e}")
+        log.warning("Error al desencriptar contraseña %s: %s", contrasena_id, type(e).__name__)
         return None
 
 # ============================================================================
 # 🎂 FUNCIONES DE CUMPLEAÑOS
 # ============================================================================
 
+@medir
 def crear_cumpleano(db: Session, cumpleano: schemas.CumpleanoCreate, usuario_id: int):
     """Crea un nuevo registro de cumpleaños"""
     db_cumpleano = models.Cumpleano(**cumpleano.model_dump(), usuario_id=usuario_id)
@@ -727,33 +1120,52 @@ def crear_cumpleano(db: Session, cumpleano: schemas.CumpleanoCreate, usuario_id:
     db.refresh(db_cumpleano)
     return db_cumpleano
 
+@medir
 def obtener_cumpleano(db: Session, cumpleano_id: int):
     """Obtiene un cumpleaños por ID"""
     return db.query(models.Cumpleano).filter(models.Cumpleano.id == cumpleano_id).first()
 
+@medir
 def obtener_cumpleanos_usuario(db: Session, usuario_id: int, skip: int = 0, limit: int = 100):
     """Obtiene todos los cumpleaños de un usuario"""
     return db.query(models.Cumpleano).filter(
         models.Cumpleano.usuario_id == usuario_id
     ).order_by(models.Cumpleano.fecha_nacimiento).offset(skip).limit(limit).all()
 
+@medir
 def obtener_cumpleanos_paginados(db: Session, usuario_id: int, page: int = 1, 
-                                per_page: int = 10, relacion: Optional[str] = None):
-    """Obtiene cumpleaños con paginación y filtros"""
-    query = db.query(models.Cumpleano).filter(models.Cumpleano.usuario_id == usuario_id)
+                                per_page: int = 10, relacion: Optional[str] = None,
+                                cursor: Optional[str] = None, por_cursor: bool = False):
+    """Obtiene cumpleaños con paginación y filtros (numerada o por cursor), como filas livianas"""
+    query = db.query(*COLUMNAS_LISTADO['cumpleanos']).filter(models.Cumpleano.usuario_id == usuario_id)
     
     if relacion:
         query = query.filter(models.Cumpleano.relacion == relacion)
     
-    total = query.count()
-    cumpleanos = query.order_by(models.Cumpleano.fecha_nacimiento).offset((page - 1) * per_page).limit(per_page).all()
+    if por_cursor or cursor:
+        pagina = _paginar_por_cursor(
+            query, [(models.Cumpleano.fecha_nacimiento, False), (models.Cumpleano.id, False)], per_page, cursor
+        )
+        return {
+            "cumpleanos": _filas_livianas(pagina["items"]),
+            "cursor_siguiente": pagina["cursor_siguiente"],
+            "cursor_anterior": pagina["cursor_anterior"]
+        }
+    
+    pagina = _paginar_sin_count(
+        query, [models.Cumpleano.fecha_nacimiento, models.Cumpleano.id], page, per_page,
+        usuario_id, ('cumpleanos', relacion or None)
+    )
     
     return {
-        "cumpleanos": cumpleanos,
-        "total_pages": (total + per_page - 1) // per_page,
-        "current_page": page
+        "cumpleanos": _filas_livianas(pagina["items"]),
+        "total_pages": pagina["total_pages"],
+        "current_page": pagina["current_page"],
+        "total_items": pagina["total_items"],
+        "hay_siguiente": pagina["hay_siguiente"]
     }
 
+@medir
 def actualizar_cumpleano(db: Session, cumpleano_id: int, 
                         cumpleano: schemas.CumpleanoUpdate, usuario_id: int):
     """Actualiza un cumpleaños existente"""
@@ -768,6 +1180,7 @@ def actualizar_cumpleano(db: Session, cumpleano_id: int,
     db.refresh(db_cumpleano)
     return db_cumpleano
 
+@medir
 def eliminar_cumpleano(db: Session, cumpleano_id: int, usuario_id: int):
     """Elimina un cumpleaños"""
     db_cumpleano = obtener_cumpleano(db, cumpleano_id)
@@ -778,6 +1191,7 @@ def eliminar_cumpleano(db: Session, cumpleano_id: int, usuario_id: int):
     db.commit()
     return True
 
+@medir
 def obtener_proximos_cumpleanos(db: Session, usuario_id: int, dias: int = 30):
     """Obtiene los cumpleaños próximos dentro de X días"""
     hoy = date.today()
@@ -886,9 +1300,10 @@ def calcular_cuota_credito(monto: float, interes_mensual: float, plazo_meses: in
         # Redondear a 2 decimales
         return round(cuota, 2)
     except Exception as e:
-        print(f"Error en cálculo de cuota: {e}")
+        log.warning("Error en cálculo de cuota: %s", e)
         return 0.0
 
+@medir
 def crear_credito(db: Session, credito: schemas.CreditoCreate, usuario_id: int):
     """Crea un nuevo crédito para un usuario"""
     try:
@@ -896,7 +1311,6 @@ def crear_credito(db: Session, credito: schemas.CreditoCreate, usuario_id: int):
         if credito.cuota_manual and credito.cuota_manual > 0:
             # Usar la cuota manual proporcionada por el usuario
             cuota = credito.cuota_manual
-            print(f"📌 USANDO CUOTA MANUAL: ${cuota:,.2f}")
         else:
             # Calcular cuota automáticamente
             cuota = calcular_cuota_credito(
@@ -905,17 +1319,7 @@ def crear_credito(db: Session, credito: schemas.CreditoCreate, usuario_id: int):
                 credito.plazo_meses,
                 credito.frecuencia_pago
             )
-            print(f"🧮 CUOTA CALCULADA: ${cuota:,.2f}")
-        
-        print(f"\n💳 CREANDO CRÉDITO:")
-        print(f"   Monto: ${credito.monto:,.2f}")
-        print(f"   Interés: {credito.interes}% mensual")
-        print(f"   Plazo: {credito.plazo_meses} meses")
-        print(f"   Cuota manual: ${credito.cuota_manual:,.2f}" if credito.cuota_manual else "   Cuota manual: No usada")
-        print(f"   Cuota a usar: ${cuota:,.2f}")
-        print(f"   Seguro: ${credito.seguro:,.2f}")
-        print(f"   Cuota total: ${cuota + credito.seguro:,.2f}")
-        
+
         # Calcular total a pagar (cuota + seguro) * número de cuotas
         if credito.frecuencia_pago == 'quincenal':
             total_cuotas = credito.plazo_meses * 2
@@ -950,26 +1354,27 @@ def crear_credito(db: Session, credito: schemas.CreditoCreate, usuario_id: int):
         db.commit()
         db.refresh(db_credito)
         
-        print(f"✅ Crédito creado con ID: {db_credito.id}")
-        
+        log.debug("Crédito creado", extra={"credito_id": db_credito.id, "plazo_meses": credito.plazo_meses,
+                                           "cuota_manual": bool(credito.cuota_manual)})
         return db_credito
         
-    except Exception as e:
-        print(f"❌ Error al crear crédito: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        log.exception("Error al crear crédito")
         db.rollback()
         return None
 
+@medir
 def obtener_credito(db: Session, credito_id: int):
     """Obtiene un crédito por ID"""
     return db.query(models.Credito).filter(models.Credito.id == credito_id).first()
 
+@medir
 def obtener_creditos_paginados(db: Session, usuario_id: int, page: int = 1,
                                page_size: int = 10, estado: Optional[str] = None,
-                               frecuencia: Optional[str] = None):
-    """Obtiene créditos paginados con filtros"""
-    query = db.query(models.Credito).filter(models.Credito.usuario_id == usuario_id)
+                               frecuencia: Optional[str] = None, cursor: Optional[str] = None,
+                               por_cursor: bool = False):
+    """Obtiene créditos paginados con filtros (numerada o por cursor), como filas livianas"""
+    query = db.query(*COLUMNAS_LISTADO['creditos']).filter(models.Credito.usuario_id == usuario_id)
     
     if estado:
         query = query.filter(models.Credito.estado == estado)
@@ -977,20 +1382,30 @@ def obtener_creditos_paginados(db: Session, usuario_id: int, page: int = 1,
     if frecuencia:
         query = query.filter(models.Credito.frecuencia_pago == frecuencia)
     
-    total_items = query.count()
-    total_pages = (total_items + page_size - 1) // page_size if total_items > 0 else 1
-    
-    creditos = query.order_by(models.Credito.fecha_inicio.desc()) \
-                    .offset((page - 1) * page_size) \
-                    .limit(page_size) \
-                    .all()
+    if por_cursor or cursor:
+        pagina = _paginar_por_cursor(
+            query, [(models.Credito.fecha_inicio, True), (models.Credito.id, True)], page_size, cursor
+        )
+        return {
+            "creditos": _filas_livianas(pagina["items"]),
+            "cursor_siguiente": pagina["cursor_siguiente"],
+            "cursor_anterior": pagina["cursor_anterior"]
+        }
+    
+    pagina = _paginar_sin_count(
+        query, [models.Credito.fecha_inicio.desc(), models.Credito.id.desc()], page, page_size,
+        usuario_id, ('creditos', estado or None, frecuencia or None)
+    )
     
     return {
-        "creditos": creditos,
-        "total_pages": total_pages,
-        "current_page": page
+        "creditos": _filas_livianas(pagina["items"]),
+        "total_pages": pagina["total_pages"],
+        "current_page": pagina["current_page"],
+        "total_items": pagina["total_items"],
+        "hay_siguiente": pagina["hay_siguiente"]
     }
 
+@medir
 def actualizar_credito(db: Session, credito_id: int, credito: schemas.CreditoUpdate, usuario_id: int):
     """Actualiza un crédito existente"""
     db_credito = obtener_credito(db, credito_id)
@@ -1151,6 +1566,7 @@ def actualizar_credito(db: Session, credito_id: int, credito: schemas.CreditoUpd
 #     return db_credito
 
 
+@medir
 def eliminar_credito(db: Session, credito_id: int, usuario_id: int):
     """Elimina un crédito"""
     db_credito = obtener_credito(db, credito_id)
@@ -1166,6 +1582,7 @@ def eliminar_credito(db: Session, credito_id: int, usuario_id: int):
 # 💰 FUNCIONES DE PAGOS - AGREGAR EN crud.py
 # ============================================================================
 
+@medir
 def obtener_pagos_por_credito(db: Session, credito_id: int):
     """Obtiene todos los pagos de un crédito específico"""
     try:
@@ -1173,12 +1590,13 @@ def obtener_pagos_por_credito(db: Session, credito_id: int):
             models.Pago.credito_id == credito_id
         ).order_by(models.Pago.fecha_pago.desc()).all()
         
-        print(f"✅ Pagos encontrados para crédito {credito_id}: {len(pagos)}")
+        log.debug("Pagos del crédito", extra={"credito_id": credito_id, "pagos": len(pagos)})
         return pagos
-    except Exception as e:
-        print(f"❌ Error al obtener pagos: {e}")
+    except Exception:
+        log.exception("Error al obtener pagos del crédito %s", credito_id)
         return []
 
+@medir
 def crear_pago(db: Session, pago: schemas.PagoCreate, usuario_id: int):
     """Crea un nuevo pago para un crédito"""
     try:
@@ -1189,7 +1607,7 @@ def crear_pago(db: Session, pago: schemas.PagoCreate, usuario_id: int):
         ).first()
         
         if not credito:
-            print(f"❌ Crédito {pago.credito_id} no encontrado")
+            log.warning("Crédito %s no encontrado", pago.credito_id)
             return None
         
         # ✅ CONVERTIR float A Decimal para la base de datos
@@ -1217,16 +1635,15 @@ def crear_pago(db: Session, pago: schemas.PagoCreate, usuario_id: int):
         db.commit()
         db.refresh(db_pago)
         
-        print(f"✅ Pago creado ID: {db_pago.id} por ${pago.monto:,.2f}")
+        log.debug("Pago creado", extra={"pago_id": db_pago.id, "credito_id": pago.credito_id})
         return db_pago
         
-    except Exception as e:
-        print(f"❌ Error al crear pago: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        log.exception("Error al crear pago")
         db.rollback()
         return None
 
+@medir
 def eliminar_pago(db: Session, pago_id: int, usuario_id: int):
     """Elimina un pago y actualiza el saldo del crédito"""
     try:
@@ -1236,7 +1653,7 @@ def eliminar_pago(db: Session, pago_id: int, usuario_id: int):
         ).first()
         
         if not pago:
-            print(f"❌ Pago {pago_id} no encontrado")
+            log.warning("Pago %s no encontrado", pago_id)
             return False
         
         # Verificar que el crédito pertenece al usuario
@@ -1246,13 +1663,9 @@ def eliminar_pago(db: Session, pago_id: int, usuario_id: int):
         ).first()
         
         if not credito:
-            print(f"❌ Crédito {pago.credito_id} no encontrado o no pertenece al usuario")
+            log.warning("Crédito %s no encontrado o no pertenece al usuario", pago.credito_id)
             return False
         
-        print(f"\n=== ELIMINANDO PAGO ID: {pago_id} ===")
-        print(f"  Monto del pago: ${pago.monto}")
-        print(f"  Saldo actual antes: ${credito.saldo_actual:,.2f}")
-        
         # ✅ CORREGIDO: Convertir Decimal a Float para la operación
         monto_pago = float(pago.monto)
         credito.saldo_actual = float(credito.saldo_actual) + monto_pago
@@ -1260,27 +1673,23 @@ def eliminar_pago(db: Session, pago_id: int, usuario_id: int):
         # Si el crédito estaba pagado, volver a activo
         if credito.estado == 'pagado' and credito.saldo_actual > 0:
             credito.estado = 'activo'
-            print(f"  Estado cambiado de 'pagado' a 'activo'")
-        
-        print(f"  Saldo actual después: ${credito.saldo_actual:,.2f}")
-        
+
         # Eliminar el pago
         db.delete(pago)
         db.commit()
         
-        print(f"✅ Pago {pago_id} eliminado exitosamente")
+        log.debug("Pago eliminado", extra={"pago_id": pago_id, "credito_id": credito.id})
         return True
         
-    except Exception as e:
-        print(f"❌ Error al eliminar pago: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        log.exception("Error al eliminar pago %s", pago_id)
         db.rollback()
         return False
 # ============================================================================
 # 📇 FUNCIONES DE CONTACTOS
 # ============================================================================
 
+@medir
 def crear_contacto(db: Session, contacto: schemas.ContactoCreate, usuario_id: int):
     """Crea un nuevo contacto para un usuario"""
     db_contacto = models.Contacto(**contacto.model_dump(), usuario_id=usuario_id)
@@ -1289,57 +1698,70 @@ def crear_contacto(db: Session, contacto: schemas.ContactoCreate, usuario_id: in
     db.refresh(db_contacto)
     return db_contacto
 
+@medir
 def obtener_contacto(db: Session, contacto_id: int):
     """Obtiene un contacto por ID"""
     return db.query(models.Contacto).filter(models.Contacto.id == contacto_id).first()
 
+@medir
 def obtener_contactos_usuario(db: Session, usuario_id: int, skip: int = 0, limit: int = 100):
     """Obtiene todos los contactos de un usuario"""
     return db.query(models.Contacto).filter(
         models.Contacto.usuario_id == usuario_id
     ).order_by(models.Contacto.nombres).offset(skip).limit(limit).all()
 
+@medir
 def obtener_contactos_paginados(db: Session, usuario_id: int, page: int = 1, 
-                               per_page: int = 10, categoria: Optional[str] = None):
+                               per_page: int = 10, categoria: Optional[str] = None,
+                               cursor: Optional[str] = None, por_cursor: bool = False):
     """
     Obtiene contactos paginados para un usuario específico
     
     Args:
         db: Sesión de base de datos
         usuario_id: ID del usuario
-        page: Página actual
+        page: Página actual (solo en modo numerado)
         per_page: Elementos por página
         categoria: Categoría para filtrar
+        cursor: Token de página (activa el modo keyset)
+        por_cursor: Usar keyset aunque no haya cursor (primera página)
     
     Returns:
-        Dict con contactos, total de páginas y página actual
+        Dict con contactos (filas livianas, sin notas), total de páginas y
+        página actual, o con cursor_siguiente / cursor_anterior en modo keyset
     """
-    query = db.query(models.Contacto).filter(models.Contacto.usuario_id == usuario_id)
+    query = db.query(*COLUMNAS_LISTADO['contactos']).filter(models.Contacto.usuario_id == usuario_id)
     
     if categoria and categoria != "":
         query = query.filter(models.Contacto.categoria == categoria)
     
-    total_items = query.count()
-    total_pages = (total_items + per_page - 1) // per_page if total_items > 0 else 1
-    
-    # Ajustar página
-    if page < 1:
-        page = 1
-    elif page > total_pages and total_pages > 0:
-        page = total_pages
-    
-    contactos = query.order_by(models.Contacto.nombres, models.Contacto.apellidos) \
-                    .offset((page - 1) * per_page) \
-                    .limit(per_page) \
-                    .all()
+    if por_cursor or cursor:
+        pagina = _paginar_por_cursor(
+            query,
+            [(models.Contacto.nombres, False), (models.Contacto.apellidos, False), (models.Contacto.id, False)],
+            per_page, cursor
+        )
+        return {
+            "contactos": _filas_livianas(pagina["items"]),
+            "cursor_siguiente": pagina["cursor_siguiente"],
+            "cursor_anterior": pagina["cursor_anterior"]
+        }
+    
+    # La página se ajusta al rango válido dentro de _paginar_sin_count
+    pagina = _paginar_sin_count(
+        query, [models.Contacto.nombres, models.Contacto.apellidos, models.Contacto.id], page, per_page,
+        usuario_id, ('contactos', categoria or None)
+    )
     
     return {
-        "contactos": contactos,
-        "total_pages": total_pages,
-        "current_page": page,
-        "total_items": total_items
+        "contactos": _filas_livianas(pagina["items"]),
+        "total_pages": pagina["total_pages"],
+        "current_page": pagina["current_page"],
+        "total_items": pagina["total_items"],
+        "hay_siguiente": pagina["hay_siguiente"]
     }
 
+@medir
 def actualizar_contacto(db: Session, contacto_id: int, 
                        contacto: schemas.ContactoUpdate, usuario_id: int):
     """Actualiza un contacto existente"""
@@ -1354,6 +1776,7 @@ def actualizar_contacto(db: Session, contacto_id: int,
     db.refresh(db_contacto)
     return db_contacto
 
+@medir
 def eliminar_contacto(db: Session, contacto_id: int, usuario_id: int):
     """Elimina un contacto"""
     db_contacto = obtener_contacto(db, contacto_id)
@@ -1364,6 +1787,7 @@ def eliminar_contacto(db: Session, contacto_id: int, usuario_id: int):
     db.commit()
     return True
 
+@medir
 def buscar_contactos(db: Session, usuario_id: int, busqueda: str):
     """Busca contactos por nombre, apellido, empresa o teléfono"""
     query = db.query(models.Contacto).filter(models.Contacto.usuario_id == usuario_id)
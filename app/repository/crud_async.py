@@ -0,0 +1,159 @@
+"""
+Versiones async de las funciones de crud.py que usan las rutas async def
+
+Reciben una AsyncSession (get_async_db). Mientras se espera a la base de
+datos, el event loop sigue atendiendo otras peticiones. Las consultas son
+las mismas de crud.py, escritas con select() porque AsyncSession no tiene
+db.query(). Los listados paginados reutilizan la función síncrona de crud.py
+con run_sync, que la ejecuta sobre la misma conexión async.
+"""
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schema import models, schemas
+from app.repository import crud, contrasenas
+
+# ============================================================================
+# 🔐 FUNCIONES DE AUTENTICACIÓN
+# ============================================================================
+
+async def obtener_usuario_por_username(db: AsyncSession, username: str):
+    """Busca usuario por nombre de usuario"""
+    return await db.scalar(
+        select(models.Usuario).where(models.Usuario.username == username).limit(1)
+    )
+
+async def obtener_usuario_por_email(db: AsyncSession, email: str):
+    """Busca usuario por email"""
+    return await db.scalar(
+        select(models.Usuario).where(models.Usuario.email == email).limit(1)
+    )
+
+async def autenticar_usuario(db: AsyncSession, username: str, password: str):
+    """
+    Verifica las credenciales y actualiza el hash si no cumple la política
+
+    Args:
+        db: Sesión async
+        username: Nombre de usuario
+        password: Contraseña en texto plano
+
+    Returns:
+        El usuario si las credenciales son válidas, None si no
+    """
+    usuario = await obtener_usuario_por_username(db, username)
+    if not usuario or not await contrasenas.verificar_password_async(password, usuario.password):
+        return None
+
+    if contrasenas.necesita_rehash(usuario.password):
+        usuario.password = await contrasenas.hashear_password_async(password)
+        await db.commit()
+    return usuario
+
+async def crear_usuario(db: AsyncSession, usuario: schemas.UsuarioCreate):
+    """Crea un nuevo usuario con contraseña hasheada"""
+    db_usuario = models.Usuario(
+        nombre=usuario.nombre,
+        email=usuario.email,
+        username=usuario.username,
+        password=await contrasenas.hashear_password_async(usuario.password)
+    )
+    db.add(db_usuario)
+    await db.commit()
+    await db.refresh(db_usuario)
+    return db_usuario
+
+# ============================================================================
+# 📅 FUNCIONES DE PENDIENTES
+# ============================================================================
+
+async def get_pendiente(db: AsyncSession, pendiente_id: int):
+    """Obtiene un pendiente por ID"""
+    return await db.scalar(
+        select(models.Pendiente).where(models.Pendiente.id == pendiente_id).limit(1)
+    )
+
+async def get_pendientes_by_filters(db: AsyncSession, usuario_id: int,
+                                    estado: Optional[str] = None,
+                                    prioridad: Optional[str] = None):
+    """Obtiene pendientes de un usuario con filtros opcionales"""
+    query = select(models.Pendiente).where(models.Pendiente.usuario_id == usuario_id)
+    if estado:
+        query = query.where(models.Pendiente.estado == estado)
+    if prioridad:
+        query = query.where(models.Pendiente.prioridad == prioridad)
+    return (await db.scalars(query)).all()
+
+async def create_pendiente(db: AsyncSession, pendiente: schemas.PendienteCreate, usuario_id: int):
+    """Crea un nuevo pendiente"""
+    db_pendiente = models.Pendiente(**pendiente.model_dump(), usuario_id=usuario_id)
+    db.add(db_pendiente)
+    await db.commit()
+    await db.refresh(db_pendiente)
+    return db_pendiente
+
+async def update_pendiente(db: AsyncSession, pendiente_id: int, pendiente: schemas.PendienteUpdate):
+    """Actualiza un pendiente existente"""
+    db_pendiente = await get_pendiente(db, pendiente_id)
+    if db_pendiente:
+        for key, value in pendiente.model_dump(exclude_unset=True).items():
+            setattr(db_pendiente, key, value)
+        await db.commit()
+        await db.refresh(db_pendiente)
+    return db_pendiente
+
+async def delete_pendiente(db: AsyncSession, pendiente_id: int):
+    """Elimina un pendiente"""
+    db_pendiente = await get_pendiente(db, pendiente_id)
+    if db_pendiente:
+        await db.delete(db_pendiente)
+        await db.commit()
+    return db_pendiente
+
+# ============================================================================
+# 🎂 FUNCIONES DE CUMPLEAÑOS
+# ============================================================================
+
+async def crear_cumpleano(db: AsyncSession, cumpleano: schemas.CumpleanoCreate, usuario_id: int):
+    """Crea un nuevo registro de cumpleaños"""
+    db_cumpleano = models.Cumpleano(**cumpleano.model_dump(), usuario_id=usuario_id)
+    db.add(db_cumpleano)
+    await db.commit()
+    await db.refresh(db_cumpleano)
+    return db_cumpleano
+
+async def obtener_cumpleano(db: AsyncSession, cumpleano_id: int):
+    """Obtiene un cumpleaños por ID"""
+    return await db.scalar(
+        select(models.Cumpleano).where(models.Cumpleano.id == cumpleano_id).limit(1)
+    )
+
+async def obtener_cumpleanos_paginados(db: AsyncSession, usuario_id: int, **kwargs):
+    """Cumpleaños paginados: mismos argumentos y resultado que crud.obtener_cumpleanos_paginados"""
+    return await db.run_sync(crud.obtener_cumpleanos_paginados, usuario_id, **kwargs)
+
+async def actualizar_cumpleano(db: AsyncSession, cumpleano_id: int,
+                               cumpleano: schemas.CumpleanoUpdate, usuario_id: int):
+    """Actualiza un cumpleaños existente"""
+    db_cumpleano = await obtener_cumpleano(db, cumpleano_id)
+    if not db_cumpleano or db_cumpleano.usuario_id != usuario_id:
+        return None
+
+    for key, value in cumpleano.model_dump(exclude_unset=True).items():
+        setattr(db_cumpleano, key, value)
+
+    await db.commit()
+    await db.refresh(db_cumpleano)
+    return db_cumpleano
+
+async def eliminar_cumpleano(db: AsyncSession, cumpleano_id: int, usuario_id: int):
+    """Elimina un cumpleaños"""
+    db_cumpleano = await obtener_cumpleano(db, cumpleano_id)
+    if not db_cumpleano or db_cumpleano.usuario_id != usuario_id:
+        return False
+
+    await db.delete(db_cumpleano)
+    await db.commit()
+    return True
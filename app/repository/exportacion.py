@@ -0,0 +1,722 @@
+"""
+Exportaciones en streaming (Excel, CSV, NDJSON y Parquet)
+
+Las filas se leen por bloques (yield_per, cursor del lado del servidor en
+MySQL) como tuplas de columnas, sin entidades ORM, así la memoria no crece
+con la cantidad de filas.
+
+- Excel (ingresos, gastos): libro openpyxl en modo write-only. Las filas
+  van a un archivo temporal del propio openpyxl. Cada celda usa uno de los
+  estilos con nombre del libro, no objetos Font/PatternFill/Border propios.
+  El libro se genera en un hilo y sus bytes pasan a la respuesta HTTP a
+  medida que se escriben.
+- CSV / NDJSON (todas las entidades): generadores que entregan texto por
+  bloques; el encabezado sale antes de ejecutar la consulta.
+- Parquet (todas las entidades): lotes Arrow tipados (DECIMAL como
+  decimal128, fechas como date32/timestamp), un row group por bloque de
+  filas. Requiere pyarrow (está en requirements.txt).
+"""
+import csv
+import io
+import json
+import logging
+import queue
+import threading
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Callable, Dict, Iterator, List, Optional
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+from sqlalchemy import types as sqltypes
+from sqlalchemy.orm import Session
+
+from app.schema import models
+
+log = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # instalación sin requirements.txt: el resto de las exportaciones sigue funcionando
+    pa = pq = None
+
+FILAS_POR_BLOQUE = 1000
+TAMANO_BLOQUE_BYTES = 64 * 1024
+MAX_BLOQUES_EN_COLA = 16
+FILAS_POR_GRUPO_PARQUET = 50_000
+
+MEDIA_TYPE_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+MEDIA_TYPE_PARQUET = "application/vnd.apache.parquet"
+PARQUET_DISPONIBLE = pa is not None
+
+
+# ============================================================================
+# 🔎 CONSULTAS (mismos filtros que los listados)
+# ============================================================================
+
+def consulta_ingresos(db: Session, usuario_id: int, tipo: Optional[str] = None,
+                      estado: Optional[str] = None):
+    """Ingresos del usuario a exportar, como tuplas de columnas"""
+    query = db.query(
+        models.Ingreso.id,
+        models.Ingreso.notas,
+        models.Ingreso.valor,
+        models.Ingreso.estado,
+        models.Ingreso.fecha,
+        models.Categoria.nombre.label("categoria_nombre"),
+        models.Categoria.tipo.label("categoria_tipo")
+    ).join(
+        models.Categoria, models.Ingreso.categoria_id == models.Categoria.id
+    ).filter(models.Ingreso.usuario_id == usuario_id)
+
+    if tipo and tipo.strip():
+        query = query.filter(models.Categoria.tipo == tipo.strip())
+
+    if estado in ['recibido', 'pendiente']:
+        query = query.filter(models.Ingreso.estado == estado)
+
+    return query.order_by(models.Ingreso.fecha.desc(), models.Ingreso.id.desc())
+
+
+def consulta_gastos(db: Session, usuario_id: int, tipo: Optional[str] = None,
+                    estado: Optional[str] = None, pagado: Optional[bool] = None):
+    """Gastos del usuario a exportar, como tuplas de columnas"""
+    query = db.query(
+        models.Gasto.id,
+        models.Gasto.notas,
+        models.Gasto.valor,
+        models.Gasto.pagado,
+        models.Gasto.fecha_limite,
+        models.Categoria.nombre.label("categoria_nombre"),
+        models.Categoria.tipo.label("categoria_tipo")
+    ).join(
+        models.Categoria, models.Gasto.categoria_id == models.Categoria.id
+    ).filter(models.Gasto.usuario_id == usuario_id)
+
+    if tipo and tipo.strip():
+        query = query.filter(models.Categoria.tipo == tipo.strip())
+
+    if estado in ['pagado', 'pendiente']:
+        query = query.filter(models.Gasto.pagado == (estado == 'pagado'))
+
+    if pagado is not None:
+        query = query.filter(models.Gasto.pagado == pagado)
+
+    return query.order_by(models.Gasto.fecha_limite.desc(), models.Gasto.id.desc())
+
+
+def consulta_creditos(db: Session, usuario_id: int, estado: Optional[str] = None,
+                      frecuencia: Optional[str] = None, con_pagos: bool = True):
+    """
+    Créditos del usuario con sus pagos (LEFT JOIN): una fila por pago
+
+    Las columnas del pago llevan el prefijo pago_ y son NULL si el crédito
+    no tiene pagos. Las filas de un mismo crédito salen consecutivas.
+    Con con_pagos=False sale una fila por crédito, sin columnas de pago.
+    """
+    columnas = [
+        models.Credito.id,
+        models.Credito.nombre_credito,
+        models.Credito.monto,
+        models.Credito.interes,
+        models.Credito.plazo_meses,
+        models.Credito.frecuencia_pago,
+        models.Credito.fecha_inicio,
+        models.Credito.cuota,
+        models.Credito.cuota_manual,
+        models.Credito.seguro,
+        models.Credito.total_pagar,
+        models.Credito.saldo_actual,
+        models.Credito.estado,
+        models.Credito.observaciones,
+    ]
+    if not con_pagos:
+        query = db.query(*columnas)
+    else:
+        query = db.query(
+            *columnas,
+            models.Pago.id.label("pago_id"),
+            models.Pago.fecha_pago.label("pago_fecha_pago"),
+            models.Pago.monto.label("pago_monto"),
+            models.Pago.comprobante.label("pago_comprobante"),
+            models.Pago.notas.label("pago_notas")
+        ).outerjoin(
+            models.Pago, models.Pago.credito_id == models.Credito.id
+        )
+    query = query.filter(models.Credito.usuario_id == usuario_id)
+
+    if estado:
+        query = query.filter(models.Credito.estado == estado)
+
+    if frecuencia:
+        query = query.filter(models.Credito.frecuencia_pago == frecuencia)
+
+    query = query.order_by(models.Credito.fecha_inicio.desc(), models.Credito.id.desc())
+    if con_pagos:
+        query = query.order_by(models.Pago.fecha_pago, models.Pago.id)
+    return query
+
+
+def consulta_pagos(db: Session, usuario_id: int, credito_id: Optional[str] = None):
+    """Pagos de los créditos del usuario, con el nombre del crédito"""
+    query = db.query(
+        models.Pago.id,
+        models.Pago.credito_id,
+        models.Credito.nombre_credito,
+        models.Pago.fecha_pago,
+        models.Pago.monto,
+        models.Pago.comprobante,
+        models.Pago.notas,
+        models.Pago.created_at
+    ).join(
+        models.Credito, models.Pago.credito_id == models.Credito.id
+    ).filter(models.Credito.usuario_id == usuario_id)
+
+    if credito_id:
+        query = query.filter(models.Pago.credito_id == credito_id)
+
+    return query.order_by(models.Pago.credito_id, models.Pago.fecha_pago, models.Pago.id)
+
+
+def consulta_contactos(db: Session, usuario_id: int, categoria: Optional[str] = None):
+    """Contactos del usuario a exportar, como tuplas de columnas"""
+    query = db.query(
+        models.Contacto.id,
+        models.Contacto.nombres,
+        models.Contacto.apellidos,
+        models.Contacto.categoria,
+        models.Contacto.direccion,
+        models.Contacto.celular1,
+        models.Contacto.celular2,
+        models.Contacto.email,
+        models.Contacto.notas
+    ).filter(models.Contacto.usuario_id == usuario_id)
+
+    if categoria:
+        query = query.filter(models.Contacto.categoria == categoria)
+
+    return query.order_by(models.Contacto.nombres, models.Contacto.apellidos, models.Contacto.id)
+
+
+def consulta_cumpleanos(db: Session, usuario_id: int, relacion: Optional[str] = None):
+    """Cumpleaños del usuario a exportar, como tuplas de columnas"""
+    query = db.query(
+        models.Cumpleano.id,
+        models.Cumpleano.nombre_persona,
+        models.Cumpleano.fecha_nacimiento,
+        models.Cumpleano.telefono,
+        models.Cumpleano.email,
+        models.Cumpleano.relacion,
+        models.Cumpleano.notas,
+        models.Cumpleano.notificar_dias_antes
+    ).filter(models.Cumpleano.usuario_id == usuario_id)
+
+    if relacion:
+        query = query.filter(models.Cumpleano.relacion == relacion)
+
+    return query.order_by(models.Cumpleano.fecha_nacimiento, models.Cumpleano.id)
+
+
+def consulta_pendientes(db: Session, usuario_id: int, estado: Optional[str] = None,
+                        prioridad: Optional[str] = None):
+    """Pendientes del usuario a exportar, como tuplas de columnas"""
+    query = db.query(
+        models.Pendiente.id,
+        models.Pendiente.titulo,
+        models.Pendiente.descripcion,
+        models.Pendiente.estado,
+        models.Pendiente.prioridad,
+        models.Pendiente.fecha_creacion,
+        models.Pendiente.fecha_limite,
+        models.Pendiente.recordatorio
+    ).filter(models.Pendiente.usuario_id == usuario_id)
+
+    if estado:
+        query = query.filter(models.Pendiente.estado == estado)
+
+    if prioridad:
+        query = query.filter(models.Pendiente.prioridad == prioridad)
+
+    return query.order_by(models.Pendiente.id)
+
+
+# Entidades exportables: consulta y filtros que acepta (los mismos del listado HTML)
+EXPORTABLES: Dict[str, dict] = {
+    'ingresos': {'consulta': consulta_ingresos, 'filtros': ('tipo', 'estado')},
+    'gastos': {'consulta': consulta_gastos, 'filtros': ('tipo', 'pagado', 'estado')},
+    'creditos': {'consulta': consulta_creditos, 'filtros': ('estado', 'frecuencia')},
+    'pagos': {'consulta': consulta_pagos, 'filtros': ('credito_id',)},
+    'contactos': {'consulta': consulta_contactos, 'filtros': ('categoria',)},
+    'cumpleanos': {'consulta': consulta_cumpleanos, 'filtros': ('relacion',)},
+    'pendientes': {'consulta': consulta_pendientes, 'filtros': ('estado', 'prioridad')},
+}
+
+# En NDJSON, las columnas con este prefijo se agrupan en una lista por fila padre
+AGRUPACIONES = {
+    'creditos': ('pagos', 'pago_'),
+}
+
+
+def filtros_desde_query(entidad: str, params) -> dict:
+    """
+    Toma de los query params los filtros que acepta la entidad
+
+    Convierte como los listados: estado de ingresos en minúsculas y pagado
+    de gastos ('true'/'false') a booleano; los valores vacíos se ignoran.
+    """
+    filtros = {}
+    for nombre in EXPORTABLES[entidad]['filtros']:
+        valor = params.get(nombre)
+        if valor is None or valor == "":
+            continue
+        if entidad == 'ingresos' and nombre == 'estado':
+            valor = valor.lower()
+        if entidad == 'gastos' and nombre == 'pagado':
+            if valor.lower() not in ('true', 'false'):
+                continue
+            valor = valor.lower() == 'true'
+        filtros[nombre] = valor
+    return filtros
+
+
+# ============================================================================
+# 🎨 ESTILOS Y HOJAS
+# ============================================================================
+
+def _registrar_estilos(wb: Workbook, color_encabezado: str):
+    """Registra en el libro los estilos con nombre que usan las celdas"""
+    borde = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+    centrado = Alignment(horizontal="center")
+
+    def relleno(color: str) -> PatternFill:
+        return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+    estilos = [
+        NamedStyle(name="encabezado", font=Font(bold=True, color="FFFFFF", size=12),
+                   fill=relleno(color_encabezado), border=borde,
+                   alignment=Alignment(horizontal="center", vertical="center")),
+        NamedStyle(name="texto", border=borde),
+        NamedStyle(name="centrado", border=borde, alignment=centrado),
+        NamedStyle(name="moneda", border=borde, number_format='$#,##0'),
+        NamedStyle(name="estado_ok", border=borde, alignment=centrado,
+                   fill=relleno("d1fae5"), font=Font(color="065f46")),
+        NamedStyle(name="estado_pendiente", border=borde, alignment=centrado,
+                   fill=relleno("fed7aa"), font=Font(color="92400e")),
+        NamedStyle(name="estado_vencido", border=borde, alignment=centrado,
+                   fill=relleno("fee2e2"), font=Font(color="991b1b")),
+    ]
+    for estilo in estilos:
+        wb.add_named_style(estilo)
+
+
+def _fecha(valor) -> str:
+    return valor.strftime('%d/%m/%Y') if valor else '-'
+
+
+def _fila_ingreso(fila) -> List[tuple]:
+    """Celdas (valor, estilo) de un ingreso"""
+    recibido = fila.estado == 'recibido'
+    return [
+        (fila.notas or '-', "texto"),
+        (float(fila.valor), "moneda"),
+        ("Recibido" if recibido else "Pendiente", "estado_ok" if recibido else "estado_pendiente"),
+        (_fecha(fila.fecha), "centrado"),
+        (fila.categoria_nombre, "texto"),
+        (fila.categoria_tipo.capitalize(), "centrado"),
+    ]
+
+
+def _fila_gasto(fila) -> List[tuple]:
+    """Celdas (valor, estilo) de un gasto"""
+    return [
+        (fila.notas or '-', "texto"),
+        (float(fila.valor), "moneda"),
+        ("Pagado" if fila.pagado else "Pendiente", "estado_ok" if fila.pagado else "estado_vencido"),
+        (_fecha(fila.fecha_limite), "centrado"),
+        (fila.categoria_nombre, "texto"),
+        (fila.categoria_tipo.capitalize(), "centrado"),
+    ]
+
+
+# Definición de cada exportación: hoja, color, columnas (título, ancho), consulta y celdas
+HOJAS: Dict[str, dict] = {
+    'ingresos': {
+        'titulo': "Ingresos",
+        'color': "2563eb",
+        'columnas': [("Nombre", 25), ("Valor", 15), ("Estado", 15), ("Fecha", 12),
+                     ("Categoría", 20), ("Tipo", 12)],
+        'consulta': consulta_ingresos,
+        'fila': _fila_ingreso,
+    },
+    'gastos': {
+        'titulo': "Gastos",
+        'color': "dc2626",
+        'columnas': [("Nombre", 25), ("Valor", 15), ("Estado", 15), ("Fecha límite", 15),
+                     ("Categoría", 20), ("Tipo", 12)],
+        'consulta': consulta_gastos,
+        'fila': _fila_gasto,
+    },
+}
+
+
+# ============================================================================
+# 📗 ESCRITURA DEL LIBRO
+# ============================================================================
+
+def escribir_excel(db: Session, entidad: str, usuario_id: int, destino, **filtros) -> int:
+    """
+    Escribe el Excel de una entidad con memoria constante
+
+    Args:
+        db: Sesión de base de datos
+        entidad: 'ingresos' o 'gastos'
+        usuario_id: ID del usuario
+        destino: Ruta o archivo binario (no necesita ser seekable)
+        **filtros: Filtros del listado (tipo, estado)
+
+    Returns:
+        int: Número de filas escritas
+    """
+    hoja = HOJAS[entidad]
+    wb = Workbook(write_only=True)
+    _registrar_estilos(wb, hoja['color'])
+    ws = wb.create_sheet(hoja['titulo'])
+
+    for numero, (_, ancho) in enumerate(hoja['columnas'], 1):
+        ws.column_dimensions[get_column_letter(numero)].width = ancho
+
+    def celda(valor, estilo: str) -> WriteOnlyCell:
+        c = WriteOnlyCell(ws, value=valor)
+        c.style = estilo
+        return c
+
+    ws.append([celda(titulo, "encabezado") for titulo, _ in hoja['columnas']])
+
+    total = 0
+    for fila in hoja['consulta'](db, usuario_id, **filtros).yield_per(FILAS_POR_BLOQUE):
+        ws.append([celda(valor, estilo) for valor, estilo in hoja['fila'](fila)])
+        total += 1
+
+    wb.save(destino)
+    return total
+
+
+# ============================================================================
+# 📤 STREAMING HACIA LA RESPUESTA
+# ============================================================================
+
+class ExportacionCancelada(Exception):
+    """El cliente dejó de leer la respuesta (desconexión)"""
+
+
+_FIN = object()
+
+
+class _Tuberia:
+    """
+    Archivo de solo escritura que pasa los bytes a una cola acotada
+
+    No implementa tell/seek: zipfile lo detecta y escribe el .xlsx en modo
+    streaming (con descriptores de datos).
+    """
+
+    def __init__(self, cola: queue.Queue, tamano_bloque: int):
+        self._cola = cola
+        self._tamano_bloque = tamano_bloque
+        self._buffer = bytearray()
+        self.cancelada = False
+        self.closed = False
+
+    def write(self, datos) -> int:
+        if self.cancelada:
+            raise ExportacionCancelada()
+        self._buffer += datos
+        if len(self._buffer) >= self._tamano_bloque:
+            self._enviar(bytes(self._buffer))
+            self._buffer.clear()
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def cerrar(self):
+        """Envía lo que quede en el buffer"""
+        if self._buffer:
+            self._enviar(bytes(self._buffer))
+            self._buffer.clear()
+
+    def _enviar(self, elemento):
+        # Espera con timeout para notar una cancelación aunque la cola esté llena
+        while True:
+            if self.cancelada:
+                raise ExportacionCancelada()
+            try:
+                self._cola.put(elemento, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+
+def transmitir(escribir: Callable, tamano_bloque: int = TAMANO_BLOQUE_BYTES,
+               max_bloques: int = MAX_BLOQUES_EN_COLA) -> Iterator[bytes]:
+    """
+    Ejecuta escribir(destino) en un hilo y entrega los bytes según se producen
+
+    La cola acotada frena al escritor si el cliente lee más lento. Si el
+    cliente se desconecta, el generador se cierra y el escritor se detiene en
+    su siguiente escritura.
+    """
+    cola: queue.Queue = queue.Queue(maxsize=max_bloques)
+    tuberia = _Tuberia(cola, tamano_bloque)
+
+    def trabajar():
+        try:
+            escribir(tuberia)
+            tuberia.cerrar()
+            resultado = _FIN
+        except ExportacionCancelada:
+            return
+        except BaseException as exc:
+            resultado = exc
+        try:
+            tuberia._enviar(resultado)
+        except ExportacionCancelada:
+            pass
+
+    hilo = threading.Thread(target=trabajar, name="exportacion-excel", daemon=True)
+    hilo.start()
+    try:
+        while True:
+            elemento = cola.get()
+            if elemento is _FIN:
+                return
+            if isinstance(elemento, BaseException):
+                raise elemento
+            yield elemento
+    finally:
+        tuberia.cancelada = True
+
+
+def transmitir_excel(bind, entidad: str, usuario_id: int, **filtros) -> Iterator[bytes]:
+    """
+    Genera el Excel de una entidad en streaming
+
+    Usa su propia sesión sobre `bind` (el engine de la petición): la sesión de
+    la petición se cierra antes de que termine la respuesta.
+    """
+    def escribir(destino):
+        with Session(bind=bind) as db:
+            total = escribir_excel(db, entidad, usuario_id, destino, **filtros)
+        log.debug("Excel de %s generado", entidad, extra={"registros": total})
+
+    return transmitir(escribir)
+
+
+# ============================================================================
+# 📄 CSV Y NDJSON
+# ============================================================================
+
+def _valor_csv(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return 'true' if valor else 'false'
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
+
+def _valor_json(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def _agrupar(columnas: List[str], filas, clave_lista: str, prefijo: str) -> Iterator[dict]:
+    """Une las filas consecutivas de un mismo padre en un dict con su lista de hijos"""
+    hijos = [(i, c[len(prefijo):]) for i, c in enumerate(columnas) if c.startswith(prefijo)]
+    padre = [(i, c) for i, c in enumerate(columnas) if not c.startswith(prefijo)]
+    indice_id_hijo = columnas.index(f"{prefijo}id")
+
+    actual = None
+    for fila in filas:
+        if actual is None or fila[0] != actual['id']:
+            if actual is not None:
+                yield actual
+            actual = {c: fila[i] for i, c in padre}
+            actual[clave_lista] = []
+        if fila[indice_id_hijo] is not None:
+            actual[clave_lista].append({c: fila[i] for i, c in hijos})
+    if actual is not None:
+        yield actual
+
+
+def generar_csv(bind, entidad: str, usuario_id: int, filtros: dict) -> Iterator[str]:
+    """
+    Genera el CSV de una entidad por bloques de ~64 KB
+
+    El encabezado se entrega antes de ejecutar la consulta y la primera fila
+    apenas llega, así la descarga empieza de inmediato.
+    """
+    with Session(bind=bind) as db:
+        query = EXPORTABLES[entidad]['consulta'](db, usuario_id, **filtros)
+        columnas = [c['name'] for c in query.column_descriptions]
+
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerow(columnas)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+        for numero, fila in enumerate(query.yield_per(FILAS_POR_BLOQUE), 1):
+            escritor.writerow([_valor_csv(v) for v in fila])
+            if numero == 1 or buffer.tell() >= TAMANO_BLOQUE_BYTES:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        if buffer.tell():
+            yield buffer.getvalue()
+
+
+def generar_ndjson(bind, entidad: str, usuario_id: int, filtros: dict) -> Iterator[str]:
+    """
+    Genera el NDJSON de una entidad (un objeto JSON por línea) por bloques
+
+    Los créditos salen con sus pagos anidados en la lista "pagos".
+    """
+    with Session(bind=bind) as db:
+        query = EXPORTABLES[entidad]['consulta'](db, usuario_id, **filtros)
+        columnas = [c['name'] for c in query.column_descriptions]
+        filas = query.yield_per(FILAS_POR_BLOQUE)
+
+        if entidad in AGRUPACIONES:
+            objetos = _agrupar(columnas, filas, *AGRUPACIONES[entidad])
+        else:
+            objetos = (dict(zip(columnas, fila)) for fila in filas)
+
+        partes: List[str] = []
+        tamano = 0
+        for numero, objeto in enumerate(objetos, 1):
+            linea = json.dumps(objeto, default=_valor_json, ensure_ascii=False) + "\n"
+            partes.append(linea)
+            tamano += len(linea)
+            if numero == 1 or tamano >= TAMANO_BLOQUE_BYTES:
+                yield "".join(partes)
+                partes.clear()
+                tamano = 0
+        if partes:
+            yield "".join(partes)
+
+
+# ============================================================================
+# 🧱 PARQUET (Arrow)
+# ============================================================================
+
+# Tablas del historial financiero completo (archivo .zip con un .parquet por tabla)
+HISTORIAL_PARQUET = {
+    'ingresos': {},
+    'gastos': {},
+    'creditos': {'con_pagos': False},
+    'pagos': {},
+}
+
+
+def _tipo_arrow(tipo):
+    """Tipo Arrow equivalente a un tipo de columna de SQLAlchemy"""
+    if isinstance(tipo, sqltypes.Boolean):
+        return pa.bool_()
+    if isinstance(tipo, sqltypes.Integer):
+        return pa.int64()
+    if isinstance(tipo, sqltypes.Float):
+        return pa.float64()
+    if isinstance(tipo, sqltypes.Numeric):
+        return pa.decimal128(tipo.precision or 38, tipo.scale or 0)
+    if isinstance(tipo, sqltypes.DateTime):
+        return pa.timestamp("us")
+    if isinstance(tipo, sqltypes.Date):
+        return pa.date32()
+    return pa.string()
+
+
+def esquema_arrow(query):
+    """Esquema Arrow de una consulta de exportación (nombre y tipo de cada columna)"""
+    return pa.schema([
+        pa.field(c['name'], _tipo_arrow(c['type'])) for c in query.column_descriptions
+    ])
+
+
+def escribir_parquet(db: Session, entidad: str, usuario_id: int, destino,
+                     filas_por_grupo: int = FILAS_POR_GRUPO_PARQUET, **filtros) -> int:
+    """
+    Escribe el Parquet de una entidad en `destino` (ruta o archivo binario)
+
+    Las filas se acumulan por columnas y cada bloque de filas_por_grupo se
+    escribe como un row group, así la memoria depende del tamaño del bloque
+    y no del total.
+
+    Returns:
+        Cantidad de filas escritas
+    """
+    query = EXPORTABLES[entidad]['consulta'](db, usuario_id, **filtros)
+    esquema = esquema_arrow(query)
+    columnas: List[list] = [[] for _ in esquema]
+    total = 0
+
+    def escribir_grupo(writer):
+        lote = pa.record_batch(
+            [pa.array(valores, type=campo.type) for valores, campo in zip(columnas, esquema)],
+            schema=esquema
+        )
+        writer.write_batch(lote)
+        for valores in columnas:
+            valores.clear()
+
+    with pq.ParquetWriter(destino, esquema, compression="zstd") as writer:
+        for fila in query.yield_per(FILAS_POR_BLOQUE):
+            for valores, valor in zip(columnas, fila):
+                valores.append(valor)
+            total += 1
+            if total % filas_por_grupo == 0:
+                escribir_grupo(writer)
+        if not total or total % filas_por_grupo:
+            escribir_grupo(writer)
+
+    return total
+
+
+def generar_parquet(bind, entidad: str, usuario_id: int, filtros: dict) -> Iterator[bytes]:
+    """Genera el Parquet de una entidad en streaming (mismos filtros que CSV/NDJSON)"""
+    def escribir(destino):
+        with Session(bind=bind) as db:
+            total = escribir_parquet(db, entidad, usuario_id, destino, **filtros)
+        log.debug("Parquet de %s generado", entidad, extra={"registros": total})
+
+    return transmitir(escribir)
+
+
+def generar_historial_parquet(bind, usuario_id: int) -> Iterator[bytes]:
+    """
+    Genera un .zip con el historial financiero del usuario, un .parquet por tabla
+
+    Los .parquet ya van comprimidos, así que se guardan sin comprimir en el zip.
+    """
+    def escribir(destino):
+        with Session(bind=bind) as db, zipfile.ZipFile(destino, "w", zipfile.ZIP_STORED) as archivo:
+            for entidad, filtros in HISTORIAL_PARQUET.items():
+                with archivo.open(f"{entidad}.parquet", "w", force_zip64=True) as parquet:
+                    total = escribir_parquet(db, entidad, usuario_id, parquet, **filtros)
+                log.debug("Historial: %s.parquet generado", entidad, extra={"registros": total})
+
+    return transmitir(escribir)
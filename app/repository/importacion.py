@@ -0,0 +1,421 @@
+"""
+Importación masiva de extractos bancarios (CSV / XLSX) a gastos e ingresos
+
+El archivo se lee fila a fila y se guarda por lotes de LOTE_IMPORTACION
+filas, cada lote en su propia transacción:
+
+1. Cada fila lleva una huella (sha256 de fecha, valor, notas y número de
+   aparición en el archivo). Las huellas que ya están en
+   huellas_importacion se descartan, así reimportar el mismo extracto
+   cuesta una consulta por lote y no inserta nada.
+2. Las categorías salen de un mapa en memoria que se carga una vez por
+   importación. Las que faltan en el lote se crean juntas en un solo INSERT.
+3. Movimientos y huellas se insertan con executemany. El rollup mensual
+   recibe un delta por (categoría, periodo), todos en un solo upsert.
+
+Columnas reconocidas (sin importar mayúsculas ni tildes). Incluyen las que
+generan /export/{entidad}.csv y la descarga Excel:
+    fecha | fecha_limite, valor | monto | importe, categoria | categoria_nombre,
+    tipo | categoria_tipo, notas | nombre | descripcion | concepto,
+    pagado | estado
+
+Un extracto refleja movimientos ya ocurridos. Por eso, si no hay columna
+de estado, los gastos se importan pagados y los ingresos recibidos.
+
+Uso desde consola:
+    python -m app.repository.importacion extracto.csv --usuario 3 --entidad gastos
+"""
+import argparse
+import csv
+import hashlib
+import io
+import os
+import unicodedata
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from openpyxl import load_workbook
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.repository import cache, resumen
+from app.schema import models
+
+LOTE_IMPORTACION = int(os.getenv("IMPORT_LOTE", "1000"))
+MAX_ERRORES_REPORTADOS = 20
+FILAS_BUSQUEDA_ENCABEZADO = 10
+VALOR_MAXIMO = Decimal("9999999999.99")  # DECIMAL(12, 2)
+
+CATEGORIA_POR_DEFECTO = 'Sin Categoría'
+TIPOS_CATEGORIA = ('fijo', 'variable', 'opcional')
+
+# Entidades importables: modelo, tipo de movimiento (rollup y huellas) y columna de fecha
+ENTIDADES: Dict[str, dict] = {
+    'gastos': {'modelo': models.Gasto, 'tipo': 'gasto', 'columna_fecha': 'fecha_limite'},
+    'ingresos': {'modelo': models.Ingreso, 'tipo': 'ingreso', 'columna_fecha': 'fecha'},
+}
+
+# Encabezado normalizado -> campo
+ALIAS_COLUMNAS = {
+    'fecha': 'fecha', 'fecha_limite': 'fecha', 'fecha_movimiento': 'fecha', 'date': 'fecha',
+    'valor': 'valor', 'monto': 'valor', 'importe': 'valor', 'amount': 'valor',
+    'categoria': 'categoria', 'categoria_nombre': 'categoria', 'category': 'categoria',
+    'tipo': 'tipo', 'categoria_tipo': 'tipo', 'tipo_categoria': 'tipo',
+    'notas': 'notas', 'nombre': 'notas', 'descripcion': 'notas', 'concepto': 'notas',
+    'detalle': 'notas', 'description': 'notas',
+    'pagado': 'estado', 'estado': 'estado',
+}
+
+VALORES_VERDADEROS = {'true', '1', 'si', 'x', 'yes', 'pagado', 'recibido'}
+
+
+# ============================================================================
+# 📥 LECTURA DEL ARCHIVO
+# ============================================================================
+
+def _normalizar(texto) -> str:
+    """Minúsculas, sin tildes y con _ en lugar de espacios"""
+    texto = unicodedata.normalize('NFKD', str(texto or '').strip().lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return texto.replace(' ', '_').replace('-', '_')
+
+
+def _filas_csv(archivo) -> Iterator[list]:
+    """Filas de un CSV binario; detecta separador (, ; tab) y codificación"""
+    muestra = archivo.read(4096)
+    archivo.seek(0)
+    try:
+        muestra.decode('utf-8')
+        codificacion = 'utf-8-sig'
+    except UnicodeDecodeError:
+        codificacion = 'latin-1'
+
+    texto = io.TextIOWrapper(archivo, encoding=codificacion, newline='')
+    try:
+        dialecto = csv.Sniffer().sniff(muestra.decode(codificacion, errors='ignore'), delimiters=',;\t')
+    except csv.Error:
+        dialecto = csv.excel
+    try:
+        yield from csv.reader(texto, dialecto)
+    finally:
+        texto.detach()
+
+
+def _filas_xlsx(archivo) -> Iterator[list]:
+    """Filas de la primera hoja de un .xlsx (modo read-only, sin cargar el libro)"""
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        for fila in libro.active.iter_rows(values_only=True):
+            yield list(fila)
+    finally:
+        libro.close()
+
+
+def _ubicar_encabezado(filas: Iterator[Tuple[int, list]]) -> Dict[str, int]:
+    """
+    Busca la fila de encabezados entre las primeras filas del archivo
+
+    Returns:
+        Dict {campo: posición de la columna}
+    """
+    for numero, fila in filas:
+        posiciones = {}
+        for indice, titulo in enumerate(fila):
+            campo = ALIAS_COLUMNAS.get(_normalizar(titulo))
+            if campo and campo not in posiciones:
+                posiciones[campo] = indice
+        if 'fecha' in posiciones and 'valor' in posiciones:
+            return posiciones
+        if numero >= FILAS_BUSQUEDA_ENCABEZADO:
+            break
+    raise ValueError("No se encontraron las columnas de fecha y valor en el archivo")
+
+
+# ============================================================================
+# 🔄 CONVERSIÓN DE CADA FILA
+# ============================================================================
+
+def _a_fecha(valor) -> Optional[date]:
+    if valor is None or str(valor).strip() in ('', '-'):
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    # AAAA-MM-DD, DD/MM/AAAA, DD-MM-AAAA o AAAA/MM/DD (sin strptime: es el paso más lento por fila)
+    texto = str(valor).strip()[:10]
+    try:
+        return date.fromisoformat(texto)
+    except ValueError:
+        pass
+    partes = texto.replace('-', '/').split('/')
+    try:
+        if len(partes) == 3 and len(partes[0]) == 4:
+            return date(int(partes[0]), int(partes[1]), int(partes[2]))
+        if len(partes) == 3 and len(partes[2]) == 4:
+            return date(int(partes[2]), int(partes[1]), int(partes[0]))
+    except ValueError:
+        pass
+    raise ValueError(f"fecha no válida: {valor!r}")
+
+
+def _a_valor(valor) -> Decimal:
+    """
+    Valor absoluto con 2 decimales
+
+    Acepta números y textos como "1.234,56", "1,234.56" o "$ 12.500". Un
+    separador que aparece varias veces es de miles; si aparece una sola vez,
+    es decimal.
+    """
+    if isinstance(valor, (int, float, Decimal)) and not isinstance(valor, bool):
+        texto = str(valor)
+    else:
+        texto = ''.join(c for c in str(valor or '') if c.isdigit() or c in ',.-')
+        if ',' in texto and '.' in texto:
+            miles = '.' if texto.rfind(',') > texto.rfind('.') else ','
+            texto = texto.replace(miles, '')
+        for separador in (',', '.'):
+            if texto.count(separador) > 1:
+                texto = texto.replace(separador, '')
+        texto = texto.replace(',', '.')
+    try:
+        numero = abs(Decimal(texto)).quantize(resumen.CENTAVOS)
+    except InvalidOperation:
+        raise ValueError(f"valor no válido: {valor!r}")
+    if not numero or numero > VALOR_MAXIMO:
+        raise ValueError(f"valor fuera de rango: {valor!r}")
+    return numero
+
+
+def _celda(fila: list, posiciones: Dict[str, int], campo: str):
+    indice = posiciones.get(campo)
+    if indice is None or indice >= len(fila):
+        return None
+    return fila[indice]
+
+
+def _convertir(fila: list, posiciones: Dict[str, int], entidad: str) -> dict:
+    """Movimiento normalizado de una fila del archivo (ValueError si no es válida)"""
+    fecha = _a_fecha(_celda(fila, posiciones, 'fecha'))
+    if fecha is None and entidad == 'ingresos':
+        raise ValueError("la fecha es requerida")
+
+    notas = str(_celda(fila, posiciones, 'notas') or '').strip()
+    if notas == '-':
+        notas = ''
+
+    categoria = str(_celda(fila, posiciones, 'categoria') or '').strip()[:100] or CATEGORIA_POR_DEFECTO
+    tipo_categoria = _normalizar(_celda(fila, posiciones, 'tipo'))
+    estado = _celda(fila, posiciones, 'estado')
+    confirmado = estado is None or str(estado).strip() == '' or _normalizar(estado) in VALORES_VERDADEROS
+
+    return {
+        'fecha': fecha,
+        'valor': _a_valor(_celda(fila, posiciones, 'valor')),
+        'notas': notas or None,
+        'categoria': categoria,
+        'tipo_categoria': tipo_categoria if tipo_categoria in TIPOS_CATEGORIA else 'variable',
+        'confirmado': confirmado,
+    }
+
+
+def _contenido(movimiento: dict) -> bytes:
+    """Digest de los datos que identifican un movimiento del extracto"""
+    fecha = movimiento['fecha'].isoformat() if movimiento['fecha'] else ''
+    texto = f"{fecha}|{movimiento['valor']}|{movimiento['notas'] or ''}"
+    return hashlib.sha256(texto.encode('utf-8')).digest()
+
+
+# ============================================================================
+# 💾 GUARDADO POR LOTES
+# ============================================================================
+
+def _fila_gasto(movimiento: dict, usuario_id: int, categoria_id: int) -> dict:
+    return {
+        'categoria_id': categoria_id,
+        'usuario_id': usuario_id,
+        'valor': movimiento['valor'],
+        'fecha_limite': movimiento['fecha'],
+        'pagado': movimiento['confirmado'],
+        'notas': movimiento['notas'],
+    }
+
+
+def _fila_ingreso(movimiento: dict, usuario_id: int, categoria_id: int) -> dict:
+    return {
+        'categoria_id': categoria_id,
+        'usuario_id': usuario_id,
+        'valor': movimiento['valor'],
+        'fecha': movimiento['fecha'],
+        'es_salario': False,
+        'recurrente': False,
+        'estado': 'recibido' if movimiento['confirmado'] else 'pendiente',
+        'notas': movimiento['notas'],
+    }
+
+
+FILAS = {'gastos': _fila_gasto, 'ingresos': _fila_ingreso}
+
+
+def _crear_categorias(db: Session, usuario_id: int, faltantes: Dict[str, tuple],
+                      categorias: Dict[str, int]):
+    """Inserta las categorías faltantes en un solo INSERT y agrega sus IDs al mapa"""
+    db.execute(insert(models.Categoria.__table__), [
+        {'nombre': nombre, 'tipo': tipo, 'usuario_id': usuario_id}
+        for nombre, tipo in faltantes.values()
+    ])
+    creadas = db.query(models.Categoria.id, models.Categoria.nombre).filter(
+        models.Categoria.usuario_id == usuario_id,
+        models.Categoria.nombre.in_([nombre for nombre, _ in faltantes.values()])
+    )
+    for categoria_id, nombre in creadas:
+        categorias[nombre.casefold()] = categoria_id
+
+
+def _guardar_lote(db: Session, usuario_id: int, entidad: str, lote: List[dict],
+                  categorias: Dict[str, int], resultado: dict):
+    """Descarta duplicados, crea categorías e inserta un lote en una transacción"""
+    tipo = ENTIDADES[entidad]['tipo']
+    existentes = {
+        huella for (huella,) in db.query(models.HuellaImportacion.huella).filter(
+            models.HuellaImportacion.usuario_id == usuario_id,
+            models.HuellaImportacion.tipo == tipo,
+            models.HuellaImportacion.huella.in_([m['huella'] for m in lote])
+        )
+    }
+    nuevos = [m for m in lote if m['huella'] not in existentes]
+    resultado['duplicadas'] += len(lote) - len(nuevos)
+    if not nuevos:
+        return
+
+    try:
+        faltantes = {}
+        for movimiento in nuevos:
+            clave = movimiento['categoria'].casefold()
+            if clave not in categorias and clave not in faltantes:
+                faltantes[clave] = (movimiento['categoria'], movimiento['tipo_categoria'])
+        if faltantes:
+            _crear_categorias(db, usuario_id, faltantes, categorias)
+
+        filas = []
+        deltas = defaultdict(lambda: [Decimal('0.00'), 0])
+        for movimiento in nuevos:
+            categoria_id = categorias[movimiento['categoria'].casefold()]
+            filas.append(FILAS[entidad](movimiento, usuario_id, categoria_id))
+            # Mismo periodo que resumen: sin fecha -> (0, 0)
+            fecha = movimiento['fecha']
+            periodo = (fecha.year, fecha.month) if fecha else (0, 0)
+            delta = deltas[(categoria_id, periodo)]
+            delta[0] += movimiento['valor']
+            delta[1] += 1
+
+        db.execute(insert(ENTIDADES[entidad]['modelo'].__table__), filas)
+        db.execute(insert(models.HuellaImportacion.__table__), [
+            {'usuario_id': usuario_id, 'tipo': tipo, 'huella': m['huella']} for m in nuevos
+        ])
+        resumen.registrar_lote(db, tipo, [
+            ((usuario_id, categoria_id, periodo, total), cantidad)
+            for (categoria_id, periodo), (total, cantidad) in deltas.items()
+        ])
+        cache.incrementar_version(db, usuario_id)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    resultado['categorias_creadas'] += len(faltantes)
+    resultado['insertadas'] += len(nuevos)
+
+
+def importar_movimientos(db: Session, usuario_id: int, entidad: str, archivo,
+                         nombre_archivo: str = '', tamano_lote: int = LOTE_IMPORTACION) -> dict:
+    """
+    Importa un extracto CSV o XLSX como gastos o ingresos del usuario
+
+    Args:
+        db: Sesión de base de datos (cada lote se confirma por separado)
+        usuario_id: ID del usuario
+        entidad: 'gastos' o 'ingresos'
+        archivo: Archivo binario con posicionamiento (p. ej. UploadFile.file)
+        nombre_archivo: Nombre original; .xlsx se lee como Excel, el resto como CSV
+        tamano_lote: Filas por transacción
+
+    Returns:
+        dict con filas leídas, insertadas, duplicadas, inválidas,
+        categorías creadas y los primeros errores
+    """
+    if nombre_archivo.lower().endswith(('.xlsx', '.xlsm')):
+        filas = enumerate(_filas_xlsx(archivo), 1)
+    else:
+        filas = enumerate(_filas_csv(archivo), 1)
+    posiciones = _ubicar_encabezado(filas)
+
+    resultado = {'leidas': 0, 'insertadas': 0, 'duplicadas': 0, 'invalidas': 0,
+                 'categorias_creadas': 0, 'errores': []}
+    categorias = {
+        nombre.casefold(): categoria_id
+        for categoria_id, nombre in db.query(models.Categoria.id, models.Categoria.nombre).filter(
+            models.Categoria.usuario_id == usuario_id
+        )
+    }
+    ocurrencias: Counter = Counter()
+    lote: List[dict] = []
+
+    try:
+        for numero, fila in filas:
+            if not any(v not in (None, '') for v in fila):
+                continue
+            resultado['leidas'] += 1
+            try:
+                movimiento = _convertir(fila, posiciones, entidad)
+            except ValueError as exc:
+                resultado['invalidas'] += 1
+                if len(resultado['errores']) < MAX_ERRORES_REPORTADOS:
+                    resultado['errores'].append(f"Fila {numero}: {exc}")
+                continue
+
+            # Movimientos idénticos dentro del extracto se distinguen por su número de aparición
+            contenido = _contenido(movimiento)
+            ocurrencias[contenido] += 1
+            movimiento['huella'] = hashlib.sha256(contenido + b"|%d" % ocurrencias[contenido]).hexdigest()
+
+            lote.append(movimiento)
+            if len(lote) >= tamano_lote:
+                _guardar_lote(db, usuario_id, entidad, lote, categorias, resultado)
+                lote = []
+        if lote:
+            _guardar_lote(db, usuario_id, entidad, lote, categorias, resultado)
+    finally:
+        # Los INSERT de Core no pasan por los eventos de sesión de cache.py
+        if resultado['insertadas']:
+            cache.registrar_escritura(usuario_id)
+
+    return resultado
+
+
+if __name__ == "__main__":
+    import time
+    from app.config.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Importa un extracto CSV/XLSX como gastos o ingresos")
+    parser.add_argument("archivo", help="Ruta del archivo .csv o .xlsx")
+    parser.add_argument("--usuario", type=int, required=True, help="ID de usuario")
+    parser.add_argument("--entidad", choices=sorted(ENTIDADES), default="gastos")
+    parser.add_argument("--lote", type=int, default=LOTE_IMPORTACION, help="Filas por transacción")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        inicio = time.perf_counter()
+        with open(args.archivo, "rb") as archivo:
+            resultado = importar_movimientos(db, args.usuario, args.entidad, archivo,
+                                             args.archivo, args.lote)
+        print(f"✅ {resultado['insertadas']} insertadas, {resultado['duplicadas']} duplicadas, "
+              f"{resultado['invalidas']} inválidas de {resultado['leidas']} filas "
+              f"({time.perf_counter() - inicio:.2f}s)")
+        for error in resultado['errores']:
+            print(f"   ⚠️  {error}")
+    finally:
+        db.close()
@@ -0,0 +1,300 @@
+"""
+Rollup mensual de gastos e ingresos (tabla resumen_mensual)
+
+Cada alta, edición o baja de un Gasto/Ingreso aplica aquí un delta dentro
+de la misma transacción, así el dashboard y los reportes por periodo leen
+O(meses) filas en lugar de recorrer todas las transacciones.
+
+Reconstrucción / verificación:
+    python -m app.repository.resumen                 # reconstruye y verifica todo
+    python -m app.repository.resumen --usuario 3     # solo un usuario
+    python -m app.repository.resumen --solo-verificar
+"""
+import argparse
+from decimal import Decimal
+from typing import Optional, Dict, List
+
+from sqlalchemy import func, extract, update, insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.schema import models
+
+# Columnas (total, cantidad) de cada tipo de movimiento
+COLUMNAS = {
+    'gasto': ('total_gastos', 'cantidad_gastos'),
+    'ingreso': ('total_ingresos', 'cantidad_ingresos'),
+}
+
+CENTAVOS = Decimal('0.01')
+
+
+def _a_decimal(valor) -> Decimal:
+    """Normaliza un valor (float, str o Decimal) a Decimal con 2 decimales"""
+    return Decimal(str(valor or 0)).quantize(CENTAVOS)
+
+
+def _periodo(fecha) -> tuple:
+    """(año, mes) de una fecha; los gastos sin fecha van al periodo (0, 0)"""
+    if fecha is None:
+        return 0, 0
+    return fecha.year, fecha.month
+
+
+# ============================================================================
+# 📸 DATOS DE UN MOVIMIENTO
+# ============================================================================
+
+def datos_gasto(gasto: models.Gasto) -> tuple:
+    """Clave y valor de un gasto para el rollup: (usuario_id, categoria_id, periodo, valor)"""
+    return (gasto.usuario_id, gasto.categoria_id, _periodo(gasto.fecha_limite), _a_decimal(gasto.valor))
+
+
+def datos_ingreso(ingreso: models.Ingreso) -> tuple:
+    """Clave y valor de un ingreso para el rollup: (usuario_id, categoria_id, periodo, valor)"""
+    return (ingreso.usuario_id, ingreso.categoria_id, _periodo(ingreso.fecha), _a_decimal(ingreso.valor))
+
+
+# ============================================================================
+# ✏️ APLICAR DELTAS (sin commit: los hace quien llama)
+# ============================================================================
+
+def registrar(db: Session, tipo: str, datos: tuple, signo: int = 1, cantidad: int = 1):
+    """
+    Suma (signo=1) o resta (signo=-1) un movimiento en el rollup
+
+    Args:
+        db: Sesión de base de datos (se usa su transacción actual)
+        tipo: 'gasto' o 'ingreso'
+        datos: Tupla devuelta por datos_gasto / datos_ingreso
+        signo: 1 para altas, -1 para bajas
+        cantidad: Movimientos que representa `datos` (el valor es su suma);
+            lo usan las importaciones para aplicar un delta por periodo y categoría
+    """
+    columna_total, columna_cantidad = COLUMNAS[tipo]
+    usuario_id, categoria_id, (anio, mes), valor = datos
+    monto = valor * signo
+    movimientos = cantidad * signo
+
+    tabla = models.ResumenMensual.__table__
+    clave = {
+        'usuario_id': usuario_id,
+        'anio': anio,
+        'mes': mes,
+        'categoria_id': categoria_id,
+    }
+    incrementos = {
+        columna_total: tabla.c[columna_total] + monto,
+        columna_cantidad: tabla.c[columna_cantidad] + movimientos,
+    }
+    fila_nueva = {
+        **clave,
+        'total_gastos': 0, 'cantidad_gastos': 0,
+        'total_ingresos': 0, 'cantidad_ingresos': 0,
+        columna_total: monto, columna_cantidad: movimientos,
+    }
+
+    if db.get_bind().dialect.name == 'mysql':
+        # Upsert atómico sobre uk_resumen_mensual
+        stmt = mysql_insert(tabla).values(**fila_nueva).on_duplicate_key_update(**incrementos)
+        db.execute(stmt)
+        return
+
+    resultado = db.execute(
+        update(tabla)
+        .where(*[tabla.c[k] == v for k, v in clave.items()])
+        .values(**incrementos)
+    )
+    if resultado.rowcount == 0:
+        db.execute(insert(tabla).values(**fila_nueva))
+
+
+def registrar_lote(db: Session, tipo: str, deltas: List[tuple]):
+    """
+    Suma varios deltas al rollup con un solo upsert (executemany)
+
+    Args:
+        db: Sesión de base de datos (se usa su transacción actual)
+        tipo: 'gasto' o 'ingreso'
+        deltas: Lista de (datos, cantidad); datos como en registrar() con el
+            valor total de esos `cantidad` movimientos
+    """
+    if not deltas:
+        return
+    columna_total, columna_cantidad = COLUMNAS[tipo]
+    filas = [
+        {
+            'usuario_id': usuario_id, 'anio': anio, 'mes': mes, 'categoria_id': categoria_id,
+            'total_gastos': 0, 'cantidad_gastos': 0,
+            'total_ingresos': 0, 'cantidad_ingresos': 0,
+            columna_total: valor, columna_cantidad: cantidad,
+        }
+        for (usuario_id, categoria_id, (anio, mes), valor), cantidad in deltas
+    ]
+
+    tabla = models.ResumenMensual.__table__
+    dialecto = db.get_bind().dialect.name
+    if dialecto == 'mysql':
+        stmt = mysql_insert(tabla)
+        stmt = stmt.on_duplicate_key_update({
+            columna_total: tabla.c[columna_total] + stmt.inserted[columna_total],
+            columna_cantidad: tabla.c[columna_cantidad] + stmt.inserted[columna_cantidad],
+        })
+    elif dialecto == 'sqlite':
+        stmt = sqlite_insert(tabla)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['usuario_id', 'anio', 'mes', 'categoria_id'],
+            set_={
+                columna_total: tabla.c[columna_total] + stmt.excluded[columna_total],
+                columna_cantidad: tabla.c[columna_cantidad] + stmt.excluded[columna_cantidad],
+            }
+        )
+    else:
+        for datos, cantidad in deltas:
+            registrar(db, tipo, datos, cantidad=cantidad)
+        return
+    db.execute(stmt, filas)
+
+
+def mover(db: Session, tipo: str, antes: tuple, despues: tuple):
+    """Aplica una edición: resta los datos anteriores y suma los nuevos (si cambiaron)"""
+    if antes == despues:
+        return
+    registrar(db, tipo, antes, -1)
+    registrar(db, tipo, despues, 1)
+
+
+# ============================================================================
+# 🔧 RECONSTRUCCIÓN Y VERIFICACIÓN
+# ============================================================================
+
+def _agregados_en_vivo(db: Session, usuario_id: Optional[int] = None) -> Dict[tuple, list]:
+    """
+    Calcula el rollup directamente desde gastos e ingresos (recorre todas las filas)
+
+    Returns:
+        Dict {(usuario_id, anio, mes, categoria_id): [total_gastos, cantidad_gastos,
+                                                      total_ingresos, cantidad_ingresos]}
+    """
+    agregados = {}
+    fuentes = [
+        (models.Gasto, models.Gasto.fecha_limite, 0),
+        (models.Ingreso, models.Ingreso.fecha, 2),
+    ]
+    for modelo, columna_fecha, posicion in fuentes:
+        anio = extract('year', columna_fecha)
+        mes = extract('month', columna_fecha)
+        query = db.query(
+            modelo.usuario_id,
+            anio,
+            mes,
+            modelo.categoria_id,
+            func.coalesce(func.sum(modelo.valor), 0),
+            func.count(modelo.id)
+        )
+        if usuario_id is not None:
+            query = query.filter(modelo.usuario_id == usuario_id)
+        query = query.group_by(modelo.usuario_id, anio, mes, modelo.categoria_id)
+
+        for uid, a, m, categoria_id, total, cantidad in query:
+            clave = (uid, int(a or 0), int(m or 0), categoria_id)
+            fila = agregados.setdefault(clave, [Decimal('0.00'), 0, Decimal('0.00'), 0])
+            fila[posicion] = _a_decimal(total)
+            fila[posicion + 1] = cantidad
+    return agregados
+
+
+def reconstruir_resumen(db: Session, usuario_id: Optional[int] = None) -> int:
+    """
+    Borra y recalcula el rollup desde cero
+
+    Args:
+        db: Sesión de base de datos
+        usuario_id: Si se indica, solo se reconstruye ese usuario
+
+    Returns:
+        int: Número de filas de resumen creadas
+    """
+    borrar = db.query(models.ResumenMensual)
+    if usuario_id is not None:
+        borrar = borrar.filter(models.ResumenMensual.usuario_id == usuario_id)
+    borrar.delete(synchronize_session=False)
+
+    agregados = _agregados_en_vivo(db, usuario_id)
+    filas = [
+        {
+            'usuario_id': uid,
+            'anio': anio,
+            'mes': mes,
+            'categoria_id': categoria_id,
+            'total_gastos': total_gastos,
+            'cantidad_gastos': cantidad_gastos,
+            'total_ingresos': total_ingresos,
+            'cantidad_ingresos': cantidad_ingresos,
+        }
+        for (uid, anio, mes, categoria_id), (total_gastos, cantidad_gastos, total_ingresos, cantidad_ingresos)
+        in agregados.items()
+    ]
+    if filas:
+        db.execute(insert(models.ResumenMensual.__table__), filas)
+    db.commit()
+    return len(filas)
+
+
+def verificar_resumen(db: Session, usuario_id: Optional[int] = None) -> List[dict]:
+    """
+    Compara el rollup contra los datos en vivo
+
+    Returns:
+        Lista de diferencias (vacía si el rollup es correcto)
+    """
+    esperado = _agregados_en_vivo(db, usuario_id)
+
+    query = db.query(models.ResumenMensual)
+    if usuario_id is not None:
+        query = query.filter(models.ResumenMensual.usuario_id == usuario_id)
+
+    actual = {}
+    for fila in query:
+        valores = [_a_decimal(fila.total_gastos), fila.cantidad_gastos,
+                   _a_decimal(fila.total_ingresos), fila.cantidad_ingresos]
+        # Filas que quedaron en cero tras eliminar movimientos no son diferencias
+        if any(valores):
+            actual[(fila.usuario_id, fila.anio, fila.mes, fila.categoria_id)] = valores
+
+    diferencias = []
+    for clave in sorted(set(esperado) | set(actual), key=str):
+        vacio = [Decimal('0.00'), 0, Decimal('0.00'), 0]
+        if esperado.get(clave, vacio) != actual.get(clave, vacio):
+            diferencias.append({
+                'clave': clave,
+                'esperado': esperado.get(clave, vacio),
+                'actual': actual.get(clave, vacio),
+            })
+    return diferencias
+
+
+if __name__ == "__main__":
+    from app.config.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Reconstruye y verifica la tabla resumen_mensual")
+    parser.add_argument("--usuario", type=int, default=None, help="ID de usuario (por defecto, todos)")
+    parser.add_argument("--solo-verificar", action="store_true", help="No reconstruir, solo comparar")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if not args.solo_verificar:
+            creadas = reconstruir_resumen(db, args.usuario)
+            print(f"✅ Resumen reconstruido: {creadas} filas")
+
+        diferencias = verificar_resumen(db, args.usuario)
+        if diferencias:
+            print(f"❌ {len(diferencias)} diferencias entre resumen_mensual y los datos en vivo:")
+            for diferencia in diferencias[:50]:
+                print(f"   {diferencia['clave']}: esperado={diferencia['esperado']} actual={diferencia['actual']}")
+            raise SystemExit(1)
+        print("✅ resumen_mensual coincide con gastos e ingresos")
+    finally:
+        db.close()
@@ -0,0 +1,251 @@
+"""
+Trabajos de exportación a Excel en segundo plano
+
+Generar un .xlsx es trabajo de CPU en Python puro. Hecho dentro de la
+petición ocupa un hilo del threadpool que comparten todas las rutas
+síncronas. Aquí la petición solo encola un trabajo. Un ProcessPoolExecutor
+acotado escribe el archivo en un directorio temporal, y el cliente consulta
+el estado o descarga cuando está listo.
+
+Los trabajos idénticos se deduplican: misma clave (usuario, entidad,
+filtros, versión de datos del usuario) devuelve el mismo trabajo y el
+mismo archivo. La versión está en la base (versiones_datos, ver cache.py) y
+sube con cualquier escritura del usuario, también las hechas en otro
+worker, así que nunca se sirve un archivo con datos viejos.
+
+El estado de cada trabajo se guarda en la tabla trabajos_exportacion (en la
+primaria), no en memoria: con varios workers de uvicorn, la redirección a
+/exportaciones/{id}/descargar y las consultas de estado pueden llegar a un
+worker que no encoló el trabajo. Por lo mismo, EXPORT_DIR tiene que ser
+visible para todos los workers (en un solo servidor, el directorio temporal
+lo es). Un trabajo que sigue pendiente después de EXPORT_TIMEOUT se da por
+perdido (el worker que lo encoló se reinició) y se marca como error.
+
+Variables de entorno:
+    EXPORT_WORKERS     procesos del pool (por defecto 2)
+    EXPORT_DIR         directorio de los archivos (por defecto <tmp>/exportaciones)
+    EXPORT_TTL         segundos que se conserva un archivo terminado (por defecto 3600)
+    EXPORT_TIMEOUT     segundos máximos de un trabajo pendiente (por defecto 600)
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app.config.database import SessionLocal
+from app.repository import cache
+from app.schema.models import TrabajoExportacion
+
+log = logging.getLogger(__name__)
+
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "exportaciones"))
+EXPORT_TTL = float(os.getenv("EXPORT_TTL", "3600"))
+EXPORT_TIMEOUT = float(os.getenv("EXPORT_TIMEOUT", "600"))
+
+PENDIENTE = "pendiente"
+LISTO = "listo"
+ERROR = "error"
+
+
+def a_dict(trabajo: TrabajoExportacion) -> dict:
+    """Estado público del trabajo (para la respuesta JSON)"""
+    return {
+        "id": trabajo.id,
+        "entidad": trabajo.entidad,
+        "filtros": trabajo.filtros,
+        "estado": trabajo.estado,
+        "filas": trabajo.filas,
+        "error": trabajo.error,
+        "url_estado": f"/exportaciones/{trabajo.id}",
+        "url_descarga": f"/exportaciones/{trabajo.id}/descargar",
+    }
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _obtener_pool() -> ProcessPoolExecutor:
+    """Crea el pool la primera vez (spawn: el proceso web tiene hilos vivos)"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=EXPORT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def cerrar_pool():
+    """Espera los trabajos en curso, cancela los encolados y detiene el pool (al apagar la app)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+# ============================================================================
+# ⚙️ TRABAJO EN EL PROCESO HIJO
+# ============================================================================
+
+_engines: dict = {}
+
+
+def _generar_en_proceso(url_bd: str, entidad: str, usuario_id: int, filtros: dict, ruta: str) -> int:
+    """
+    Escribe el Excel en `ruta` (se ejecuta en un proceso del pool)
+
+    Cada proceso crea un engine propio por URL y lo reutiliza entre trabajos.
+    El archivo se escribe con otro nombre y se renombra al terminar, así
+    nunca se sirve un archivo a medio escribir.
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from app.repository import exportacion
+
+    engine = _engines.get(url_bd)
+    if engine is None:
+        engine = _engines[url_bd] = create_engine(url_bd, pool_pre_ping=True)
+
+    temporal = f"{ruta}.parcial"
+    try:
+        with Session(bind=engine) as db:
+            filas = exportacion.escribir_excel(db, entidad, usuario_id, temporal, **filtros)
+        os.replace(temporal, ruta)
+    except BaseException:
+        try:
+            os.remove(temporal)
+        except FileNotFoundError:
+            pass
+        raise
+    return filas
+
+
+# ============================================================================
+# 📋 REGISTRO DE TRABAJOS (tabla trabajos_exportacion)
+# ============================================================================
+
+def _clave(usuario_id: int, entidad: str, filtros: dict, version: int) -> str:
+    """Hash de la clave de deduplicación (igual en todos los workers)"""
+    datos = json.dumps([usuario_id, entidad, sorted(filtros.items()), version], default=str)
+    return hashlib.sha256(datos.encode("utf-8")).hexdigest()
+
+
+def _terminar(trabajo_id: str, futuro):
+    """Callback del futuro: guarda el resultado en la fila del trabajo"""
+    if futuro.cancelled():
+        # cerrar_pool() canceló el trabajo antes de empezar
+        valores = {"error": "La aplicación se detuvo", "estado": ERROR}
+    elif futuro.exception() is None:
+        valores = {"filas": futuro.result(), "estado": LISTO}
+    else:
+        exc = futuro.exception()
+        valores = {"error": str(exc) or exc.__class__.__name__, "estado": ERROR}
+        log.error("Error en exportación %s: %s", trabajo_id, valores["error"])
+    valores["terminado"] = time.time()
+    with SessionLocal() as db:
+        db.execute(update(TrabajoExportacion).where(TrabajoExportacion.id == trabajo_id).values(**valores))
+        db.commit()
+
+
+def _purgar_vencidos(db: Session):
+    """
+    Borra los trabajos terminados hace más de EXPORT_TTL (fila y archivo) y
+    marca como error los pendientes de más de EXPORT_TIMEOUT
+    """
+    ahora = time.time()
+    db.execute(
+        update(TrabajoExportacion)
+        .where(TrabajoExportacion.estado == PENDIENTE,
+               TrabajoExportacion.creado < ahora - EXPORT_TIMEOUT)
+        .values(estado=ERROR, error="El trabajo se interrumpió", terminado=ahora)
+    )
+    vencidos = db.execute(
+        select(TrabajoExportacion.id, TrabajoExportacion.ruta)
+        .where(TrabajoExportacion.terminado < ahora - EXPORT_TTL)
+    ).all()
+    if vencidos:
+        db.execute(delete(TrabajoExportacion).where(TrabajoExportacion.id.in_([id_ for id_, _ in vencidos])))
+    db.commit()
+    for _, ruta in vencidos:
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+
+def encolar_excel(db: Session, entidad: str, usuario_id: int, filtros: dict) -> TrabajoExportacion:
+    """
+    Encola la generación de un Excel (o devuelve el trabajo idéntico existente)
+
+    Args:
+        db: Sesión de la petición (puede ser una réplica): de ella salen la
+            versión de datos y la URL que lee el proceso hijo. El trabajo se
+            registra en la primaria.
+        entidad: 'ingresos' o 'gastos'
+        usuario_id: ID del usuario
+        filtros: Filtros del listado (tipo, estado)
+
+    Returns:
+        TrabajoExportacion pendiente, listo (archivo ya generado) o nuevo
+    """
+    filtros = {k: v for k, v in filtros.items() if v not in (None, "")}
+    clave = _clave(usuario_id, entidad, filtros, cache.version_datos(db, usuario_id))
+    url_bd = db.get_bind().url.render_as_string(hide_password=False)
+
+    with SessionLocal(expire_on_commit=False) as registro:
+        _purgar_vencidos(registro)
+        existente = registro.scalars(
+            select(TrabajoExportacion)
+            .where(TrabajoExportacion.clave == clave, TrabajoExportacion.estado != ERROR)
+            .order_by(TrabajoExportacion.creado.desc())
+            .limit(1)
+        ).first()
+        if existente is not None and (existente.estado == PENDIENTE or os.path.exists(existente.ruta)):
+            return existente
+
+        id_trabajo = uuid.uuid4().hex
+        trabajo = TrabajoExportacion(
+            id=id_trabajo, usuario_id=usuario_id, entidad=entidad, filtros=filtros, clave=clave,
+            estado=PENDIENTE, ruta=os.path.join(EXPORT_DIR, f"{entidad}_{id_trabajo}.xlsx"),
+            creado=time.time(),
+        )
+        registro.add(trabajo)
+        registro.commit()
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    futuro = _obtener_pool().submit(_generar_en_proceso, url_bd, entidad, usuario_id, filtros, trabajo.ruta)
+    futuro.add_done_callback(lambda f: _terminar(id_trabajo, f))
+    return trabajo
+
+
+def obtener_trabajo(trabajo_id: str, usuario_id: int) -> Optional[TrabajoExportacion]:
+    """Devuelve el trabajo si existe y pertenece al usuario (lo haya encolado o no este worker)"""
+    with SessionLocal(expire_on_commit=False) as db:
+        trabajo = db.get(TrabajoExportacion, trabajo_id)
+        if trabajo is None or trabajo.usuario_id != usuario_id:
+            return None
+        if trabajo.estado == PENDIENTE and trabajo.creado < time.time() - EXPORT_TIMEOUT:
+            trabajo.estado, trabajo.error, trabajo.terminado = ERROR, "El trabajo se interrumpió", time.time()
+            db.commit()
+        return trabajo
+
+
+def estadisticas() -> dict:
+    """Cantidad de trabajos por estado (de todos los workers)"""
+    conteo = {PENDIENTE: 0, LISTO: 0, ERROR: 0}
+    with SessionLocal() as db:
+        filas = db.execute(
+            select(TrabajoExportacion.estado, func.count()).group_by(TrabajoExportacion.estado)
+        ).all()
+    conteo.update(dict(filas))
+    return {"workers": EXPORT_WORKERS, "trabajos": conteo}
@@ -0,0 +1,35 @@
+"""
+Crea las tablas e índices del esquema a partir de Base.metadata
+
+Uso:
+    python -m app.schema.create_tables
+"""
+import logging
+
+from sqlalchemy import inspect
+
+from app.config.database import Base, engine
+from app.schema import models  # noqa: F401  (registra los modelos en Base.metadata)
+
+log = logging.getLogger(__name__)
+
+
+def crear_tablas(bind=engine):
+    """Crea las tablas faltantes y agrega los índices nuevos a tablas existentes"""
+    Base.metadata.create_all(bind=bind)
+
+    # create_all no agrega índices a tablas que ya existían
+    inspector = inspect(bind)
+    for tabla in Base.metadata.sorted_tables:
+        existentes = {indice['name'] for indice in inspector.get_indexes(tabla.name)}
+        for indice in tabla.indexes:
+            if indice.name not in existentes:
+                log.info("Creando índice %s en %s", indice.name, tabla.name)
+                indice.create(bind=bind)
+
+
+if __name__ == "__main__":
+    from app.config import logs
+    logs.configurar_logging()
+    crear_tablas()
+    print("✅ Esquema actualizado")
@@ -1,6 +1,6 @@
 from datetime import date, datetime
 from typing import Optional, Dict, List
-from sqlalchemy import Column, Float, Integer, String, Text, Enum, ForeignKey, Boolean, Date, DateTime, DECIMAL, UniqueConstraint
+from sqlalchemy import Column, Float, Integer, String, Text, Enum, JSON, ForeignKey, Boolean, Date, DateTime, DECIMAL, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from app.config.database import Base
 from sqlalchemy.sql import func
@@ -47,7 +47,10 @@ class Usuario(Base):
 # ============================================================================
 class Credito(Base):
     __tablename__ = "creditos"
-    
+    __table_args__ = (
+        Index('ix_creditos_usuario_fecha_inicio', 'usuario_id', 'fecha_inicio'),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     nombre_credito = Column(String(200))
     monto = Column(Float)
@@ -100,6 +103,9 @@ class Credito(Base):
 class Pago(Base):
     """Modelo para pagos de créditos"""
     __tablename__ = "pagos"
+    __table_args__ = (
+        Index('ix_pagos_credito_fecha', 'credito_id', 'fecha_pago'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     credito_id = Column(Integer, ForeignKey("creditos.id", ondelete="CASCADE"), nullable=False)
@@ -141,6 +147,9 @@ class Categoria(Base):
 # ----------------------------------------
 class Gasto(Base):
     __tablename__ = "gastos"
+    __table_args__ = (
+        Index('ix_gastos_usuario_fecha_limite', 'usuario_id', 'fecha_limite'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     categoria_id = Column(Integer, ForeignKey('categorias.id'), nullable=False)
@@ -160,6 +169,9 @@ class Gasto(Base):
 # ----------------------------------------
 class Ingreso(Base):
     __tablename__ = "ingresos"
+    __table_args__ = (
+        Index('ix_ingresos_usuario_fecha', 'usuario_id', 'fecha'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     categoria_id = Column(Integer, ForeignKey('categorias.id'), nullable=False)
@@ -176,6 +188,87 @@ class Ingreso(Base):
     usuario = relationship("Usuario", back_populates="ingresos")
     categoria = relationship("Categoria", back_populates="ingresos")
 
+# ----------------------------------------
+# 📌 Modelo ResumenMensual (rollup de gastos e ingresos)
+# ----------------------------------------
+class ResumenMensual(Base):
+    """
+    Totales por (usuario, año, mes, categoría), mantenidos en la misma
+    transacción que cada alta/edición/baja de Gasto o Ingreso.
+    Los gastos sin fecha_limite se guardan con anio=0, mes=0.
+    """
+    __tablename__ = "resumen_mensual"
+    __table_args__ = (
+        UniqueConstraint('usuario_id', 'anio', 'mes', 'categoria_id', name='uk_resumen_mensual'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    usuario_id = Column(Integer, ForeignKey('usuarios.id'), nullable=False)
+    anio = Column(Integer, nullable=False)
+    mes = Column(Integer, nullable=False)
+    categoria_id = Column(Integer, nullable=False)  # Sin FK: reparar_ingresos_corruptos maneja categorías inexistentes
+    total_gastos = Column(DECIMAL(14, 2), nullable=False, default=0)
+    cantidad_gastos = Column(Integer, nullable=False, default=0)
+    total_ingresos = Column(DECIMAL(14, 2), nullable=False, default=0)
+    cantidad_ingresos = Column(Integer, nullable=False, default=0)
+
+# ----------------------------------------
+# 📌 Modelo VersionDatos (versión compartida de los datos de un usuario)
+# ----------------------------------------
+class VersionDatos(Base):
+    """
+    Sube en cada transacción que modifica datos del usuario (ver
+    app/repository/cache.py). Al estar en la base, todos los workers ven la
+    misma versión.
+    """
+    __tablename__ = "versiones_datos"
+
+    usuario_id = Column(Integer, ForeignKey('usuarios.id'), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+# ----------------------------------------
+# 📌 Modelo TrabajoExportacion (exportaciones a Excel en segundo plano)
+# ----------------------------------------
+class TrabajoExportacion(Base):
+    """
+    Estado de un trabajo de exportación (ver app/repository/trabajos.py).
+    Al estar en la base, cualquier worker responde el estado y la descarga,
+    no solo el que encoló el trabajo.
+    """
+    __tablename__ = "trabajos_exportacion"
+
+    id = Column(String(32), primary_key=True)  # uuid4 en hexadecimal
+    usuario_id = Column(Integer, ForeignKey('usuarios.id'), nullable=False)
+    entidad = Column(String(20), nullable=False)
+    filtros = Column(JSON, nullable=False)
+    clave = Column(String(64), nullable=False, index=True)  # sha256 de la clave de deduplicación
+    estado = Column(Enum('pendiente', 'listo', 'error', name='estado_trabajo_enum'),
+                    nullable=False, default='pendiente')
+    ruta = Column(String(500), nullable=False)
+    filas = Column(Integer)
+    error = Column(Text)
+    creado = Column(Float, nullable=False)  # time.time(), para comparar con EXPORT_TTL
+    terminado = Column(Float)
+
+# ----------------------------------------
+# 📌 Modelo HuellaImportacion (deduplicación de importaciones)
+# ----------------------------------------
+class HuellaImportacion(Base):
+    """
+    Hash del contenido de cada movimiento importado desde un extracto.
+    Reimportar el mismo archivo encuentra todas sus huellas y no inserta nada.
+    """
+    __tablename__ = "huellas_importacion"
+    __table_args__ = (
+        UniqueConstraint('usuario_id', 'tipo', 'huella', name='uk_huella_importacion'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    usuario_id = Column(Integer, ForeignKey('usuarios.id'), nullable=False)
+    tipo = Column(Enum('gasto', 'ingreso', name='tipo_huella_enum'), nullable=False)
+    huella = Column(String(64), nullable=False)  # sha256 en hexadecimal
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 # ----------------------------------------
 # 📌 Esquemas Pydantic para Ingreso
 # ----------------------------------------
@@ -238,7 +331,10 @@ class DashboardStats(BaseModel):
 # ----------------------------------------
 class Contrasena(Base):
     __tablename__ = "contrasenas"
-    
+    __table_args__ = (
+        Index('ix_contrasenas_usuario_servicio', 'usuario_id', 'servicio'),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     servicio = Column(String, index=True)
     usuario = Column(String)
@@ -259,7 +355,10 @@ contrasenas = relationship("Contrasena", back_populates="usuario_rel", cascade="
 # 🎂 AGREGAR ESTA CLASE AL FINAL
 class Cumpleano(Base):
     __tablename__ = "cumpleanos"
-    
+    __table_args__ = (
+        Index('ix_cumpleanos_usuario_fecha_nacimiento', 'usuario_id', 'fecha_nacimiento'),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     nombre_persona = Column(String(100), nullable=False)
     fecha_nacimiento = Column(Date, nullable=False)
@@ -282,7 +381,10 @@ class Cumpleano(Base):
 # En models.py, modifica la clase Contacto:
 class Contacto(Base):
     __tablename__ = "contactos"
-    
+    __table_args__ = (
+        Index('ix_contactos_usuario_nombres', 'usuario_id', 'nombres', 'apellidos'),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     nombres = Column(String(100), nullable=False)
     apellidos = Column(String(100), nullable=False)
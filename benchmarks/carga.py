@@ -0,0 +1,478 @@
+"""
+Prueba de carga HTTP de punta a punta con presupuestos de latencia
+
+Arranca main:app sobre una base SQLite sembrada con benchmarks.generar_datos
+y la recorre con usuarios virtuales concurrentes. Cada usuario virtual
+inicia sesión con su propio usuario perf<id> y repite una mezcla ponderada
+de escenarios realistas:
+
+    dashboard, listados con filtros y paginación por cursor (gastos,
+    ingresos, créditos, contactos, pendientes), formularios POST (gasto,
+    ingreso, pendiente), pagos de créditos y exportación Excel (directa y
+    en segundo plano: encolar, consultar el estado y descargar)
+
+Dos modos:
+    asgi   la app corre en este proceso (httpx.ASGITransport): sin red,
+           mide la app y sus consultas
+    http   lanza uvicorn con --workers N y la recorre por HTTP real
+
+Reporta, por ruta: peticiones, errores, p50/p95/p99 y peticiones por
+segundo. Con --guardar-baseline escribe los resultados en el archivo de
+baseline (uno por modo). Si no, compara contra él y sale con código 1 si
+una ruta supera su p95 de referencia en más de --tolerancia (y más de
+--holgura-ms), o si hay errores. Las rutas con menos de MIN_PETICIONES
+peticiones medidas se reportan pero no se comparan.
+
+La base se regenera en cada corrida (misma semilla), así las corridas son
+comparables entre sí. Las baselines dependen de la máquina: se guardan una
+vez por máquina o runner de CI.
+
+Uso:
+    python -m benchmarks.carga                                   # asgi, 10 usuarios, 20s
+    python -m benchmarks.carga --modo http --workers 4 --vus 32
+    python -m benchmarks.carga --guardar-baseline                # fija la referencia
+"""
+import argparse
+import asyncio
+import html
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+BASELINE_POR_DEFECTO = os.path.join(os.path.dirname(__file__), "baseline_carga.json")
+
+# Peticiones medidas que necesita una ruta para compararla con la baseline
+MIN_PETICIONES = 20
+
+# Códigos esperados: los POST y el login responden 303 (redirect tras guardar)
+OK_GET = {200}
+OK_POST = {303}
+
+# Segundos máximos esperando un trabajo de exportación en segundo plano
+ESPERA_EXPORTACION_S = 30
+
+
+@dataclass
+class UsuarioVirtual:
+    """Estado de un usuario virtual: su usuario perf, sus créditos y sus cursores"""
+    numero: int
+    username: str
+    clave: str
+    creditos: List[int]
+    rnd: random.Random
+    cursores: Dict[str, str] = field(default_factory=dict)
+    hoy: date = date(2025, 12, 31)
+
+
+# ============================================================================
+# 🎬 ESCENARIOS (ruta, peso, códigos esperados, función que hace la petición)
+# ============================================================================
+
+# Enlaces de paginación: ?cursor=...&filtros (el último es "siguiente" si existe)
+_ENLACE_CURSOR = re.compile(r'href="\?(cursor=[^"]+)"')
+
+
+async def _listado(cliente: httpx.AsyncClient, vu: UsuarioVirtual, ruta: str, filtros: dict):
+    """GET de un listado; la mitad de las veces sigue el enlace de paginación de la página anterior"""
+    if ruta in vu.cursores and vu.rnd.random() < 0.5:
+        respuesta = await cliente.get(f"{ruta}?{vu.cursores.pop(ruta)}")
+    else:
+        respuesta = await cliente.get(ruta, params={clave: valor for clave, valor in filtros.items() if valor})
+    enlaces = _ENLACE_CURSOR.findall(respuesta.text)
+    if enlaces:
+        vu.cursores[ruta] = html.unescape(enlaces[-1])
+    return respuesta
+
+
+async def _gastos(cliente, vu):
+    return await _listado(cliente, vu, "/gastos", {
+        "tipo": vu.rnd.choice(("", "fijo", "variable", "opcional")),
+        "pagado": vu.rnd.choice(("", "true", "false")),
+    })
+
+
+async def _ingresos(cliente, vu):
+    return await _listado(cliente, vu, "/ingresos", {
+        "tipo": vu.rnd.choice(("", "fijo", "variable")),
+        "estado": vu.rnd.choice(("", "recibido", "pendiente")),
+    })
+
+
+async def _creditos(cliente, vu):
+    return await _listado(cliente, vu, "/creditos", {"estado": vu.rnd.choice(("", "activo", "pagado"))})
+
+
+async def _contactos(cliente, vu):
+    return await _listado(cliente, vu, "/contactos", {
+        "categoria": vu.rnd.choice(("", "familia", "amigos", "trabajo")),
+    })
+
+
+async def _pendientes(cliente, vu):
+    return await cliente.get("/pendientes", params={"estado": vu.rnd.choice(("", "pendiente", "completado"))})
+
+
+async def _dashboard(cliente, vu):
+    return await cliente.get("/dashboard")
+
+
+async def _detalle_credito(cliente, vu):
+    return await cliente.get(f"/creditos/detalle/{vu.rnd.choice(vu.creditos)}")
+
+
+async def _guardar_gasto(cliente, vu):
+    # Categorías que ya existen en la base sembrada, con su mismo tipo
+    nombre, tipo = vu.rnd.choice((("Mercado", "variable"), ("Transporte", "variable"), ("Restaurantes", "opcional")))
+    return await cliente.post("/gastos/guardar", data={
+        "categoria_nombre": nombre,
+        "tipo_categoria": tipo,
+        "valor": str(vu.rnd.randint(10, 500) * 1000),
+        "fecha_limite": (vu.hoy - timedelta(days=vu.rnd.randint(0, 60))).isoformat(),
+        "notas": "carga",
+    })
+
+
+async def _crear_ingreso(cliente, vu):
+    return await cliente.post("/ingresos/crear", data={
+        "valor": str(vu.rnd.randint(50, 900) * 1000),
+        "fecha": (vu.hoy - timedelta(days=vu.rnd.randint(0, 60))).isoformat(),
+        "categoria": "Honorarios", "tipo": "variable", "estado": "recibido",
+    })
+
+
+async def _guardar_pendiente(cliente, vu):
+    return await cliente.post("/pendientes/guardar", data={
+        "titulo": f"Tarea de carga {vu.rnd.randint(1, 10_000)}",
+        "estado": "pendiente", "prioridad": vu.rnd.choice(("baja", "media", "alta")),
+    })
+
+
+async def _pagar_credito(cliente, vu):
+    return await cliente.post("/pagos/guardar", data={
+        "credito_id": str(vu.rnd.choice(vu.creditos)),
+        "monto": "1000",
+        "fecha_pago": vu.hoy.isoformat(),
+        "comprobante": f"CARGA-{vu.numero}-{vu.rnd.randint(1, 10**9)}",
+    })
+
+
+async def _exportar_excel(cliente, vu):
+    return await cliente.get("/gastos/descargar-excel", params={
+        "modo": "directo", "tipo": vu.rnd.choice(("fijo", "variable", "opcional")),
+    })
+
+
+async def _exportar_excel_en_segundo_plano(cliente, vu):
+    """
+    Descarga por defecto: encola el trabajo, consulta su estado hasta que
+    termina y descarga el archivo. Con --modo http y varios workers, cada
+    petición puede llegar a un worker distinto del que encoló el trabajo.
+    """
+    respuesta = await cliente.get("/ingresos/descargar-excel", params={
+        "tipo": vu.rnd.choice(("fijo", "variable", "opcional")),
+    })
+    if respuesta.status_code != 303:
+        # 200: había un archivo idéntico listo
+        return respuesta
+    descarga = respuesta.headers["location"]
+    estado = descarga.rsplit("/", 1)[0]
+    limite = time.perf_counter() + ESPERA_EXPORTACION_S
+    while time.perf_counter() < limite:
+        respuesta = await cliente.get(estado)
+        if respuesta.status_code != 200 or respuesta.json()["estado"] != "pendiente":
+            break
+        await asyncio.sleep(0.2)
+    if respuesta.status_code != 200:
+        return respuesta
+    # Pendiente todavía (202) o con error (500) también cuentan como fallo
+    return await cliente.get(descarga)
+
+
+async def _login(cliente, vu):
+    return await cliente.post("/login", data={"username": vu.username, "password": vu.clave})
+
+
+@dataclass
+class Escenario:
+    ruta: str
+    peso: int
+    esperados: set
+    ejecutar: Callable
+
+
+ESCENARIOS = [
+    Escenario("GET /dashboard", 20, OK_GET, _dashboard),
+    Escenario("GET /gastos", 15, OK_GET, _gastos),
+    Escenario("GET /ingresos", 10, OK_GET, _ingresos),
+    Escenario("GET /creditos", 6, OK_GET, _creditos),
+    Escenario("GET /creditos/detalle", 4, OK_GET, _detalle_credito),
+    Escenario("GET /contactos", 6, OK_GET, _contactos),
+    Escenario("GET /pendientes", 5, OK_GET, _pendientes),
+    Escenario("POST /gastos/guardar", 8, OK_POST, _guardar_gasto),
+    Escenario("POST /ingresos/crear", 4, OK_POST, _crear_ingreso),
+    Escenario("POST /pendientes/guardar", 4, OK_POST, _guardar_pendiente),
+    Escenario("POST /pagos/guardar", 4, OK_POST, _pagar_credito),
+    Escenario("GET /gastos/descargar-excel", 2, OK_GET, _exportar_excel),
+    Escenario("GET /ingresos/descargar-excel", 2, OK_GET, _exportar_excel_en_segundo_plano),
+    Escenario("POST /login", 1, OK_POST, _login),
+]
+
+# ============================================================================
+# 🏃 EJECUCIÓN
+# ============================================================================
+
+def _percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+class Registro:
+    """Latencias y errores por ruta"""
+
+    def __init__(self):
+        self.latencias: Dict[str, List[float]] = {}
+        self.errores: Dict[str, int] = {}
+        self.ejemplos_error: Dict[str, str] = {}
+
+    def anotar(self, ruta: str, segundos: float, error: Optional[str]):
+        self.latencias.setdefault(ruta, []).append(segundos)
+        if error:
+            self.errores[ruta] = self.errores.get(ruta, 0) + 1
+            self.ejemplos_error.setdefault(ruta, error)
+
+    def resumen(self, duracion: float) -> Dict[str, dict]:
+        resultado = {}
+        for ruta, latencias in sorted(self.latencias.items()):
+            resultado[ruta] = {
+                "peticiones": len(latencias),
+                "errores": self.errores.get(ruta, 0),
+                "p50_ms": round(_percentil(latencias, 0.50) * 1000, 2),
+                "p95_ms": round(_percentil(latencias, 0.95) * 1000, 2),
+                "p99_ms": round(_percentil(latencias, 0.99) * 1000, 2),
+                "rps": round(len(latencias) / duracion, 2),
+            }
+        return resultado
+
+
+async def _medir(registro: Registro, escenario: Escenario, cliente, vu, anotar: bool):
+    inicio = time.perf_counter()
+    error = None
+    try:
+        respuesta = await escenario.ejecutar(cliente, vu)
+        if respuesta.status_code not in escenario.esperados:
+            error = f"HTTP {respuesta.status_code}"
+    except httpx.HTTPError as e:
+        error = f"{type(e).__name__}: {e}"
+    if anotar:
+        registro.anotar(escenario.ruta, time.perf_counter() - inicio, error)
+    return error
+
+
+async def usuario_virtual(crear_cliente, vu: UsuarioVirtual, registro: Registro,
+                          inicio_medicion: float, fin: float):
+    """Inicia sesión y repite escenarios al azar (según su peso) hasta `fin`"""
+    pesos = [escenario.peso for escenario in ESCENARIOS]
+    login = ESCENARIOS[-1]
+    async with crear_cliente() as cliente:
+        if await _medir(registro, login, cliente, vu, anotar=time.perf_counter() >= inicio_medicion):
+            return
+        while time.perf_counter() < fin:
+            escenario = vu.rnd.choices(ESCENARIOS, weights=pesos)[0]
+            await _medir(registro, escenario, cliente, vu, anotar=time.perf_counter() >= inicio_medicion)
+
+
+def _usuarios_virtuales(url_bd: str, vus: int, semilla: int) -> List[UsuarioVirtual]:
+    """Un usuario perf distinto por usuario virtual, con los ids de sus créditos"""
+    from sqlalchemy import create_engine, select
+    from app.schema import models
+    from benchmarks.generar_datos import CLAVE_USUARIOS
+
+    engine = create_engine(url_bd)
+    with engine.connect() as conexion:
+        usuarios = conexion.execute(
+            select(models.Usuario.id, models.Usuario.username).order_by(models.Usuario.id).limit(vus)
+        ).all()
+        creditos = {}
+        for credito_id, usuario_id in conexion.execute(select(models.Credito.id, models.Credito.usuario_id)):
+            creditos.setdefault(usuario_id, []).append(credito_id)
+    engine.dispose()
+    if len(usuarios) < vus:
+        raise SystemExit(f"La base tiene {len(usuarios)} usuarios; se necesitan al menos {vus} (--usuarios-bd)")
+    return [UsuarioVirtual(numero=i, username=username, clave=CLAVE_USUARIOS, creditos=creditos[usuario_id],
+                           rnd=random.Random(f"{semilla}-vu-{i}"))
+            for i, (usuario_id, username) in enumerate(usuarios)]
+
+
+async def correr(crear_cliente, vus: List[UsuarioVirtual], duracion: float, calentamiento: float) -> dict:
+    registro = Registro()
+    ahora = time.perf_counter()
+    inicio_medicion = ahora + calentamiento
+    fin = inicio_medicion + duracion
+    await asyncio.gather(*(usuario_virtual(crear_cliente, vu, registro, inicio_medicion, fin) for vu in vus))
+    for ruta, ejemplo in registro.ejemplos_error.items():
+        print(f"⚠️  {ruta}: {registro.errores[ruta]} errores (p. ej. {ejemplo})")
+    return registro.resumen(duracion)
+
+
+def correr_asgi(url_bd: str, vus: List[UsuarioVirtual], duracion: float, calentamiento: float) -> dict:
+    """La app en este proceso, sin red"""
+    import main
+
+    transporte = httpx.ASGITransport(app=main.app)
+
+    def crear_cliente():
+        return httpx.AsyncClient(transport=transporte, base_url="http://carga", timeout=60)
+
+    async def con_lifespan():
+        # ASGITransport no envía los eventos de lifespan: se corren a mano
+        async with main.app.router.lifespan_context(main.app):
+            return await correr(crear_cliente, vus, duracion, calentamiento)
+
+    return asyncio.run(con_lifespan())
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def correr_http(url_bd: str, vus: List[UsuarioVirtual], duracion: float, calentamiento: float,
+                workers: int) -> dict:
+    """uvicorn con varios workers en un subproceso, recorrido por HTTP real"""
+    puerto = _puerto_libre()
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(puerto),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=dict(os.environ, DATABASE_URL=url_bd), stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{puerto}"
+    try:
+        limite = time.time() + 60
+        while True:
+            try:
+                httpx.get(f"{base_url}/login", timeout=1).raise_for_status()
+                break
+            except httpx.HTTPError:
+                if time.time() > limite or servidor.poll() is not None:
+                    raise SystemExit("uvicorn no arrancó")
+                time.sleep(0.3)
+
+        limites = httpx.Limits(max_connections=len(vus) * 2)
+
+        def crear_cliente():
+            return httpx.AsyncClient(base_url=base_url, timeout=60, limits=limites)
+
+        return asyncio.run(correr(crear_cliente, vus, duracion, calentamiento))
+    finally:
+        servidor.terminate()
+        servidor.wait(timeout=30)
+
+# ============================================================================
+# 📏 REPORTE Y BASELINE
+# ============================================================================
+
+def imprimir(resultados: Dict[str, dict], duracion: float):
+    print(f"{'ruta':<30}{'n':>7}{'err':>5}{'p50':>10}{'p95':>10}{'p99':>10}{'req/s':>9}")
+    for ruta, r in resultados.items():
+        print(f"{ruta:<30}{r['peticiones']:>7}{r['errores']:>5}{r['p50_ms']:>8.1f}ms"
+              f"{r['p95_ms']:>8.1f}ms{r['p99_ms']:>8.1f}ms{r['rps']:>9.1f}")
+    total = sum(r["peticiones"] for r in resultados.values())
+    print(f"{'TOTAL':<30}{total:>7}{sum(r['errores'] for r in resultados.values()):>5}"
+          f"{'':>30}{total / duracion:>9.1f}")
+
+
+def comparar(resultados: Dict[str, dict], baseline: Dict[str, dict],
+             tolerancia: float, holgura_ms: float) -> List[str]:
+    """Rutas cuyo p95 supera el de la baseline más la tolerancia, o que tuvieron errores"""
+    fallas = []
+    for ruta, r in resultados.items():
+        if r["errores"]:
+            fallas.append(f"{ruta}: {r['errores']} errores")
+        referencia = baseline.get(ruta)
+        # Con pocas peticiones el p95 es casi el máximo: demasiado ruidoso para fallar
+        if referencia is None or r["peticiones"] < MIN_PETICIONES:
+            continue
+        limite = referencia["p95_ms"] * (1 + tolerancia) + holgura_ms
+        if r["p95_ms"] > limite:
+            fallas.append(f"{ruta}: p95 {r['p95_ms']:.1f}ms > {limite:.1f}ms "
+                          f"(baseline {referencia['p95_ms']:.1f}ms)")
+    return fallas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga de punta a punta con presupuestos de latencia")
+    parser.add_argument("--modo", choices=("asgi", "http"), default="asgi", help="App en proceso o uvicorn por HTTP")
+    parser.add_argument("--workers", type=int, default=2, help="Workers de uvicorn (modo http)")
+    parser.add_argument("--vus", type=int, default=10, help="Usuarios virtuales concurrentes")
+    parser.add_argument("--duracion", type=float, default=20, help="Segundos medidos")
+    parser.add_argument("--calentamiento", type=float, default=3, help="Segundos iniciales sin medir")
+    parser.add_argument("--usuarios-bd", type=int, default=50, help="Usuarios a sembrar en la base")
+    parser.add_argument("--bd", default=os.path.join(tempfile.gettempdir(), "carga.db"), help="Archivo SQLite de la prueba")
+    parser.add_argument("--reusar-bd", action="store_true", help="No regenerar la base si ya existe")
+    parser.add_argument("--semilla", type=int, default=42, help="Semilla de los datos y del tráfico")
+    parser.add_argument("--baseline", default=BASELINE_POR_DEFECTO, help="Archivo JSON de baselines")
+    parser.add_argument("--guardar-baseline", action="store_true", help="Guardar estos resultados como baseline del modo")
+    parser.add_argument("--tolerancia", type=float, default=0.5, help="Aumento de p95 permitido sobre la baseline (0.5 = 50%%)")
+    parser.add_argument("--holgura-ms", type=float, default=10.0, help="Milisegundos extra permitidos (ruido en rutas rápidas)")
+    args = parser.parse_args()
+
+    url_bd = f"sqlite:///{args.bd}"
+    # Antes de importar nada de app/: database.py lee DATABASE_URL al importarse
+    os.environ["DATABASE_URL"] = url_bd
+    # La línea INFO de cada petición llenaría la consola (LOG_NIVEL=INFO para medirla también)
+    os.environ.setdefault("LOG_NIVEL", "WARNING")
+    from benchmarks.generar_datos import generar
+
+    if not (args.reusar_bd and os.path.exists(args.bd)):
+        for sufijo in ("", "-wal", "-shm"):
+            if os.path.exists(args.bd + sufijo):
+                os.remove(args.bd + sufijo)
+        print(f"Sembrando {args.usuarios_bd} usuarios en {args.bd}")
+        generar(url_bd, args.usuarios_bd, escala=1.0, semilla=args.semilla, hasta=date(2025, 12, 31), anios=3)
+
+    vus = _usuarios_virtuales(url_bd, args.vus, args.semilla)
+    print(f"\nModo {args.modo}{f' ({args.workers} workers)' if args.modo == 'http' else ''}: "
+          f"{args.vus} usuarios virtuales, {args.duracion:.0f}s (+{args.calentamiento:.0f}s de calentamiento)")
+    if args.modo == "asgi":
+        resultados = correr_asgi(url_bd, vus, args.duracion, args.calentamiento)
+    else:
+        resultados = correr_http(url_bd, vus, args.duracion, args.calentamiento, args.workers)
+    imprimir(resultados, args.duracion)
+
+    clave = args.modo if args.modo == "asgi" else f"http-{args.workers}w"
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as archivo:
+            baselines = json.load(archivo)
+
+    if args.guardar_baseline:
+        baselines[clave] = {"vus": args.vus, "duracion": args.duracion, "rutas": resultados}
+        with open(args.baseline, "w", encoding="utf-8") as archivo:
+            json.dump(baselines, archivo, indent=2, ensure_ascii=False, sort_keys=True)
+        print(f"\n💾 Baseline '{clave}' guardada en {args.baseline}")
+        sys.exit(0)
+
+    if clave not in baselines:
+        print(f"\nℹ️  No hay baseline '{clave}' en {args.baseline} (crearla con --guardar-baseline)")
+        sys.exit(0)
+    if baselines[clave]["vus"] != args.vus:
+        print(f"\n⚠️  La baseline '{clave}' se midió con {baselines[clave]['vus']} usuarios virtuales")
+    fallas = comparar(resultados, baselines[clave]["rutas"], args.tolerancia, args.holgura_ms)
+    if fallas:
+        print("\n❌ Regresiones frente a la baseline:")
+        for falla in fallas:
+            print(f"   {falla}")
+        sys.exit(1)
+    print(f"\n✅ Todas las rutas dentro de la baseline '{clave}' (+{args.tolerancia:.0%} / +{args.holgura_ms:.0f}ms)")
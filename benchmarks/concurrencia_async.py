@@ -0,0 +1,157 @@
+"""
+Benchmark: consultas lentas con Session síncrona vs AsyncSession en rutas async def
+
+Monta una app FastAPI mínima con dos versiones de la misma ruta async def
+y una ruta sin base de datos:
+
+    /lento/sync    Session síncrona dentro de async def (el patrón anterior)
+    /lento/async   AsyncSession, como las rutas de crud_async
+    /ping          ruta sin relación con la base de datos
+
+Lanza N peticiones lentas a la vez y, mientras están en curso, mide la
+latencia de /ping. Con la Session síncrona cada consulta bloquea el event
+loop, así que /ping espera a que terminen todas. Con AsyncSession /ping
+responde de inmediato.
+
+La consulta lenta es SELECT SLEEP(s) en MySQL. En SQLite se usa una
+función sleep(s) registrada en cada conexión.
+
+Uso:
+    python -m benchmarks.concurrencia_async                  # SQLite (archivo temporal)
+    python -m benchmarks.concurrencia_async --lentas 20 --segundos 0.2
+    python -m benchmarks.concurrencia_async --url mysql+pymysql://u:p@host/bd_pruebas
+
+Con --url, la URL async se obtiene cambiando el driver a aiomysql.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+DRIVERS_ASYNC = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
+
+
+def _registrar_sleep_sqlite(engine):
+    """SQLite no tiene SLEEP(): se registra una función sleep(s) en cada conexión"""
+    @event.listens_for(engine, "connect")
+    def _conectar(dbapi_connection, _):
+        dbapi_connection.create_function("sleep", 1, lambda s: time.sleep(s) or 0)
+
+
+def crear_app(url: str, conexiones: int) -> FastAPI:
+    """
+    App con la misma consulta lenta en versión síncrona y async
+
+    Ambos pools tienen `conexiones` conexiones, para que ninguna petición
+    lenta espere por una conexión libre.
+    """
+    url_sync = make_url(url)
+    url_async = url_sync.set(drivername=DRIVERS_ASYNC[url_sync.get_backend_name()])
+
+    engine = create_engine(url_sync, pool_size=conexiones, max_overflow=0)
+    async_engine = create_async_engine(url_async, pool_size=conexiones, max_overflow=0)
+    if url_sync.get_backend_name() == "sqlite":
+        _registrar_sleep_sqlite(engine)
+        _registrar_sleep_sqlite(async_engine.sync_engine)
+    sesiones = sessionmaker(bind=engine)
+    sesiones_async = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    def get_db():
+        db = sesiones()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with sesiones_async() as db:
+            yield db
+
+    app = FastAPI()
+    app.state.async_engine = async_engine
+
+    @app.get("/lento/sync")
+    async def lento_sync(s: float, db: Session = Depends(get_db)):
+        return {"r": db.execute(text("SELECT SLEEP(:s)"), {"s": s}).scalar()}
+
+    @app.get("/lento/async")
+    async def lento_async(s: float, db: AsyncSession = Depends(get_async_db)):
+        return {"r": (await db.execute(text("SELECT SLEEP(:s)"), {"s": s})).scalar()}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+async def medir(app: FastAPI, modo: str, lentas: int, segundos: float, pings: int) -> dict:
+    """
+    Latencia de /ping mientras `lentas` peticiones a /lento/{modo} están en curso
+
+    Los pings están programados a intervalos fijos durante `segundos`. La
+    latencia se cuenta desde el momento programado, no desde que el event
+    loop logra enviarlo: si el loop estaba bloqueado, esa espera también cuenta.
+    """
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        await cliente.get(f"/lento/{modo}", params={"s": 0})  # calentar el pool
+
+        inicio = time.perf_counter()
+        tareas = [
+            asyncio.create_task(cliente.get(f"/lento/{modo}", params={"s": segundos}))
+            for _ in range(lentas)
+        ]
+
+        latencias = []
+        for numero in range(pings):
+            programado = inicio + segundos * numero / pings
+            await asyncio.sleep(max(0.0, programado - time.perf_counter()))
+            respuesta = await cliente.get("/ping")
+            respuesta.raise_for_status()
+            latencias.append(time.perf_counter() - programado)
+
+        for respuesta in await asyncio.gather(*tareas):
+            respuesta.raise_for_status()
+        total = time.perf_counter() - inicio
+
+    await app.state.async_engine.dispose()
+    return {
+        "ping_p50": statistics.median(latencias),
+        "ping_max": max(latencias),
+        "total": total,
+    }
+
+
+def imprimir(resultados: dict, lentas: int, segundos: float):
+    print(f"{lentas} consultas de {segundos * 1000:.0f}ms en paralelo")
+    print(f"{'modo':<8}{'ping p50':>12}{'ping máx':>12}{'tiempo total':>15}")
+    for modo, r in resultados.items():
+        print(f"{modo:<8}{r['ping_p50'] * 1000:>10.1f}ms{r['ping_max'] * 1000:>10.1f}ms"
+              f"{r['total'] * 1000:>13.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara Session síncrona vs AsyncSession en rutas async def")
+    parser.add_argument("--url", default=None, help="URL síncrona de una base de PRUEBAS (por defecto SQLite en un archivo temporal)")
+    parser.add_argument("--lentas", type=int, default=10, help="Peticiones lentas simultáneas")
+    parser.add_argument("--segundos", type=float, default=0.2, help="Duración de cada consulta lenta")
+    parser.add_argument("--pings", type=int, default=10, help="Peticiones a /ping durante la prueba")
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_concurrencia.db')}"
+    app = crear_app(url, conexiones=args.lentas)
+    resultados = {
+        modo: asyncio.run(medir(app, modo, args.lentas, args.segundos, args.pings))
+        for modo in ("sync", "async")
+    }
+    imprimir(resultados, args.lentas, args.segundos)
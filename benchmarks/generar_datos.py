@@ -0,0 +1,330 @@
+"""
+Generador determinista de datos de prueba a gran escala
+
+Crea N usuarios con volúmenes realistas de categorías, gastos, ingresos,
+créditos con sus pagos, contactos, cumpleaños, pendientes y contraseñas,
+y al final reconstruye resumen_mensual. Con la misma semilla, los mismos
+parámetros y una base vacía, produce exactamente los mismos datos. Cada
+(usuario, tabla) usa su propio random.Random, así que las filas de un
+usuario no dependen de cuántos usuarios se generen.
+
+Volúmenes por usuario con --escala 1 (unas 1.000 filas):
+
+    categorías 15, gastos 600, ingresos 120, créditos 3 (hasta 24 pagos c/u),
+    contactos 80, cumpleaños 40, pendientes 50, contraseñas 30
+
+--escala multiplica todo menos las categorías. 1.000 usuarios con
+--escala 1 son ~1 millón de filas.
+
+Las filas se insertan con INSERT multi-fila de LOTE filas, sin pasar por
+el ORM. Los usuarios se llaman perf<id> y su contraseña es CLAVE_USUARIOS.
+
+Uso:
+    python -m benchmarks.generar_datos                                # 100 usuarios en perf.db
+    python -m benchmarks.generar_datos --usuarios 1000 --escala 2     # ~2 millones de filas
+    python -m benchmarks.generar_datos --url mysql+pymysql://u:p@host/bd_pruebas
+
+Después: DATABASE_URL=sqlite:///perf.db python run.py
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app.config import pool
+from app.repository import contrasenas, crud, resumen
+from app.schema import models
+from app.schema.create_tables import crear_tablas
+
+CLAVE_USUARIOS = "clave123"
+LOTE = 5000
+
+VOLUMENES = {
+    "gastos": 600,
+    "ingresos": 120,
+    "creditos": 3,
+    "contactos": 80,
+    "cumpleanos": 40,
+    "pendientes": 50,
+    "contrasenas": 30,
+}
+PAGOS_POR_CREDITO = 24
+
+# (nombre, tipo): las últimas se usan para ingresos, el resto para gastos
+CATEGORIAS = [
+    ("Arriendo", "fijo"), ("Servicios", "fijo"), ("Internet", "fijo"), ("Seguros", "fijo"),
+    ("Mercado", "variable"), ("Transporte", "variable"), ("Salud", "variable"),
+    ("Educación", "variable"), ("Restaurantes", "opcional"), ("Ropa", "opcional"),
+    ("Viajes", "opcional"), ("Entretenimiento", "opcional"),
+    ("Salario", "fijo"), ("Honorarios", "variable"), ("Rendimientos", "opcional"),
+]
+CATEGORIAS_INGRESO = 3
+
+NOMBRES = ["Ana", "Luis", "Carlos", "María", "Sofía", "Jorge", "Valentina", "Andrés",
+           "Camila", "Felipe", "Laura", "Diego", "Paula", "Juan", "Daniela", "Santiago"]
+APELLIDOS = ["Gómez", "Rodríguez", "Martínez", "López", "García", "Pérez", "Sánchez",
+             "Ramírez", "Torres", "Díaz", "Vargas", "Moreno", "Rojas", "Castro"]
+SERVICIOS = ["Banco", "Correo", "Netflix", "Spotify", "Amazon", "GitHub", "Universidad",
+             "EPS", "Operador móvil", "Aerolínea"]
+PALABRAS = ("pago factura cuota mensual compra tienda supermercado gasolina taxi "
+            "almuerzo regalo revisión médica matrícula cine arreglo casa").split()
+
+
+def _rnd(semilla: int, usuario_id: int, tabla: str) -> random.Random:
+    return random.Random(f"{semilla}-{usuario_id}-{tabla}")
+
+
+def _texto(rnd: random.Random, palabras: int) -> str:
+    return " ".join(rnd.choice(PALABRAS) for _ in range(palabras)).capitalize()
+
+
+def _fecha(rnd: random.Random, desde: date, hasta: date) -> date:
+    return desde + timedelta(days=rnd.randint(0, (hasta - desde).days))
+
+
+def _monto(rnd: random.Random, minimo: int, maximo: int) -> float:
+    return round(rnd.uniform(minimo, maximo) / 100) * 100.0
+
+# ============================================================================
+# 🏭 FILAS POR TABLA (un generador por tabla; recibe el id de cada usuario)
+# ============================================================================
+
+class Generador:
+    """Produce las filas de cada tabla para un rango de ids de usuario"""
+
+    def __init__(self, ids_usuario: range, primer_id_categoria: int, primer_id_credito: int,
+                 escala: float, semilla: int, hasta: date, anios: int):
+        self.ids_usuario = ids_usuario
+        self.primer_id_categoria = primer_id_categoria
+        self.primer_id_credito = primer_id_credito
+        self.cantidad = {tabla: max(1, round(n * escala)) for tabla, n in VOLUMENES.items()}
+        self.pagos_por_credito = max(1, round(PAGOS_POR_CREDITO * escala))
+        self.semilla = semilla
+        self.hasta = hasta
+        self.desde = hasta - timedelta(days=365 * anios)
+        self.hash_clave = contrasenas.hashear_password(CLAVE_USUARIOS)
+        # Fernet cifra con IV aleatorio: se cifra un juego fijo una sola vez
+        self.claves_cifradas = [crud.cipher_suite.encrypt(f"Clave-{i:02d}!".encode()).decode()
+                                for i in range(20)]
+
+    def _indice(self, usuario_id: int) -> int:
+        return usuario_id - self.ids_usuario.start
+
+    def _categorias_de(self, usuario_id: int) -> list:
+        primera = self.primer_id_categoria + self._indice(usuario_id) * len(CATEGORIAS)
+        return list(range(primera, primera + len(CATEGORIAS)))
+
+    def usuarios(self):
+        for uid in self.ids_usuario:
+            yield {"id": uid, "nombre": f"Usuario Perf {uid}", "email": f"perf{uid}@example.com",
+                   "username": f"perf{uid}", "password": self.hash_clave}
+
+    def categorias(self):
+        for uid in self.ids_usuario:
+            for categoria_id, (nombre, tipo) in zip(self._categorias_de(uid), CATEGORIAS):
+                yield {"id": categoria_id, "nombre": nombre, "tipo": tipo, "usuario_id": uid}
+
+    def gastos(self):
+        for uid in self.ids_usuario:
+            rnd = _rnd(self.semilla, uid, "gastos")
+            categorias = self._categorias_de(uid)[:-CATEGORIAS_INGRESO]
+            for _ in range(self.cantidad["gastos"]):
+                fecha = _fecha(rnd, self.desde, self.hasta)
+                yield {"usuario_id": uid, "categoria_id": rnd.choice(categorias),
+                       "valor": _monto(rnd, 5_000, 800_000), "fecha_limite": fecha,
+                       "pagado": fecha < self.hasta - timedelta(days=30) or rnd.random() < 0.4,
+                       "notas": _texto(rnd, rnd.randint(1, 6)) if rnd.random() < 0.7 else None}
+
+    def ingresos(self):
+        for uid in self.ids_usuario:
+            rnd = _rnd(self.semilla, uid, "ingresos")
+            categorias = self._categorias_de(uid)[-CATEGORIAS_INGRESO:]
+            for _ in range(self.cantidad["ingresos"]):
+                categoria_id = rnd.choice(categorias)
+                es_salario = categoria_id == categorias[0]
+                fecha = _fecha(rnd, self.desde, self.hasta)
+                yield {"usuario_id": uid, "categoria_id": categoria_id,
+                       "valor": _monto(rnd, 1_500_000, 6_000_000) if es_salario else _monto(rnd, 50_000, 2_000_000),
+                       "fecha": fecha, "es_salario": es_salario, "recurrente": es_salario,
+                       "estado": "recibido" if fecha < self.hasta - timedelta(days=15) else "pendiente",
+                       "notas": _texto(rnd, 3) if rnd.random() < 0.3 else None}
+
+    def _creditos_con_pagos(self):
+        """(fila del crédito, filas de sus pagos), con ids de crédito consecutivos"""
+        credito_id = self.primer_id_credito
+        for uid in self.ids_usuario:
+            rnd = _rnd(self.semilla, uid, "creditos")
+            for _ in range(self.cantidad["creditos"]):
+                monto = _monto(rnd, 1_000_000, 150_000_000)
+                interes = round(rnd.uniform(0.8, 2.5), 2)
+                plazo = rnd.choice((12, 24, 36, 48, 60, 72))
+                fecha_inicio = _fecha(rnd, self.desde, self.hasta - timedelta(days=30))
+                cuota = round(crud.calcular_cuota_credito(monto, interes, plazo), 2)
+                seguro = round(monto * 0.0005, 2)
+                total = round((cuota + seguro) * plazo, 2)
+
+                pagos = []
+                fecha_pago = fecha_inicio + timedelta(days=30)
+                while len(pagos) < min(plazo, self.pagos_por_credito) and fecha_pago <= self.hasta:
+                    pagos.append({"credito_id": credito_id, "monto": round(cuota + seguro, 2),
+                                  "fecha_pago": fecha_pago, "comprobante": f"CMP-{credito_id}-{len(pagos) + 1}",
+                                  "notas": None})
+                    fecha_pago += timedelta(days=30)
+                saldo = max(0.0, round(total - len(pagos) * (cuota + seguro), 2))
+
+                credito = {"id": credito_id, "usuario_id": uid,
+                           "nombre_credito": f"{rnd.choice(('Hipotecario', 'Vehículo', 'Libre inversión', 'Tarjeta'))} {credito_id}",
+                           "monto": monto, "interes": interes, "plazo_meses": plazo,
+                           "frecuencia_pago": "mensual", "fecha_inicio": fecha_inicio,
+                           "cuota_manual": 0.0, "cuota": cuota, "cuota_calculada": cuota,
+                           "seguro": seguro, "total_pagar": total, "saldo_actual": saldo,
+                           "estado": "pagado" if saldo == 0 else "activo",
+                           "observaciones": _texto(rnd, 8) if rnd.random() < 0.5 else None}
+                yield credito, pagos
+                credito_id += 1
+
+    def creditos(self):
+        for credito, _ in self._creditos_con_pagos():
+            yield credito
+
+    def pagos(self):
+        for _, pagos in self._creditos_con_pagos():
+            yield from pagos
+
+    def contactos(self):
+        categorias = ("familia", "amigos", "trabajo", "servicios", "educacion", "otro")
+        for uid in self.ids_usuario:
+            rnd = _rnd(self.semilla, uid, "contactos")
+            for _ in range(self.cantidad["contactos"]):
+                nombre = rnd.choice(NOMBRES)
+                yield {"usuario_id": uid, "nombres": nombre,
+                       "apellidos": f"{rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}",
+                       "categoria": rnd.choice(categorias),
+                       "direccion": f"Calle {rnd.randint(1, 200)} # {rnd.randint(1, 99)}-{rnd.randint(1, 99)}",
+                       "celular1": f"3{rnd.randint(100000000, 259999999)}",
+                       "celular2": f"3{rnd.randint(100000000, 259999999)}" if rnd.random() < 0.2 else None,
+                       "email": f"{nombre.lower()}{rnd.randint(1, 999)}@example.com" if rnd.random() < 0.6 else None,
+                       "notas": _texto(rnd, 5) if rnd.random() < 0.3 else None}
+
+    def cumpleanos(self):
+        relaciones = ("Familia", "Amigo", "Trabajo", "Pareja", None)
+        for uid in self.ids_usuario:
+            rnd = _rnd(self.semilla, uid, "cumpleanos")
+            for _ in range(self.cantidad["cumpleanos"]):
+                yield {"usuario_id": uid,
+                       "nombre_persona": f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)}",
+                       "fecha_nacimiento": _fecha(rnd, date(1950, 1, 1), date(2015, 12, 31)),
+                       "telefono": f"3{rnd.randint(100000000, 259999999)}" if rnd.random() < 0.5 else None,
+                       "email": None, "relacion": rnd.choice(relaciones),
+                       "notas": _texto(rnd, 4) if rnd.random() < 0.2 else None,
+                       "notificar_dias_antes": rnd.choice((1, 3, 7, 15))}
+
+    def pendientes(self):
+        estados = ("pendiente", "en_progreso", "completado", "cancelado")
+        prioridades = ("baja", "media", "alta", "urgente")
+        for uid in self.ids_usuario:
+            rnd = _rnd(self.semilla, uid, "pendientes")
+            for _ in range(self.cantidad["pendientes"]):
+                limite = datetime.combine(_fecha(rnd, self.desde, self.hasta + timedelta(days=90)),
+                                          datetime.min.time()) + timedelta(hours=rnd.randint(8, 20))
+                yield {"usuario_id": uid, "titulo": _texto(rnd, rnd.randint(2, 5)),
+                       "descripcion": _texto(rnd, 12) if rnd.random() < 0.5 else None,
+                       "estado": rnd.choice(estados), "prioridad": rnd.choice(prioridades),
+                       "fecha_limite": limite,
+                       "recordatorio": limite - timedelta(days=1) if rnd.random() < 0.4 else None}
+
+    def contrasenas(self):
+        for uid in self.ids_usuario:
+            rnd = _rnd(self.semilla, uid, "contrasenas")
+            for i in range(self.cantidad["contrasenas"]):
+                servicio = rnd.choice(SERVICIOS)
+                yield {"usuario_id": uid, "servicio": f"{servicio} {i + 1}",
+                       "usuario": f"perf{uid}@{servicio.lower().replace(' ', '')}.com",
+                       "contrasena_encriptada": rnd.choice(self.claves_cifradas),
+                       "url": f"https://{servicio.lower().replace(' ', '')}.example.com" if rnd.random() < 0.7 else None,
+                       "notas": None}
+
+# ============================================================================
+# 💾 INSERCIÓN
+# ============================================================================
+
+# Orden de inserción (respeta las claves foráneas)
+TABLAS = [
+    ("usuarios", models.Usuario), ("categorias", models.Categoria), ("gastos", models.Gasto),
+    ("ingresos", models.Ingreso), ("creditos", models.Credito), ("pagos", models.Pago),
+    ("contactos", models.Contacto), ("cumpleanos", models.Cumpleano),
+    ("pendientes", models.Pendiente), ("contrasenas", models.Contrasena),
+]
+
+
+def _siguiente_id(engine, modelo) -> int:
+    with engine.connect() as conexion:
+        return (conexion.execute(select(func.max(modelo.id))).scalar() or 0) + 1
+
+
+def insertar(engine, filas, modelo) -> int:
+    """Inserta las filas en lotes de LOTE, una transacción por lote"""
+    total = 0
+    tabla = modelo.__table__
+    while True:
+        lote = list(islice(filas, LOTE))
+        if not lote:
+            return total
+        with engine.begin() as conexion:
+            conexion.execute(insert(tabla), lote)
+        total += len(lote)
+
+
+def generar(url: str, usuarios: int, escala: float, semilla: int, hasta: date, anios: int) -> dict:
+    """
+    Crea el esquema si falta e inserta los datos de `usuarios` usuarios nuevos
+
+    Returns:
+        Filas insertadas por tabla
+    """
+    engine = pool.crear_engine(url)
+    crear_tablas(bind=engine)
+
+    primer_usuario = _siguiente_id(engine, models.Usuario)
+    generador = Generador(
+        ids_usuario=range(primer_usuario, primer_usuario + usuarios),
+        primer_id_categoria=_siguiente_id(engine, models.Categoria),
+        primer_id_credito=_siguiente_id(engine, models.Credito),
+        escala=escala, semilla=semilla, hasta=hasta, anios=anios,
+    )
+
+    insertadas = {}
+    for nombre, modelo in TABLAS:
+        inicio = time.perf_counter()
+        insertadas[nombre] = insertar(engine, getattr(generador, nombre)(), modelo)
+        segundos = time.perf_counter() - inicio
+        print(f"  {nombre:<12}{insertadas[nombre]:>12,} filas {segundos:>8.1f}s "
+              f"({insertadas[nombre] / max(segundos, 1e-9):>10,.0f} filas/s)")
+
+    inicio = time.perf_counter()
+    with Session(bind=engine) as db:
+        insertadas["resumen_mensual"] = resumen.reconstruir_resumen(db)
+    print(f"  {'resumen':<12}{insertadas['resumen_mensual']:>12,} filas {time.perf_counter() - inicio:>8.1f}s")
+    engine.dispose()
+    return insertadas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera datos de prueba deterministas a gran escala")
+    parser.add_argument("--url", default="sqlite:///perf.db", help="URL de una base de PRUEBAS (por defecto SQLite perf.db)")
+    parser.add_argument("--usuarios", type=int, default=100, help="Usuarios a crear")
+    parser.add_argument("--escala", type=float, default=1.0, help="Multiplicador de los volúmenes por usuario")
+    parser.add_argument("--semilla", type=int, default=42, help="Semilla de los datos")
+    parser.add_argument("--hasta", type=date.fromisoformat, default=date(2025, 12, 31), help="Fecha más reciente (AAAA-MM-DD)")
+    parser.add_argument("--anios", type=int, default=3, help="Años de historia hacia atrás desde --hasta")
+    args = parser.parse_args()
+
+    print(f"Generando {args.usuarios} usuarios (escala {args.escala}, semilla {args.semilla}) en {args.url}")
+    inicio = time.perf_counter()
+    filas = generar(args.url, args.usuarios, args.escala, args.semilla, args.hasta, args.anios)
+    print(f"✅ {sum(filas.values()):,} filas en {time.perf_counter() - inicio:.1f}s. "
+          f"Usuarios perf<id>, contraseña '{CLAVE_USUARIOS}'")
@@ -0,0 +1,179 @@
+"""
+Benchmark: entidades completas vs perfiles de listado
+
+Para créditos, contactos y cumpleaños compara dos formas de cargar un
+listado. La primera trae entidades ORM completas, con sus columnas Text
+(observaciones, notas). La segunda trae solo las columnas de
+crud.COLUMNAS_LISTADO convertidas en FilaListado. Mide:
+
+    - bytes: tamaño de los valores que devuelve el driver (aprox. lo transferido)
+    - memoria: pico de tracemalloc mientras se cargan las filas
+    - tiempo: segundos de la carga
+
+Uso:
+    python -m benchmarks.listados                          # SQLite en memoria
+    python -m benchmarks.listados --filas 20000 --notas 2000
+    python -m benchmarks.listados --url mysql+pymysql://u:p@host/bd_pruebas
+
+Con --url se crean las tablas y se insertan datos: usar una base de pruebas.
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.config.database import Base
+from app.repository import crud
+from app.schema import models
+
+USUARIO_BENCH = "bench_listados"
+
+# listado: (modelo, ORDER BY)
+LISTADOS = {
+    'creditos': (models.Credito, (models.Credito.fecha_inicio.desc(), models.Credito.id.desc())),
+    'contactos': (models.Contacto, (models.Contacto.nombres, models.Contacto.apellidos, models.Contacto.id)),
+    'cumpleanos': (models.Cumpleano, (models.Cumpleano.fecha_nacimiento, models.Cumpleano.id)),
+}
+
+
+def _texto(rnd: random.Random, largo: int) -> str:
+    return ''.join(rnd.choice('abcdefghijklmnopqrstuvwxyz ') for _ in range(largo))
+
+
+def poblar(db, filas: int, largo_notas: int, semilla: int = 42) -> int:
+    """Crea un usuario de prueba con `filas` créditos, contactos y cumpleaños"""
+    rnd = random.Random(semilla)
+    usuario = models.Usuario(nombre="Bench", email=f"{USUARIO_BENCH}@example.com",
+                             username=USUARIO_BENCH, password="x")
+    db.add(usuario)
+    db.flush()
+
+    notas = [_texto(rnd, largo_notas) for _ in range(50)]
+    hoy = date.today()
+    for i in range(filas):
+        db.add(models.Credito(
+            nombre_credito=f"Crédito {i}", monto=1_000_000, interes=1.5, plazo_meses=24,
+            frecuencia_pago='mensual', fecha_inicio=hoy - timedelta(days=rnd.randint(0, 2000)),
+            cuota_manual=0.0, cuota=50_000, seguro=2_000, total_pagar=1_200_000,
+            saldo_actual=rnd.randint(0, 1_000_000), estado='activo',
+            observaciones=rnd.choice(notas), usuario_id=usuario.id
+        ))
+        db.add(models.Contacto(
+            nombres=f"Nombre {rnd.randint(0, 999):03d}", apellidos=f"Apellido {i}",
+            categoria='otro', direccion="Calle 1 # 2-3", celular1="3000000000",
+            email=f"c{i}@example.com", notas=rnd.choice(notas), usuario_id=usuario.id
+        ))
+        db.add(models.Cumpleano(
+            nombre_persona=f"Persona {i}", fecha_nacimiento=date(1960, 1, 1) + timedelta(days=rnd.randint(0, 20000)),
+            relacion='amigo', notas=rnd.choice(notas), usuario_id=usuario.id
+        ))
+        if i % 1000 == 999:
+            db.flush()
+    db.commit()
+    return usuario.id
+
+
+def _bytes(valor) -> int:
+    """Tamaño aproximado de un valor tal como llega del driver"""
+    if valor is None:
+        return 0
+    if isinstance(valor, str):
+        return len(valor.encode('utf-8'))
+    if isinstance(valor, bytes):
+        return len(valor)
+    if isinstance(valor, (datetime, date)):
+        return len(valor.isoformat())
+    if isinstance(valor, Decimal):
+        return len(str(valor))
+    return 8
+
+
+def _medir(sesiones, construir, cargar) -> dict:
+    """Ejecuta una carga en una sesión nueva midiendo bytes, memoria y tiempo"""
+    db = sesiones()
+    try:
+        query = construir(db)
+        # Ejecución Core: columnas tal cual las entrega el driver
+        filas = db.connection().execute(query.statement)
+        transferido = sum(_bytes(v) for fila in filas for v in fila)
+    finally:
+        db.close()
+
+    db = sesiones()
+    try:
+        query = construir(db)
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        filas = cargar(query)
+        segundos = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {"filas": len(filas), "bytes": transferido, "memoria": pico, "segundos": segundos}
+    finally:
+        db.close()
+
+
+def comparar(sesiones, usuario_id: int, limite: int) -> dict:
+    """Mide cada listado con entidades completas y con su perfil"""
+    resultados = {}
+    for nombre, (modelo, orden) in LISTADOS.items():
+        def entidades(db, modelo=modelo, orden=orden):
+            return db.query(modelo).filter(modelo.usuario_id == usuario_id).order_by(*orden).limit(limite)
+
+        def perfil(db, modelo=modelo, orden=orden, nombre=nombre):
+            return db.query(*crud.COLUMNAS_LISTADO[nombre]).filter(
+                modelo.usuario_id == usuario_id
+            ).order_by(*orden).limit(limite)
+
+        resultados[nombre] = {
+            "entidades": _medir(sesiones, entidades, lambda q: q.all()),
+            "perfil": _medir(sesiones, perfil, lambda q: crud._filas_livianas(q.all())),
+        }
+    return resultados
+
+
+def _kb(valor: int) -> str:
+    return f"{valor / 1024:,.1f} KB"
+
+
+def imprimir(resultados: dict):
+    print(f"{'listado':<12}{'modo':<11}{'filas':>7}{'bytes':>14}{'memoria':>14}{'tiempo':>10}")
+    for nombre, modos in resultados.items():
+        for modo, r in modos.items():
+            print(f"{nombre:<12}{modo:<11}{r['filas']:>7}{_kb(r['bytes']):>14}"
+                  f"{_kb(r['memoria']):>14}{r['segundos'] * 1000:>8.1f}ms")
+        antes, despues = modos["entidades"], modos["perfil"]
+        ahorro_bytes = 1 - despues["bytes"] / antes["bytes"] if antes["bytes"] else 0
+        ahorro_memoria = 1 - despues["memoria"] / antes["memoria"] if antes["memoria"] else 0
+        print(f"{'':<12}{'reducción':<11}{'':>7}{ahorro_bytes:>14.1%}{ahorro_memoria:>14.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara entidades completas vs perfiles de listado")
+    parser.add_argument("--url", default="sqlite://", help="URL de una base de PRUEBAS (por defecto SQLite en memoria)")
+    parser.add_argument("--filas", type=int, default=5000, help="Filas por listado a insertar")
+    parser.add_argument("--notas", type=int, default=1000, help="Largo de las columnas Text")
+    parser.add_argument("--limite", type=int, default=1000, help="Filas a cargar por medición")
+    args = parser.parse_args()
+
+    if args.url.startswith("sqlite"):
+        engine = create_engine(args.url, poolclass=StaticPool, connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(args.url)
+    Base.metadata.create_all(engine)
+    sesiones = sessionmaker(bind=engine, autoflush=False)
+
+    db = sesiones()
+    try:
+        existente = db.query(models.Usuario).filter(models.Usuario.username == USUARIO_BENCH).first()
+        usuario_id = existente.id if existente else poblar(db, args.filas, args.notas)
+    finally:
+        db.close()
+
+    imprimir(comparar(sesiones, usuario_id, args.limite))
@@ -0,0 +1,127 @@
+"""
+Benchmark: ráfaga de logins con bcrypt en el event loop vs en el pool de contrasenas
+
+Monta una app FastAPI mínima con dos versiones del paso costoso del login
+y una ruta sin relación:
+
+    /login/inline  bcrypt.checkpw dentro de async def (el patrón anterior)
+    /login/pool    contrasenas.verificar_password_async (pool acotado)
+    /ping          ruta cualquiera de otro usuario
+
+Lanza N logins a la vez y, mientras están en curso, mide la latencia de
+/ping. Reporta el throughput de logins y la latencia de /ping (p50, p95,
+máx). La base de datos no interviene: la consulta del usuario es la misma
+en las dos versiones y aquí solo se mide el costo de bcrypt.
+
+Uso:
+    python -m benchmarks.rafaga_login
+    python -m benchmarks.rafaga_login --logins 32 --rounds 10
+    HASH_WORKERS=8 python -m benchmarks.rafaga_login
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import bcrypt
+import httpx
+from fastapi import FastAPI, HTTPException
+
+from app.repository import contrasenas
+
+
+def crear_app(hash_guardado: str) -> FastAPI:
+    """App con el login en el event loop y en el pool de bcrypt"""
+    app = FastAPI()
+
+    @app.post("/login/inline")
+    async def login_inline(password: str):
+        if not bcrypt.checkpw(password.encode('utf-8'), hash_guardado.encode('utf-8')):
+            raise HTTPException(status_code=401)
+        return {"ok": True}
+
+    @app.post("/login/pool")
+    async def login_pool(password: str):
+        if not await contrasenas.verificar_password_async(password, hash_guardado):
+            raise HTTPException(status_code=401)
+        return {"ok": True}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def _percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+async def medir(app: FastAPI, modo: str, logins: int, password: str, intervalo: float) -> dict:
+    """
+    Throughput de `logins` simultáneos a /login/{modo} y latencia de /ping mientras tanto
+
+    Se programa un ping cada `intervalo` segundos hasta que terminan los
+    logins. La latencia se cuenta desde el momento programado: si el event
+    loop estaba bloqueado, esa espera también cuenta.
+    """
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        await cliente.post(f"/login/{modo}", params={"password": password})  # calentar
+
+        # Todos los logins llegan a la vez: su latencia se cuenta desde `inicio`
+        async def un_login():
+            respuesta = await cliente.post(f"/login/{modo}", params={"password": password})
+            respuesta.raise_for_status()
+            return time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        tareas = asyncio.gather(*(un_login() for _ in range(logins)))
+
+        latencias_ping = []
+        numero = 0
+        while not tareas.done():
+            programado = inicio + intervalo * numero
+            await asyncio.sleep(max(0.0, programado - time.perf_counter()))
+            respuesta = await cliente.get("/ping")
+            respuesta.raise_for_status()
+            latencias_ping.append(time.perf_counter() - programado)
+            numero += 1
+
+        latencias_login = await tareas
+        total = time.perf_counter() - inicio
+
+    return {
+        "logins_s": logins / total,
+        "login_p95": _percentil(latencias_login, 0.95),
+        "ping_p50": statistics.median(latencias_ping),
+        "ping_p95": _percentil(latencias_ping, 0.95),
+        "ping_max": max(latencias_ping),
+    }
+
+
+def imprimir(resultados: dict, logins: int, rounds: int):
+    print(f"{logins} logins simultáneos, bcrypt rounds={rounds}, "
+          f"HASH_WORKERS={contrasenas.HASH_WORKERS}")
+    print(f"{'modo':<8}{'logins/s':>10}{'login p95':>12}{'ping p50':>12}{'ping p95':>12}{'ping máx':>12}")
+    for modo, r in resultados.items():
+        print(f"{modo:<8}{r['logins_s']:>10.1f}{r['login_p95'] * 1000:>10.0f}ms"
+              f"{r['ping_p50'] * 1000:>10.1f}ms{r['ping_p95'] * 1000:>10.1f}ms"
+              f"{r['ping_max'] * 1000:>10.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara bcrypt en el event loop vs en el pool de contrasenas")
+    parser.add_argument("--logins", type=int, default=16, help="Logins simultáneos")
+    parser.add_argument("--rounds", type=int, default=contrasenas.BCRYPT_ROUNDS, help="Costo bcrypt del hash guardado")
+    parser.add_argument("--intervalo", type=float, default=0.02, help="Segundos entre pings")
+    args = parser.parse_args()
+
+    password = "clave-de-prueba"
+    app = crear_app(contrasenas.hashear_password(password, rounds=args.rounds))
+    resultados = {
+        modo: asyncio.run(medir(app, modo, args.logins, password, args.intervalo))
+        for modo in ("inline", "pool")
+    }
+    imprimir(resultados, args.logins, args.rounds)
@@ -0,0 +1,188 @@
+"""
+Verificación local del enrutamiento a réplicas con bases SQLite de reemplazo
+
+Crea en un directorio temporal una primaria y dos réplicas SQLite, más una
+tercera réplica con una URL que no se puede abrir (siempre caída). Cada
+base guarda su propio nombre en la tabla `origen`, así cada respuesta
+dice de qué base leyó. Monta una app mínima con las mismas piezas que la
+app real (replicas.EnrutadorLecturas, crear_get_db_lectura y la sesión
+HTTP) y comprueba que:
+
+    1. las lecturas se reparten en round-robin entre las réplicas sanas
+    2. tras un POST, la página a la que redirige y las lecturas siguientes
+       del mismo usuario van a la primaria durante la ventana
+    3. otros usuarios siguen leyendo de las réplicas
+    4. pasada la ventana, el usuario vuelve a las réplicas
+    5. una réplica que deja de responder al chequeo sale de la rotación y
+       vuelve cuando responde de nuevo
+    6. un error de conexión durante una petición la saca de inmediato
+    7. una ruta de solo lectura que intenta escribir falla
+
+Uso:
+    python -m benchmarks.replicas_local
+    python -m benchmarks.replicas_local --ventana 1
+
+Sale con código 1 si alguna comprobación falla.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import RedirectResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import Column, Integer, String, create_engine, exc, text
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from starlette.middleware.sessions import SessionMiddleware
+
+from app.config import replicas
+
+Base = declarative_base()
+
+
+class Nota(Base):
+    __tablename__ = "notas"
+    id = Column(Integer, primary_key=True)
+    texto = Column(String(100))
+
+
+def crear_base(ruta: str, nombre: str):
+    """Base SQLite con su nombre en `origen` y la tabla de notas"""
+    engine = create_engine(f"sqlite:///{ruta}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conexion:
+        conexion.execute(text("CREATE TABLE origen (nombre TEXT)"))
+        conexion.execute(text("INSERT INTO origen VALUES (:n)"), {"n": nombre})
+    engine.dispose()
+
+
+def crear_app(url_primaria: str, enrutador: replicas.EnrutadorLecturas) -> FastAPI:
+    """App con get_db / get_db_lectura armadas igual que en app/config/database.py"""
+    engine = create_engine(url_primaria)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def get_db(request: Request):
+        db = SessionLocal()
+        replicas.recordar_sesion_http(db, request)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    get_db_lectura = replicas.crear_get_db_lectura(get_db, enrutador)
+
+    app = FastAPI()
+    app.add_middleware(SessionMiddleware, secret_key="replicas-local")
+
+    @app.get("/origen")
+    def origen(db: Session = Depends(get_db_lectura)):
+        return {"origen": db.execute(text("SELECT nombre FROM origen")).scalar()}
+
+    @app.post("/notas")
+    def crear_nota(db: Session = Depends(get_db)):
+        db.add(Nota(texto="nueva"))
+        db.commit()
+        return RedirectResponse(url="/origen", status_code=303)
+
+    @app.get("/escritura-mal-enrutada")
+    def escritura_mal_enrutada(db: Session = Depends(get_db_lectura)):
+        db.add(Nota(texto="no debería"))
+        db.commit()
+        return {"ok": True}
+
+    return app
+
+
+def _origenes(cliente: TestClient, n: int) -> list:
+    return [cliente.get("/origen").json()["origen"] for _ in range(n)]
+
+
+def verificar(directorio: str, ventana: float) -> bool:
+    rutas = {nombre: os.path.join(directorio, f"{nombre}.db")
+             for nombre in ("primaria", "replica1", "replica2")}
+    for nombre, ruta in rutas.items():
+        crear_base(ruta, nombre)
+
+    url_caida = f"sqlite:///{os.path.join(directorio, 'no_existe', 'replica3.db')}"
+    enrutador = replicas.EnrutadorLecturas(
+        [f"sqlite:///{rutas['replica1']}", f"sqlite:///{rutas['replica2']}", url_caida],
+        ventana=ventana, intervalo_chequeo=3600,  # los chequeos se llaman a mano
+    )
+    enrutador.chequear()
+    app = crear_app(f"sqlite:///{rutas['primaria']}", enrutador)
+    usuario = TestClient(app)
+    otro_usuario = TestClient(app)
+
+    resultados = []
+
+    def comprobar(descripcion: str, ok: bool, detalle):
+        resultados.append(ok)
+        print(f"{'✅' if ok else '❌'} {descripcion}: {detalle}")
+
+    leidos = _origenes(usuario, 6)
+    comprobar("round-robin entre réplicas sanas", leidos == ["replica1", "replica2"] * 3, leidos)
+
+    redirigida = usuario.post("/notas").json()["origen"]
+    comprobar("la redirección tras el POST lee de la primaria", redirigida == "primaria", redirigida)
+    leidos = _origenes(usuario, 3)
+    comprobar("lecturas dentro de la ventana en la primaria", set(leidos) == {"primaria"}, leidos)
+    leidos = _origenes(otro_usuario, 2)
+    comprobar("otro usuario sigue en las réplicas", "primaria" not in leidos, leidos)
+
+    time.sleep(ventana)
+    leidos = _origenes(usuario, 2)
+    comprobar("pasada la ventana vuelve a las réplicas", "primaria" not in leidos, leidos)
+
+    # "Apagar" replica1: un directorio en su lugar hace fallar la conexión
+    respaldo = rutas["replica1"] + ".bak"
+    shutil.move(rutas["replica1"], respaldo)
+    os.mkdir(rutas["replica1"])
+    enrutador.replicas[0].engine.dispose()
+    enrutador.chequear()
+    leidos = _origenes(otro_usuario, 4)
+    comprobar("réplica caída fuera de la rotación", set(leidos) == {"replica2"}, leidos)
+
+    os.rmdir(rutas["replica1"])
+    shutil.move(respaldo, rutas["replica1"])
+    enrutador.chequear()
+    leidos = _origenes(otro_usuario, 4)
+    comprobar("réplica recuperada vuelve a la rotación", sorted(set(leidos)) == ["replica1", "replica2"], leidos)
+
+    # Caída detectada durante una petición, sin esperar al siguiente chequeo
+    respaldo = rutas["replica2"] + ".bak"
+    shutil.move(rutas["replica2"], respaldo)
+    os.mkdir(rutas["replica2"])
+    enrutador.replicas[1].engine.dispose()
+    fallidas = 0
+    for _ in range(2):
+        try:
+            otro_usuario.get("/origen")
+        except exc.OperationalError:
+            fallidas += 1
+    leidos = _origenes(otro_usuario, 3)
+    comprobar("error de conexión en una petición saca a la réplica",
+              fallidas == 1 and set(leidos) == {"replica1"}, f"{fallidas} fallida, luego {leidos}")
+    os.rmdir(rutas["replica2"])
+    shutil.move(respaldo, rutas["replica2"])
+    enrutador.chequear()
+
+    try:
+        TestClient(app).get("/escritura-mal-enrutada")
+        comprobar("escritura en sesión de réplica rechazada", False, "no falló")
+    except RuntimeError as e:
+        comprobar("escritura en sesión de réplica rechazada", True, e)
+
+    print(enrutador.estadisticas())
+    return all(resultados)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifica el enrutamiento de lecturas a réplicas con SQLite")
+    parser.add_argument("--ventana", type=float, default=0.5, help="Segundos de lectura en la primaria tras escribir")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        sys.exit(0 if verificar(directorio, args.ventana) else 1)
@@ -1,14 +1,118 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from app.config import logs
+
+# Antes de importar las rutas: al importarse, contrasenas ya escribe en el log
+logs.configurar_logging()
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from app.controller.routes import router     
+from app.config import metricas, perfilador, pool
+from app.config.consultas import MedicionConsultasMiddleware
+from app.config.database import ES_SQLITE, async_engine, engine, enrutador_lecturas
+from app.repository import cache, contrasenas, trabajos
+from app.schema.create_tables import crear_tablas
 from starlette.middleware.sessions import SessionMiddleware
-app = FastAPI()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Sin esto, los procesos del pool de exportación sobreviven al worker
+    trabajos.cerrar_pool()
+    # Las conexiones aiosqlite/aiomysql del pool async se cierran dentro del
+    # event loop; si quedan abiertas, sus hilos impiden que el proceso termine
+    await async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Con SQLite (DATABASE_URL=sqlite:///...) el esquema completo se crea al arrancar
+if ES_SQLITE:
+    crear_tablas()
 
 # Montar carpeta estática
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
+# Perfilado de una petición a pedido (X-Perfil / ?perfil=); sin PERFIL_TOKEN no se instala.
+# Es el primero agregado, el más interno: sus pilas empiezan junto al router
+if perfilador.habilitado():
+    app.add_middleware(perfilador.PerfiladorMiddleware)
 # 🔐 Clave secreta para cifrar la sesión (cámbiala por algo más seguro en producción)
 app.add_middleware(SessionMiddleware, secret_key='supersecreto123')
+# Consultas SQL por petición en la cabecera Server-Timing y log de consultas lentas
+app.add_middleware(MedicionConsultasMiddleware)
+# Latencia, tamaño y estado por ruta para /metrics (el último agregado es el más externo)
+app.add_middleware(metricas.MetricasHTTPMiddleware)
 # Incluir rutas
 app.include_router(router)
- 
\ No newline at end of file
+ 
+# ============================================================================
+# 📈 MÉTRICAS (/metrics)
+# ============================================================================
+
+def _engines():
+    yield "sync", engine
+    yield "async", async_engine
+    for replica in enrutador_lecturas.replicas:
+        yield replica.nombre, replica.engine
+
+
+@metricas.registrar_colector
+def _metricas_pool():
+    estados = [(nombre, pool.estadisticas(e), getattr(e, "sync_engine", e).pool.metricas)
+               for nombre, e in _engines()]
+    limites = [ms / 1000 for ms in pool.LIMITES_ESPERA_MS]
+    lineas = metricas.familia("db_pool_tamano", "gauge", "Conexiones que el pool mantiene abiertas",
+                              (({"engine": n}, d["tamano"]) for n, d, _ in estados))
+    lineas += metricas.familia("db_pool_conexiones", "gauge", "Conexiones del pool por estado",
+                               (({"engine": n, "estado": estado}, d[estado])
+                                for n, d, _ in estados for estado in ("en_uso", "libres")))
+    lineas += metricas.familia("db_pool_overflow", "gauge", "Conexiones abiertas por encima de pool_size",
+                               (({"engine": n}, d["overflow"]) for n, d, _ in estados))
+    lineas += metricas.familia("db_pool_timeouts_total", "counter", "Checkouts que agotaron DB_POOL_TIMEOUT",
+                               (({"engine": n}, d["timeouts"]) for n, d, _ in estados))
+    lineas += metricas.histograma_texto("db_pool_espera_segundos", "Espera por una conexión libre en cada checkout",
+                                        ("engine",),
+                                        (((n,), limites) + m.histograma_crudo() for n, _, m in estados))
+    return lineas
+
+
+@metricas.registrar_colector
+def _metricas_cache():
+    datos = cache.estadisticas()
+    lineas = metricas.familia("cache_aciertos_total", "counter", "Aciertos de la caché en memoria",
+                              (({"cache": n}, d["aciertos"]) for n, d in datos.items()))
+    lineas += metricas.familia("cache_fallos_total", "counter", "Fallos de la caché en memoria",
+                               (({"cache": n}, d["fallos"]) for n, d in datos.items()))
+    lineas += metricas.familia("cache_tasa_aciertos", "gauge", "Aciertos / consultas desde el arranque",
+                               (({"cache": n}, d["tasa_aciertos"]) for n, d in datos.items()))
+    lineas += metricas.familia("cache_items", "gauge", "Entradas guardadas en la caché",
+                               (({"cache": n}, d["items"]) for n, d in datos.items()))
+    return lineas
+
+
+@metricas.registrar_colector
+def _metricas_colas():
+    exportaciones = trabajos.estadisticas()
+    bcrypt = contrasenas.estadisticas()
+    lineas = metricas.familia("exportaciones_trabajos", "gauge", "Trabajos de exportación por estado",
+                              (({"estado": estado}, cantidad)
+                               for estado, cantidad in exportaciones["trabajos"].items()))
+    lineas += metricas.familia("exportaciones_en_cola", "gauge", "Exportaciones esperando o generándose",
+                               [({}, exportaciones["trabajos"][trabajos.PENDIENTE])])
+    lineas += metricas.familia("bcrypt_en_cola", "gauge", "Hashes de contraseña esperando un worker de bcrypt",
+                               [({}, bcrypt["en_cola"])])
+    lineas += metricas.familia("bcrypt_workers", "gauge", "Hilos del pool de bcrypt",
+                               [({}, bcrypt["workers"])])
+    return lineas
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    """Métricas en formato de texto de Prometheus (ver app/config/metricas.py)"""
+    if not metricas.autorizado(request):
+        return PlainTextResponse("No autorizado", status_code=401)
+    return PlainTextResponse(metricas.exponer(), media_type=metricas.TIPO_CONTENIDO)
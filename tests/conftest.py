@@ -0,0 +1,60 @@
+"""
+Configuración común de las pruebas
+
+Las pruebas corren contra un archivo SQLite temporal: DATABASE_URL se define
+antes de importar app.config.database, que crea los engines al importarse.
+"""
+import os
+import tempfile
+
+_DIRECTORIO = tempfile.mkdtemp(prefix="finanzas_pruebas_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DIRECTORIO, 'pruebas.db')}"
+# Sin calibrar bcrypt al importar (tarda y no hace falta en las pruebas)
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.config.database import Base, SessionLocal, engine  # noqa: E402
+from app.repository import cache  # noqa: E402
+from app.schema.create_tables import crear_tablas  # noqa: E402
+
+
+@pytest.fixture
+def bd():
+    """Esquema vacío para cada prueba (y cachés en memoria limpias)"""
+    Base.metadata.drop_all(bind=engine)
+    crear_tablas()
+    for cache_app in cache.CACHES.values():
+        cache_app.limpiar()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def sesion(bd):
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class ContadorConsultas:
+    """Cuenta las sentencias SELECT que pasan por un engine"""
+
+    def __init__(self):
+        self.selects = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.selects += 1
+
+
+@pytest.fixture
+def contar_consultas(bd):
+    """Registra un ContadorConsultas en el engine mientras dura la prueba"""
+    contador = ContadorConsultas()
+    event.listen(bd, "before_cursor_execute", contador)
+    yield contador
+    event.remove(bd, "before_cursor_execute", contador)
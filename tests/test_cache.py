@@ -0,0 +1,43 @@
+"""
+Cachés en memoria: una escritura atendida por otro worker (que no pasa por
+la invalidación de este proceso) también las invalida, por la versión de datos.
+"""
+from datetime import date
+import pytest
+
+from app.config.database import SessionLocal
+from app.repository import cache, crud
+from app.schema import models, schemas
+
+
+@pytest.fixture
+def usuario_id(sesion):
+    usuario = models.Usuario(nombre="tablero", email="tablero@prueba.local", username="tablero", password="x")
+    sesion.add(usuario)
+    sesion.flush()
+    sesion.add(models.Categoria(nombre="Salario", tipo="fijo", usuario_id=usuario.id))
+    sesion.commit()
+    return usuario.id
+
+
+def _escribir_en_otro_worker(usuario_id, monkeypatch):
+    """Commit sin pasar por la invalidación de este proceso"""
+    monkeypatch.setattr(cache, "registrar_escritura", lambda usuario_id: None)
+    with SessionLocal() as otra:
+        categoria = otra.query(models.Categoria).filter_by(usuario_id=usuario_id).first()
+        crud.crear_ingreso(otra, schemas.IngresoCreate(categoria_id=categoria.id, valor=100,
+                                                       fecha=date.today(), estado="recibido"), usuario_id)
+    monkeypatch.undo()
+
+
+def test_dashboard_ve_escrituras_de_otro_worker(usuario_id, monkeypatch):
+    with SessionLocal() as db:
+        antes = crud.obtener_estadisticas_dashboard_cacheadas(db, usuario_id)
+        assert crud.obtener_estadisticas_dashboard_cacheadas(db, usuario_id) is antes
+
+    _escribir_en_otro_worker(usuario_id, monkeypatch)
+
+    with SessionLocal() as db:
+        despues = crud.obtener_estadisticas_dashboard_cacheadas(db, usuario_id)
+    assert despues is not antes
+    assert despues.total_ingresos == antes.total_ingresos + 100
@@ -0,0 +1,61 @@
+"""
+Política de rehash de contraseñas: con BCRYPT_ROUNDS fijo se regenera todo
+hash con otro costo; con el costo calibrado, solo hacia arriba
+"""
+import pytest
+
+from app.repository import contrasenas
+
+
+@pytest.fixture
+def calibrado_11(monkeypatch):
+    monkeypatch.setattr(contrasenas, "BCRYPT_ROUNDS", 11)
+    monkeypatch.setattr(contrasenas, "ORIGEN_ROUNDS", "calibrado")
+
+
+@pytest.fixture
+def fijo_11(monkeypatch):
+    monkeypatch.setattr(contrasenas, "BCRYPT_ROUNDS", 11)
+    monkeypatch.setattr(contrasenas, "ORIGEN_ROUNDS", "BCRYPT_ROUNDS")
+
+
+@pytest.mark.parametrize("hash_guardado, esperado", [
+    ("$2b$10$" + "a" * 53, True),    # costo menor: se sube
+    ("$2b$11$" + "a" * 53, False),   # costo actual
+    ("$2b$12$" + "a" * 53, False),   # costo mayor (otro worker calibró 12): se conserva
+    ("$2a$12$" + "a" * 53, True),    # otra variante de bcrypt
+    ("texto plano", True),           # formato inválido
+])
+def test_necesita_rehash_calibrado(calibrado_11, hash_guardado, esperado):
+    assert contrasenas.necesita_rehash(hash_guardado) is esperado
+
+
+@pytest.mark.parametrize("hash_guardado, esperado", [
+    ("$2b$10$" + "a" * 53, True),    # costo menor: se sube
+    ("$2b$11$" + "a" * 53, False),   # costo fijado
+    ("$2b$12$" + "a" * 53, True),    # costo mayor: el despliegue lo bajó, se baja
+    ("$2a$11$" + "a" * 53, True),    # otra variante de bcrypt
+    ("texto plano", True),           # formato inválido
+])
+def test_necesita_rehash_fijo(fijo_11, hash_guardado, esperado):
+    assert contrasenas.necesita_rehash(hash_guardado) is esperado
+
+
+def test_workers_calibrados_con_costos_distintos_no_alternan(monkeypatch):
+    """Un hash subido por el worker de costo 12 no vuelve a 11 en el otro worker"""
+    monkeypatch.setattr(contrasenas, "ORIGEN_ROUNDS", "calibrado")
+    monkeypatch.setattr(contrasenas, "BCRYPT_ROUNDS", 12)
+    hash_12 = contrasenas.hashear_password("secreta", rounds=12)
+    assert not contrasenas.necesita_rehash(hash_12)
+
+    monkeypatch.setattr(contrasenas, "BCRYPT_ROUNDS", 11)
+    assert not contrasenas.necesita_rehash(hash_12)
+
+
+def test_bajar_bcrypt_rounds_regenera_hacia_abajo(fijo_11):
+    hash_12 = contrasenas.hashear_password("secreta", rounds=12)
+    assert contrasenas.necesita_rehash(hash_12)
+
+    nuevo = contrasenas.hashear_password("secreta")
+    assert nuevo.startswith("$2b$11$")
+    assert not contrasenas.necesita_rehash(nuevo)
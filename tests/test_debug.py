@@ -0,0 +1,31 @@
+"""
+Endpoints /debug/* de estado del proceso: exigen METRICAS_TOKEN (sin él no
+responden), a diferencia de /metrics, que sin token queda abierto
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+
+TOKEN = "secreto-de-prueba"
+
+
+@pytest.fixture
+def cliente(bd):
+    with TestClient(app) as cliente:
+        yield cliente
+
+
+@pytest.mark.parametrize("ruta", ["/debug/pool", "/debug/cache"])
+def test_debug_sin_token_configurado_no_responde(cliente, monkeypatch, ruta):
+    monkeypatch.delenv("METRICAS_TOKEN", raising=False)
+    assert cliente.get(ruta).status_code == 401
+    assert cliente.get("/metrics").status_code == 200
+
+
+@pytest.mark.parametrize("ruta", ["/debug/pool", "/debug/cache"])
+def test_debug_exige_el_token(cliente, monkeypatch, ruta):
+    monkeypatch.setenv("METRICAS_TOKEN", TOKEN)
+    assert cliente.get(ruta).status_code == 401
+    assert cliente.get(ruta, headers={"Authorization": "Bearer otro"}).status_code == 401
+    assert cliente.get(ruta, headers={"Authorization": f"Bearer {TOKEN}"}).status_code == 200
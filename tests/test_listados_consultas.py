@@ -0,0 +1,107 @@
+"""
+Listados y exportaciones de ingresos/gastos: la categoría de cada fila sale
+del mismo JOIN, así que la cantidad de SELECT no depende de cuántas filas
+ni cuántas categorías distintas haya.
+"""
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app.config.database import SessionLocal
+from app.repository import crud, exportacion
+from app.schema import models
+
+TIPOS = ('fijo', 'variable', 'opcional')
+POR_PAGINA = 50
+
+
+def _sembrar(db, username: str, filas: int, categorias: int) -> int:
+    """Usuario con `filas` ingresos y `filas` gastos repartidos en `categorias` categorías"""
+    usuario = models.Usuario(nombre=username, email=f"{username}@prueba.local",
+                             username=username, password="x")
+    db.add(usuario)
+    db.flush()
+    lista = [
+        models.Categoria(nombre=f"Categoría {i}", tipo=TIPOS[i % len(TIPOS)], usuario_id=usuario.id)
+        for i in range(categorias)
+    ]
+    db.add_all(lista)
+    db.flush()
+    hoy = date.today()
+    for i in range(filas):
+        categoria = lista[i % categorias]
+        db.add(models.Ingreso(categoria_id=categoria.id, usuario_id=usuario.id, valor=Decimal("100.00"),
+                              fecha=hoy - timedelta(days=i), estado='recibido'))
+        db.add(models.Gasto(categoria_id=categoria.id, usuario_id=usuario.id, valor=Decimal("50.00"),
+                            fecha_limite=hoy - timedelta(days=i), pagado=bool(i % 2)))
+    db.commit()
+    return usuario.id
+
+
+@pytest.fixture
+def usuarios(sesion):
+    """Un usuario con pocos datos y otro con muchas filas y categorías"""
+    return {
+        "pocos": _sembrar(sesion, "pocos", filas=6, categorias=2),
+        "muchos": _sembrar(sesion, "muchos", filas=3 * POR_PAGINA, categorias=60),
+    }
+
+
+def _selects(contador, operacion) -> int:
+    """SELECT ejecutados por operacion() en una sesión nueva (sin categorías ya cargadas)"""
+    inicio = contador.selects
+    with SessionLocal() as db:
+        operacion(db)
+    return contador.selects - inicio
+
+
+def _listar_ingresos(usuario_id):
+    def operacion(db):
+        pagina = crud.obtener_ingresos_paginados(db, usuario_id, per_page=POR_PAGINA, por_cursor=True)
+        # Lo mismo que lee la plantilla de cada fila
+        for ingreso in pagina["ingresos"]:
+            ingreso.categoria.nombre, ingreso.categoria.tipo
+    return operacion
+
+
+def _listar_gastos(usuario_id):
+    def operacion(db):
+        pagina = crud.obtener_gastos_paginados(db, usuario_id, page_size=POR_PAGINA, por_cursor=True)
+        for gasto in pagina["gastos"]:
+            gasto.categoria.nombre, gasto.categoria.tipo
+    return operacion
+
+
+def _excel(entidad):
+    def construir(usuario_id):
+        def operacion(db):
+            exportacion.escribir_excel(db, entidad, usuario_id, io.BytesIO())
+        return operacion
+    return construir
+
+
+def _csv(entidad):
+    def construir(usuario_id):
+        def operacion(db):
+            "".join(exportacion.generar_csv(db.get_bind(), entidad, usuario_id, {}))
+        return operacion
+    return construir
+
+
+@pytest.mark.parametrize("construir", [
+    _listar_ingresos,
+    _listar_gastos,
+    _excel("ingresos"),
+    _excel("gastos"),
+    _csv("ingresos"),
+    _csv("gastos"),
+], ids=["listado-ingresos", "listado-gastos", "excel-ingresos", "excel-gastos",
+        "csv-ingresos", "csv-gastos"])
+def test_selects_constantes(usuarios, contar_consultas, construir):
+    pocos = _selects(contar_consultas, construir(usuarios["pocos"]))
+    muchos = _selects(contar_consultas, construir(usuarios["muchos"]))
+
+    assert pocos == muchos
+    assert muchos == 1
@@ -0,0 +1,80 @@
+"""
+Paginación numerada sin COUNT (listado de contraseñas): el total se cuenta
+una vez y sale de cache_totales hasta que el usuario escribe, en este worker
+o en otro. Cada página lee además la versión de datos (un SELECT por clave).
+"""
+import pytest
+
+from app.config.database import SessionLocal
+from app.repository import cache, crud
+from app.schema import models
+
+POR_PAGINA = 10
+
+
+@pytest.fixture
+def usuario_id(sesion):
+    usuario = models.Usuario(nombre="boveda", email="boveda@prueba.local", username="boveda", password="x")
+    sesion.add(usuario)
+    sesion.flush()
+    sesion.add_all(
+        models.Contrasena(servicio=f"servicio {i:02d}", usuario="yo", contrasena_encriptada="x",
+                          usuario_id=usuario.id)
+        for i in range(25)
+    )
+    sesion.commit()
+    return usuario.id
+
+
+def _pagina(contador, usuario_id, page):
+    inicio = contador.selects
+    with SessionLocal() as db:
+        datos = crud.obtener_contrasenas_paginadas(db, usuario_id, page=page, per_page=POR_PAGINA)
+    return datos, contador.selects - inicio
+
+
+def test_total_se_cuenta_una_vez(usuario_id, contar_consultas):
+    datos, selects = _pagina(contar_consultas, usuario_id, 1)
+    assert (datos["total_items"], datos["total_pages"], len(datos["contrasenas"])) == (25, 3, 10)
+    assert selects == 3  # versión + página + COUNT
+
+    datos, selects = _pagina(contar_consultas, usuario_id, 2)
+    assert [c.servicio for c in datos["contrasenas"]][0] == "servicio 10"
+    assert selects == 2
+
+
+def test_ultima_pagina_da_el_total_sin_contar(usuario_id, contar_consultas):
+    datos, selects = _pagina(contar_consultas, usuario_id, 3)
+    assert (datos["total_items"], len(datos["contrasenas"]), datos["hay_siguiente"]) == (25, 5, False)
+    assert selects == 2
+
+
+def test_escritura_descarta_el_total(usuario_id, contar_consultas):
+    _pagina(contar_consultas, usuario_id, 1)
+    with SessionLocal() as db:
+        db.add(models.Contrasena(servicio="nuevo", usuario="yo", contrasena_encriptada="x",
+                                 usuario_id=usuario_id))
+        db.commit()
+
+    datos, selects = _pagina(contar_consultas, usuario_id, 1)
+    assert datos["total_items"] == 26
+    assert selects == 3
+
+
+def test_escritura_en_otro_worker_descarta_el_total(usuario_id, contar_consultas, monkeypatch):
+    _pagina(contar_consultas, usuario_id, 1)
+    # Otro worker: la caché de este proceso no se entera
+    monkeypatch.setattr(cache, "registrar_escritura", lambda usuario_id: None)
+    with SessionLocal() as db:
+        db.add(models.Contrasena(servicio="nuevo", usuario="yo", contrasena_encriptada="x",
+                                 usuario_id=usuario_id))
+        db.commit()
+
+    datos, _ = _pagina(contar_consultas, usuario_id, 1)
+    assert (datos["total_items"], datos["total_pages"]) == (26, 3)
+
+
+def test_pagina_fuera_de_rango_muestra_la_ultima(usuario_id, contar_consultas):
+    _pagina(contar_consultas, usuario_id, 1)
+    datos, _ = _pagina(contar_consultas, usuario_id, 99)
+    assert (datos["current_page"], len(datos["contrasenas"])) == (3, 5)
@@ -0,0 +1,139 @@
+"""
+Trabajos de exportación: el registro y la clave de deduplicación están en la
+base (cualquier worker los ve), y un trabajo que falla no deja archivos a medias.
+"""
+import os
+import time
+import uuid
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.config.database import SessionLocal
+from app.repository import cache, exportacion, trabajos
+from app.schema import models
+
+
+@pytest.fixture
+def usuario_id(sesion):
+    usuario = models.Usuario(nombre="exporta", email="exporta@prueba.local", username="exporta", password="x")
+    sesion.add(usuario)
+    sesion.flush()
+    sesion.add(models.Categoria(nombre="Salario", tipo="fijo", usuario_id=usuario.id))
+    sesion.commit()
+    return usuario.id
+
+
+def _ingreso(db, usuario_id):
+    categoria = db.query(models.Categoria).filter_by(usuario_id=usuario_id).first()
+    return models.Ingreso(categoria_id=categoria.id, usuario_id=usuario_id, valor=Decimal("10.00"),
+                          fecha=date.today(), estado="recibido")
+
+
+def test_version_sube_una_vez_por_transaccion(usuario_id):
+    with SessionLocal() as db:
+        antes = cache.version_datos(db, usuario_id)
+        db.add(_ingreso(db, usuario_id))
+        db.flush()
+        db.add(_ingreso(db, usuario_id))
+        db.commit()
+        assert cache.version_datos(db, usuario_id) == antes + 1
+
+
+def test_rollback_no_cambia_la_version(usuario_id):
+    with SessionLocal() as db:
+        antes = cache.version_datos(db, usuario_id)
+        db.add(_ingreso(db, usuario_id))
+        db.flush()
+        db.rollback()
+        assert cache.version_datos(db, usuario_id) == antes
+
+
+def test_escritura_desde_otra_sesion_cambia_la_clave(usuario_id, monkeypatch):
+    """La versión no depende de la invalidación en memoria del proceso que atendió la escritura"""
+    with SessionLocal() as db:
+        antes = cache.version_datos(db, usuario_id)
+
+    # Simula una escritura atendida por otro worker: la caché local no se entera
+    monkeypatch.setattr(cache, "registrar_escritura", lambda usuario_id: None)
+    with SessionLocal() as otra:
+        otra.add(_ingreso(otra, usuario_id))
+        otra.commit()
+
+    with SessionLocal() as db:
+        assert cache.version_datos(db, usuario_id) == antes + 1
+
+
+def test_fallo_borra_el_archivo_parcial(bd, usuario_id, tmp_path, monkeypatch):
+    def escribir_y_fallar(db, entidad, usuario_id, destino, **filtros):
+        with open(destino, "wb") as archivo:
+            archivo.write(b"a medias")
+        raise RuntimeError("falló la consulta")
+
+    monkeypatch.setattr(exportacion, "escribir_excel", escribir_y_fallar)
+    ruta = tmp_path / "ingresos.xlsx"
+    with pytest.raises(RuntimeError):
+        trabajos._generar_en_proceso(bd.url.render_as_string(hide_password=False),
+                                     "ingresos", usuario_id, {}, str(ruta))
+
+    assert os.listdir(tmp_path) == []
+
+
+def _trabajo_de_otro_worker(usuario_id, ruta, estado=trabajos.PENDIENTE, clave="x" * 64, creado=None):
+    """Fila escrita por otro proceso: este no tiene nada del trabajo en memoria"""
+    with SessionLocal() as db:
+        trabajo = models.TrabajoExportacion(
+            id=uuid.uuid4().hex, usuario_id=usuario_id, entidad="ingresos", filtros={}, clave=clave,
+            estado=estado, ruta=str(ruta), creado=creado or time.time(),
+        )
+        db.add(trabajo)
+        db.commit()
+        return trabajo.id
+
+
+def test_obtener_trabajo_encolado_en_otro_worker(usuario_id, tmp_path):
+    trabajo_id = _trabajo_de_otro_worker(usuario_id, tmp_path / "ingresos.xlsx")
+
+    trabajo = trabajos.obtener_trabajo(trabajo_id, usuario_id)
+    assert trabajo is not None and trabajo.estado == trabajos.PENDIENTE
+    assert trabajos.a_dict(trabajo)["url_descarga"] == f"/exportaciones/{trabajo_id}/descargar"
+    assert trabajos.obtener_trabajo(trabajo_id, usuario_id + 1) is None
+
+
+def test_pendiente_perdido_se_marca_como_error(usuario_id, tmp_path):
+    creado = time.time() - trabajos.EXPORT_TIMEOUT - 1
+    trabajo_id = _trabajo_de_otro_worker(usuario_id, tmp_path / "ingresos.xlsx", creado=creado)
+
+    assert trabajos.obtener_trabajo(trabajo_id, usuario_id).estado == trabajos.ERROR
+
+
+def test_encolar_reutiliza_el_archivo_de_otro_worker(usuario_id, tmp_path, monkeypatch):
+    ruta = tmp_path / "ingresos.xlsx"
+    ruta.write_bytes(b"xlsx")
+    with SessionLocal() as db:
+        clave = trabajos._clave(usuario_id, "ingresos", {}, cache.version_datos(db, usuario_id))
+    trabajo_id = _trabajo_de_otro_worker(usuario_id, ruta, estado=trabajos.LISTO, clave=clave)
+
+    def sin_pool():
+        raise AssertionError("no debería encolar un trabajo nuevo")
+    monkeypatch.setattr(trabajos, "_obtener_pool", sin_pool)
+    with SessionLocal() as db:
+        assert trabajos.encolar_excel(db, "ingresos", usuario_id, {"tipo": None}).id == trabajo_id
+
+
+def test_trabajo_completo_en_el_pool(usuario_id, tmp_path, monkeypatch):
+    monkeypatch.setattr(trabajos, "EXPORT_DIR", str(tmp_path))
+    with SessionLocal() as db:
+        db.add(_ingreso(db, usuario_id))
+        db.commit()
+        trabajo = trabajos.encolar_excel(db, "ingresos", usuario_id, {})
+
+    limite = time.time() + 60
+    while trabajos.obtener_trabajo(trabajo.id, usuario_id).estado == trabajos.PENDIENTE:
+        assert time.time() < limite
+        time.sleep(0.1)
+
+    terminado = trabajos.obtener_trabajo(trabajo.id, usuario_id)
+    assert (terminado.estado, terminado.filas) == (trabajos.LISTO, 1)
+    assert os.path.exists(terminado.ruta)